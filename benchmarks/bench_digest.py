@@ -0,0 +1,80 @@
+"""Бенчмарк расчёта дайджестов для одного слота.
+
+Создаются users пользователей в режиме дайджеста со случайным набором
+подписок и несколькими разными отметками доставки, в news загружаются
+статьи. Замеряется fetch_digests: один запрос на весь слот и отрисовка
+текста по группам.
+
+    python -m benchmarks.bench_digest --users 50000
+"""
+import argparse
+import io
+import random
+import sys
+import time
+
+from benchmarks.bench_search import load_corpus
+from benchmarks.ephemeral_pg import EphemeralPostgres, find_pg_bin, use_database
+from database import Database, close_pool
+from digest import fetch_digests
+
+
+def load_users(users, watermarks, seed=1):
+    """Пользователи, подписки, настройки и отметки доставки через COPY"""
+    rng = random.Random(seed)
+    db = Database()
+    try:
+        source_ids = [row[0] for row in db.fetch_all("SELECT id FROM sources ORDER BY id")]
+        max_id = db.fetch_one("SELECT MAX(id) FROM news")[0]
+        tables = {name: io.StringIO() for name in ('users', 'subscriptions', 'user_settings', 'delivery_watermarks')}
+        for user_id in range(1, users + 1):
+            tables['users'].write(f"{user_id}\t{1000000 + user_id}\tuser{user_id}\n")
+            for source_id in rng.sample(source_ids, rng.randint(1, len(source_ids))):
+                tables['subscriptions'].write(f"{user_id}\t{source_id}\n")
+            tables['user_settings'].write(f"{user_id}\thourly\t2000-01-01 00:00:00\n")
+            since = max_id - max_id * rng.randint(1, watermarks) // (watermarks * 10)
+            tables['delivery_watermarks'].write(f"{user_id}\t{since}\n")
+
+        columns = {
+            'users': '(id, telegram_id, full_name)',
+            'subscriptions': '(user_id, source_id)',
+            'user_settings': '(user_id, digest_mode, next_digest_at)',
+            'delivery_watermarks': '(user_id, last_news_id)',
+        }
+        for name, buffer in tables.items():
+            buffer.seek(0)
+            db.cursor.copy_expert(f"COPY {name} {columns[name]} FROM STDIN", buffer)
+        db.cursor.execute("ANALYZE")
+        db.connection.commit()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк расчёта дайджестов")
+    parser.add_argument('--users', type=int, default=50000, help="пользователей в слоте")
+    parser.add_argument('--news', type=int, default=200000, help="статей в news")
+    parser.add_argument('--watermarks', type=int, default=5, help="различных отметок доставки")
+    parser.add_argument('--per-source', type=int, default=5, help="статей на источник")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if not find_pg_bin():
+        sys.exit("PostgreSQL не найден: укажите каталог с initdb в PG_BIN")
+
+    with EphemeralPostgres() as postgres:
+        use_database(postgres.db_config())
+        load_corpus(args.news, args.seed)
+        load_users(args.users, args.watermarks, args.seed)
+
+        started = time.perf_counter()
+        deliveries = fetch_digests(args.per_source)
+        elapsed = time.perf_counter() - started
+        texts = len({id(delivery['messages']) for delivery in deliveries})
+        close_pool()
+
+    print(f"дайджестов: {len(deliveries)}, различных текстов: {texts}, время: {elapsed:.2f} с")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Задержка обработчиков бота во время сбора новостей.
+
+Потоки-сборщики непрерывно разбирают сохранённые страницы источников, а
+цикл событий бота в это время обрабатывает команды /help через
+Application.process_update. Сравниваются режимы SCRAPER_CONFIG['parse_mode']:
+'thread' (разбор в потоках того же процесса, под общим GIL) и 'process'
+(разбор в пуле процессов), а также задержка без нагрузки.
+
+    python -m benchmarks.bench_parse_mode --duration 10
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+from telegram.ext import Application
+
+import bot
+import coalesce
+import config
+import parsers
+from benchmarks.fixtures import SLUGS, load_page
+from benchmarks.run import FakeTelegramRequest, command_update, percentile
+
+
+class ScrapeLoad:
+    """Потоки, без остановки разбирающие страницы источников"""
+
+    def __init__(self, threads):
+        self.threads = threads
+        self.pages = 0
+        self._pages = [(load_page(SLUGS[spec.name]), spec) for spec in parsers.SOURCES if spec.name in SLUGS]
+        self._stop = threading.Event()
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def _run(self):
+        while not self._stop.is_set():
+            for page, spec in self._pages:
+                parsers.extract(page, spec)
+                with self._lock:
+                    self.pages += 1
+
+    def __enter__(self):
+        for i in range(self.threads):
+            worker = threading.Thread(target=self._run, name=f'scrape-load-{i}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        for worker in self._workers:
+            worker.join()
+
+
+async def handler_latencies(application, duration, interval):
+    """Время ответа на команды, приходящие раз в interval секунд.
+
+    Отсчёт идёт от запланированного момента прихода команды, поэтому в
+    задержку входит и время, пока цикл событий ждал GIL.
+    """
+    latencies = []
+    update_id = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration:
+        arrival = started + update_id * interval
+        update_id += 1
+        await asyncio.sleep(max(0, arrival - time.perf_counter()))
+        update = command_update(application, update_id, 1000 + update_id % 50, '/help')
+        await application.process_update(update)
+        latencies.append((time.perf_counter() - arrival) * 1000)
+    return latencies
+
+
+async def run(args):
+    application = (
+        Application.builder()
+        .token('1:bench')
+        .request(FakeTelegramRequest())
+        .get_updates_request(FakeTelegramRequest())
+        .build()
+    )
+    bot.setup_handlers(application)
+    await application.initialize()
+    # Команды идут чаще лимита на пользователя: замеряется обработка, а не отказ
+    coalesce.throttle.rate = 0
+
+    results = {}
+    latencies = await handler_latencies(application, args.duration, args.interval)
+    results['idle'] = (latencies, 0)
+
+    for mode in ('thread', 'process'):
+        config.SCRAPER_CONFIG['parse_mode'] = mode
+        if mode == 'process':
+            await asyncio.to_thread(parsers.get_parse_pool)
+        with ScrapeLoad(args.threads) as load:
+            latencies = await handler_latencies(application, args.duration, args.interval)
+        results[mode] = (latencies, load.pages / args.duration)
+
+    parsers.close_parse_pool()
+    await application.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Задержка обработчиков во время разбора страниц")
+    parser.add_argument('--duration', type=float, default=10, help="длительность замера каждого режима, с")
+    parser.add_argument('--interval', type=float, default=0.005, help="пауза между командами, с")
+    parser.add_argument('--threads', type=int, default=config.SCRAPER_CONFIG['max_workers'],
+                        help="потоков-сборщиков")
+    parser.add_argument('--workers', type=int, default=config.SCRAPER_CONFIG['parse_workers'],
+                        help="процессов в пуле разбора")
+    args = parser.parse_args()
+    config.SCRAPER_CONFIG['parse_workers'] = args.workers
+
+    results = asyncio.run(run(args))
+    print(f"{'режим':10} {'p50, мс':>10} {'p99, мс':>10} {'max, мс':>10} {'страниц/с':>10}")
+    for mode, (latencies, pages_per_second) in results.items():
+        print(
+            f"{mode:10} {percentile(latencies, 0.5):10.2f} {percentile(latencies, 0.99):10.2f} "
+            f"{max(latencies):10.2f} {pages_per_second:10.1f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Бенчмарк полнотекстового поиска /search на синтетическом корпусе.
+
+Корпус заголовков генерируется с распределением слов по закону Ципфа:
+есть частые слова (совпадают с десятками тысяч строк) и редкие. Для каждого
+запроса замеряется время поиска по GIN-индексу, для сравнения — ILIKE по
+тем же словам, и проверяется, что в плане нет последовательного чтения.
+
+    python -m benchmarks.bench_search --rows 1000000
+"""
+import argparse
+import io
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.ephemeral_pg import EphemeralPostgres, find_pg_bin, use_database
+from benchmarks.run import percentile
+from database import Database, close_pool
+from migrate import plan_problems
+from search import build_search_query
+
+WORDS = {
+    'russian': (
+        "ставка банк рубль нефть рынок цены курс доллар инфляция экспорт газ правительство "
+        "министерство компания акции облигации бюджет налоги кредит ипотека выборы президент "
+        "санкции поставки пошлины зерно металлы золото биржа индекс прибыль выручка дивиденды "
+        "отчетность регулятор закон суд проект строительство транспорт энергетика уголь сталь "
+        "промышленность производство спрос предложение дефицит резервы валюта"
+    ).split(),
+    'english': (
+        "rate bank dollar oil market prices stocks bonds inflation exports gas government "
+        "ministry company shares yields budget taxes credit mortgage election president "
+        "sanctions supply tariffs grain metals gold exchange index profit revenue dividends "
+        "earnings regulator law court project construction transport energy coal steel "
+        "industry production demand deficit reserves currency"
+    ).split(),
+}
+RARE_WORDS = 5000
+QUERIES = [
+    ('common_ru', 'ставка', None),
+    ('common_en', 'oil', None),
+    ('phrase_ru', 'ключевая ставка банк', None),
+    ('two_words_en', 'oil prices', None),
+    ('rare', 'тема4711', None),
+    ('by_source', 'нефть', 2),
+    ('no_match', 'квазар', None),
+]
+
+
+class TitleGenerator:
+    def __init__(self, seed=1):
+        self.rng = random.Random(seed)
+        self.vocabularies = {}
+        for language, words in WORDS.items():
+            prefix = 'тема' if language == 'russian' else 'topic'
+            vocabulary = words + [f'{prefix}{i}' for i in range(RARE_WORDS)]
+            cumulative, total = [], 0.0
+            for rank in range(1, len(vocabulary) + 1):
+                total += 1 / rank
+                cumulative.append(total)
+            self.vocabularies[language] = (vocabulary, cumulative)
+
+    def title(self, language):
+        vocabulary, cumulative = self.vocabularies.get(language, self.vocabularies['english'])
+        return ' '.join(self.rng.choices(vocabulary, cum_weights=cumulative, k=self.rng.randint(5, 10)))
+
+
+def load_corpus(rows, seed=1, chunk=50000):
+    """Заполнение news синтетическими заголовками через COPY"""
+    generator = TitleGenerator(seed)
+    db = Database()
+    try:
+        sources = db.fetch_all("SELECT id, search_config::text FROM sources ORDER BY id")
+        started = datetime.now()
+        written = 0
+        while written < rows:
+            size = min(chunk, rows - written)
+            buffer = io.StringIO()
+            for i in range(size):
+                source_id, language = sources[(written + i) % len(sources)]
+                title = generator.title(language)
+                published_at = started - timedelta(minutes=written + i)
+                buffer.write(f"{source_id}\t{title}\thttps://bench.invalid/{written + i}\t{published_at}\n")
+            buffer.seek(0)
+            db.cursor.copy_expert("COPY news (source_id, title, url, published_at) FROM STDIN", buffer)
+            db.connection.commit()
+            written += size
+        db.cursor.execute("ANALYZE news")
+        db.connection.commit()
+    finally:
+        db.close()
+
+
+def timed(cursor, query, params, repeat):
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cursor.execute(query, params)
+        cursor.fetchall()
+        durations.append((time.perf_counter() - started) * 1000)
+    return durations
+
+
+def bench_queries(repeat, ilike_repeat):
+    results = {}
+    failed = []
+    db = Database()
+    try:
+        cursor = db.cursor
+        for name, text, source_id in QUERIES:
+            query, params = build_search_query(text, source_id, limit=6, offset=0)
+            cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            problems = plan_problems(plan[0], allow_sort=True)
+            if problems:
+                failed.append(f"{name}: {', '.join(problems)}")
+
+            durations = timed(cursor, query, params, repeat)
+            results[f'search_{name}_p50_ms'] = percentile(durations, 0.5)
+            results[f'search_{name}_p99_ms'] = percentile(durations, 0.99)
+
+            pattern = f"%{text.split()[0]}%"
+            ilike = timed(
+                cursor,
+                "SELECT title, url, published_at FROM news WHERE title ILIKE %s "
+                "ORDER BY published_at DESC LIMIT 6",
+                (pattern,),
+                ilike_repeat
+            )
+            results[f'ilike_{name}_ms'] = statistics.median(ilike)
+        db.connection.rollback()
+    finally:
+        db.close()
+    return results, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк полнотекстового поиска")
+    parser.add_argument('--rows', type=int, default=1000000, help="размер корпуса")
+    parser.add_argument('--repeat', type=int, default=50, help="повторов каждого поискового запроса")
+    parser.add_argument('--ilike-repeat', type=int, default=3, help="повторов запроса ILIKE")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if not find_pg_bin():
+        sys.exit("PostgreSQL не найден: укажите каталог с initdb в PG_BIN")
+
+    with EphemeralPostgres() as postgres:
+        use_database(postgres.db_config())
+        started = time.perf_counter()
+        load_corpus(args.rows, args.seed)
+        print(f"Корпус {args.rows} строк загружен за {time.perf_counter() - started:.1f} с")
+        results, failed = bench_queries(args.repeat, args.ilike_repeat)
+        close_pool()
+
+    for name, value in sorted(results.items()):
+        print(f"{name:36} {value:10.2f}")
+    if failed:
+        print("Последовательное чтение в плане поиска:\n" + '\n'.join(failed))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
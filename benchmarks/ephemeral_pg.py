@@ -0,0 +1,105 @@
+import glob
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+
+import psycopg2
+
+import config
+from database import close_pool
+from migrate import apply_migrations
+
+
+def find_pg_bin():
+    candidates = [os.environ.get('PG_BIN')]
+    initdb = shutil.which('initdb')
+    if initdb:
+        candidates.append(os.path.dirname(initdb))
+    candidates += sorted(glob.glob('/usr/lib/postgresql/*/bin'), reverse=True)
+    candidates += sorted(glob.glob('/usr/local/pgsql/bin'))
+    for path in candidates:
+        if path and os.path.exists(os.path.join(path, 'initdb')):
+            return path
+    return None
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class EphemeralPostgres:
+    """Временный кластер PostgreSQL в каталоге tmp, удаляется после stop().
+
+    Нужны initdb и pg_ctl (PATH, PG_BIN или /usr/lib/postgresql/*/bin);
+    initdb нельзя запускать от root.
+    """
+
+    def __init__(self, dbname='news_aggregator', user='news_bot', bin_dir=None):
+        self.dbname = dbname
+        self.user = user
+        self.bin_dir = bin_dir or find_pg_bin()
+        self.port = None
+        self._dir = None
+
+    @property
+    def data_dir(self):
+        return os.path.join(self._dir, 'data')
+
+    def _run(self, tool, *args):
+        subprocess.run(
+            [os.path.join(self.bin_dir, tool), *args],
+            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+
+    def start(self):
+        if not self.bin_dir:
+            raise RuntimeError("PostgreSQL не найден: укажите каталог с initdb в PG_BIN")
+        self._dir = tempfile.mkdtemp(prefix='news-bench-pg-')
+        self.port = _free_port()
+        self._run('initdb', '-D', self.data_dir, '-U', self.user, '--auth=trust', '-E', 'UTF8', '--no-sync')
+        self._run(
+            'pg_ctl', '-D', self.data_dir, '-l', os.path.join(self._dir, 'postgres.log'), '-w',
+            '-o', f"-p {self.port} -k {self._dir} -c listen_addresses='' -c fsync=off", 'start'
+        )
+        connection = psycopg2.connect(dbname='postgres', user=self.user, host=self._dir, port=self.port)
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE DATABASE {self.dbname}')
+        connection.close()
+        return self
+
+    def db_config(self):
+        return {
+            'dbname': self.dbname,
+            'user': self.user,
+            'password': 'bench',
+            'host': self._dir,
+            'port': str(self.port)
+        }
+
+    def stop(self):
+        if not self._dir:
+            return
+        try:
+            self._run('pg_ctl', '-D', self.data_dir, '-m', 'immediate', 'stop')
+        finally:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def use_database(db_config, **connect_kwargs):
+    """Переключение пула соединений на другую БД и применение миграций"""
+    close_pool()
+    config.DB_CONFIG.clear()
+    config.DB_CONFIG.update(db_config, **connect_kwargs)
+    apply_migrations()
@@ -0,0 +1,90 @@
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.fixtures import SLUGS, load_page
+
+
+class FixtureServer:
+    """Локальный HTTP-сервер со страницами источников.
+
+    latency — задержка ответа в секундах (общая или по slug), failure_rate —
+    доля ответов 503. При vary=True в каждую страницу добавляется счётчик,
+    чтобы кэш по хешу тела не пропускал разбор.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, vary=True, seed=0):
+        self.pages = {slug: load_page(slug).encode('utf-8') for slug in SLUGS.values()}
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.vary = vary
+        self.requests = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def url_for(self, source_name):
+        return f'{self.base_url}/{SLUGS[source_name]}'
+
+    def _latency_for(self, slug):
+        if isinstance(self.latency, dict):
+            return self.latency.get(slug, 0.0)
+        return self.latency
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                slug = self.path.strip('/').split('?')[0]
+                with server._lock:
+                    server.requests += 1
+                    counter = server.requests
+                    failed = server._rng.random() < server.failure_rate
+
+                delay = server._latency_for(slug)
+                if delay:
+                    time.sleep(delay)
+                if slug not in server.pages:
+                    self.send_error(404)
+                    return
+                if failed:
+                    self.send_error(503)
+                    return
+
+                body = server.pages[slug]
+                if server.vary:
+                    body += f'<!-- {counter} -->'.encode('ascii')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,94 @@
+"""Страницы источников для офлайн-бенчмарков.
+
+В fixtures/ лежат сохранённые главные страницы источников. Если нужной
+страницы нет, она генерируется с той же разметкой, что ожидают селекторы из
+sources.json: python -m benchmarks.fixtures --regenerate
+"""
+import argparse
+import os
+import random
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+SLUGS = {
+    'Bloomberg': 'bloomberg',
+    'Коммерсантъ': 'kommersant',
+    'Reuters': 'reuters',
+    'ТАСС': 'tass',
+}
+
+WORDS = {
+    'en': 'markets stocks bonds oil dollar fed rates earnings china europe bank tech inflation growth trade'.split(),
+    'ru': 'рынок акции нефть рубль банк ставка бюджет экспорт газ правительство рост доходы санкции цены'.split(),
+}
+
+
+def _title(rng, lang):
+    return ' '.join(rng.choice(WORDS[lang]) for _ in range(rng.randint(6, 12))).capitalize()
+
+
+def _filler(rng, count):
+    blocks = []
+    for i in range(count):
+        blocks.append(
+            f'<div class="promo promo-{i}"><ul>'
+            + ''.join(f'<li><span class="label">{rng.random():.6f}</span></li>' for _ in range(8))
+            + '</ul><script>window.__data_%d = {"id": %d};</script></div>' % (i, i)
+        )
+    return ''.join(blocks)
+
+
+def generate_page(slug, items=60, seed=0):
+    rng = random.Random(f'{slug}-{seed}')
+    body = []
+    for i in range(items):
+        if slug == 'bloomberg':
+            title = _title(rng, 'en')
+            body.append(
+                f'<article class="story-list-story"><div class="story-list-story__info">'
+                f'<a class="story-list-story__info__headline" href="/news/articles/{seed}-{i}">{title}</a>'
+                f'</div></article>'
+            )
+        elif slug == 'kommersant':
+            body.append(f'<div class="uho"><a class="uho__link" href="/doc/{seed}{i:05d}">{_title(rng, "ru")}</a></div>')
+        elif slug == 'reuters':
+            body.append(
+                f'<article class="story"><a data-testid="Heading" href="/world/{seed}-{i}/">{_title(rng, "en")}</a></article>'
+            )
+        elif slug == 'tass':
+            body.append(
+                f'<a class="news-card" href="/ekonomika/{seed}{i:05d}">'
+                f'<span class="news-card__title">{_title(rng, "ru")}</span></a>'
+            )
+        body.append(_filler(rng, 2))
+    return (
+        f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{slug}</title></head>'
+        f'<body><header>{_filler(rng, 10)}</header><main>{"".join(body)}</main>'
+        f'<footer>{_filler(rng, 10)}</footer></body></html>'
+    )
+
+
+def load_page(slug):
+    path = os.path.join(FIXTURES_DIR, f'{slug}.html')
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+    return generate_page(slug)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Страницы источников для бенчмарков")
+    parser.add_argument('--regenerate', action='store_true', help="перезаписать сохранённые страницы")
+    args = parser.parse_args()
+
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for slug in SLUGS.values():
+        path = os.path.join(FIXTURES_DIR, f'{slug}.html')
+        if args.regenerate or not os.path.exists(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(generate_page(slug))
+            print(f"Записана страница {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,274 @@
+"""Офлайн-бенчмарки сбора, записи и выдачи новостей.
+
+Страницы источников отдаёт локальный FixtureServer, БД — временный кластер
+PostgreSQL со схемой из migrations/, обработчики бота вызываются через
+Application.process_update с синтетическими Update и поддельным транспортом
+Telegram.
+
+    python -m benchmarks.run                    прогон и сравнение с baseline.json
+    python -m benchmarks.run --save-baseline    сохранить результат как baseline
+    python -m benchmarks.run --no-db            только загрузка и разбор страниц
+"""
+import argparse
+import asyncio
+import dataclasses
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from psycopg2.extensions import cursor as base_cursor
+from telegram import Update
+from telegram.ext import Application
+from telegram.request import BaseRequest
+
+import bot
+import cache
+import coalesce
+import parsers
+from benchmarks.ephemeral_pg import EphemeralPostgres, find_pg_bin, use_database
+from benchmarks.fixture_server import FixtureServer
+from benchmarks.fixtures import SLUGS, load_page
+from http_cache import FetchCache
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+HIGHER_IS_BETTER = {'ingest_rows_per_sec'}
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def add(self):
+        with self._lock:
+            self.count += 1
+
+
+queries = QueryCounter()
+
+
+class CountingCursor(base_cursor):
+    def execute(self, query, vars=None):
+        queries.add()
+        return super().execute(query, vars)
+
+
+class FakeTelegramRequest(BaseRequest):
+    """Транспорт Telegram без сети: отвечает на вызовы Bot API заготовками"""
+
+    def __init__(self):
+        self.calls = 0
+        self._message_id = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        self.calls += 1
+        endpoint = url.rsplit('/', 1)[-1]
+        params = request_data.parameters if request_data else {}
+        if endpoint == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+        elif endpoint in ('sendMessage', 'editMessageText'):
+            self._message_id += 1
+            result = {
+                'message_id': self._message_id,
+                'date': int(time.time()),
+                'chat': {'id': int(params.get('chat_id', 1)), 'type': 'private'},
+                'text': params.get('text', '')
+            }
+        else:
+            result = True
+        return 200, json.dumps({'ok': True, 'result': result}).encode('utf-8')
+
+
+def command_update(application, update_id, user_id, text):
+    data = {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'},
+            'text': text,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        }
+    }
+    return Update.de_json(data, application.bot)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def point_sources_to(server):
+    parsers.SOURCES[:] = [
+        dataclasses.replace(spec, url=server.url_for(spec.name), base_url=spec.base_url)
+        for spec in parsers.SOURCES if spec.name in SLUGS
+    ]
+
+
+def bench_parse(iterations):
+    results = {}
+    for spec in parsers.SOURCES:
+        page = load_page(SLUGS[spec.name])
+        started = time.perf_counter()
+        for _ in range(iterations):
+            parsers.extract_items(page, spec)
+        results[f"parse_ms_{SLUGS[spec.name]}"] = (time.perf_counter() - started) / iterations * 1000
+    return results
+
+
+def bench_fetch_cycle(cycles):
+    durations = []
+    for _ in range(cycles):
+        started = time.perf_counter()
+        parsers.fetch_all_news()
+        durations.append(time.perf_counter() - started)
+    return {'fetch_cycle_s': statistics.median(durations)}
+
+
+def bench_ingest(batches, batch_size):
+    source_name = parsers.SOURCES[0].name
+    total = 0
+    started = time.perf_counter()
+    for batch in range(batches):
+        items = [
+            {'title': f'Bench headline {batch}-{i}', 'url': f'https://bench.invalid/{batch}/{i}'}
+            for i in range(batch_size)
+        ]
+        inserted, _ = parsers.save_news_to_db(source_name, items)
+        total += inserted
+    return {'ingest_rows_per_sec': total / (time.perf_counter() - started)}
+
+
+async def bench_handlers(users, requests_per_user):
+    application = (
+        Application.builder()
+        .token('1:bench')
+        .request(FakeTelegramRequest())
+        .get_updates_request(FakeTelegramRequest())
+        .build()
+    )
+    bot.setup_handlers(application)
+    await application.initialize()
+    # Команды одного пользователя идут подряд, чаще лимита на пользователя:
+    # замеряется обработка, а не отказ, как и в базовом прогоне
+    coalesce.throttle.rate = 0
+    results = {}
+    update_id = 0
+
+    async def run(text, user_ids, clear_cache=False):
+        nonlocal update_id
+        latencies = []
+        before = queries.count
+        for user_id in user_ids:
+            if clear_cache:
+                cache.news_cache.invalidate()
+                cache.settings_cache.invalidate()
+            update_id += 1
+            update = command_update(application, update_id, user_id, text)
+            started = time.perf_counter()
+            await application.process_update(update)
+            latencies.append((time.perf_counter() - started) * 1000)
+        return latencies, (queries.count - before) / len(user_ids)
+
+    user_ids = list(range(1000, 1000 + users))
+    _, results['queries_per_start'] = await run('/start', user_ids)
+    news_users = user_ids * requests_per_user
+
+    for name, clear_cache in (('news_cold', True), ('news_warm', False)):
+        latencies, per_command = await run('/news', news_users, clear_cache)
+        results[f'{name}_p50_ms'] = percentile(latencies, 0.5)
+        results[f'{name}_p99_ms'] = percentile(latencies, 0.99)
+        results[f'queries_per_{name}'] = per_command
+
+    _, results['queries_per_subscriptions'] = await run('/subscriptions', user_ids)
+    await application.shutdown()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    print(f"{'метрика':32} {'baseline':>12} {'сейчас':>12} {'изменение':>10}")
+    for name, value in sorted(results.items()):
+        old = baseline.get(name)
+        if old is None or old == 0:
+            print(f"{name:32} {'-':>12} {value:12.3f}")
+            continue
+        change = (value - old) / old
+        worse = -change if name in HIGHER_IS_BETTER else change
+        mark = ' !' if worse > tolerance else ''
+        print(f"{name:32} {old:12.3f} {value:12.3f} {change:+9.1%}{mark}")
+        if worse > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарки бота")
+    parser.add_argument('--no-db', action='store_true', help="без PostgreSQL: только загрузка и разбор")
+    parser.add_argument('--latency', type=float, default=0.2, help="задержка ответа сервера страниц, с")
+    parser.add_argument('--slow-source', default=None, help="slug источника с задержкой x5")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="доля ответов 503")
+    parser.add_argument('--cycles', type=int, default=3)
+    parser.add_argument('--parse-iterations', type=int, default=20)
+    parser.add_argument('--ingest-batches', type=int, default=50)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--requests-per-user', type=int, default=2)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.2, help="допустимое ухудшение, доля")
+    args = parser.parse_args()
+
+    latency = args.latency
+    if args.slow_source:
+        latency = {slug: args.latency for slug in SLUGS.values()}
+        latency[args.slow_source] = args.latency * 5
+
+    parsers.fetch_cache = FetchCache(os.path.join(tempfile.mkdtemp(prefix='news-bench-'), 'fetch_cache.json'))
+    results = bench_parse(args.parse_iterations)
+
+    with FixtureServer(latency=latency, failure_rate=args.failure_rate) as server:
+        point_sources_to(server)
+        if args.no_db:
+            parsers.save_news_to_db = lambda source_name, items: (0, len(items))
+            results.update(bench_fetch_cycle(args.cycles))
+        else:
+            if not find_pg_bin():
+                sys.exit("PostgreSQL не найден: укажите PG_BIN или запустите с --no-db")
+            with EphemeralPostgres() as postgres:
+                use_database(postgres.db_config(), cursor_factory=CountingCursor)
+                bot.register_sources()
+                results.update(bench_fetch_cycle(args.cycles))
+                results.update(bench_ingest(args.ingest_batches, 60))
+                results.update(asyncio.run(bench_handlers(args.users, args.requests_per_user)))
+                bot.close_pool()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baseline сохранён в {args.baseline}")
+    elif regressions:
+        print(f"Ухудшение больше {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,11 @@
+import argparse
+import asyncio
+import html
 import logging
+import signal
+from textwrap import shorten
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -9,11 +15,29 @@ from telegram.ext import (
     MessageHandler,
     filters
 )
-from database import Database
+from database import AsyncDatabase, close_pool, run_in_db
+import coalesce
+from cache import news_cache, settings_cache, invalidate_news, invalidate_settings
+from cluster import (
+    DELIVERY_LOCK_ID, NEWS_CHANNEL, SCRAPER_LOCK_ID, SETTINGS_CHANNEL,
+    LeaderElection, NotificationListener, notify
+)
 import config
-import threading
-import time
-from parsers import fetch_all_news
+from parsers import SOURCES, close_parse_pool, collect_source, get_parse_pool, register_sources
+from scheduler import NewsScheduler
+from delivery import DeliveryEngine
+from enrichment import EnrichmentCrawler
+from url_filter import url_filter
+from migrate import apply_migrations, archive_old_news
+from webhook import WebhookServer
+from search import (
+    LOAD_SEARCH_QUERY, SAVE_SEARCH_QUERY, build_search_query, decode_page, encode_page, render_results
+)
+import digest
+from pagination import (
+    NEWER, OLDER, build_page_query, collapse_stories, decode_cursor, encode_cursor, page_fetch_size
+)
+from metrics import MetricsServer, SamplingProfiler, instrument_handler, send_queue_size
 
 
 logging.basicConfig(
@@ -22,11 +46,13 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-SET_DEFAULT_SOURCE, SET_ITEMS_PER_PAGE = range(2)
+SET_DEFAULT_SOURCE, SET_ITEMS_PER_PAGE, SET_DIGEST_TIME = range(3)
+SOURCES_QUERY = "SELECT id, name FROM sources ORDER BY id"
 
 COMMANDS = {
     'start': 'Запуск бота и описание функций',
     'news': 'Получить последние новости',
+    'search': 'Поиск по всем новостям: /search запрос',
     'settings': 'Настройки параметров',
     'subscriptions': 'Управление подписками',
     'help': 'Помощь по командам'
@@ -34,17 +60,17 @@ COMMANDS = {
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    db = Database()
+    db = AsyncDatabase()
     
     try:
-        db.execute(
+        await db.execute(
             "INSERT INTO users (telegram_id, username, full_name) VALUES (%s, %s, %s) "
             "ON CONFLICT (telegram_id) DO NOTHING",
             (user.id, user.username, user.full_name),
             commit=True
         )
         
-        db.execute(
+        await db.execute(
             "INSERT INTO user_settings (user_id) "
             "SELECT id FROM users WHERE telegram_id = %s "
             "ON CONFLICT (user_id) DO NOTHING",
@@ -68,65 +94,195 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error(f"Ошибка регистрации пользователя: {e}")
         await update.message.reply_text("Произошла ошибка при регистрации. Попробуйте снова.")
     finally:
-        db.close()
+        await db.close()
 
-async def handle_news(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = update.effective_user
-    db = Database()
-    
-    try:
-        settings = db.fetch_one(
+async def show_news_page(reply, telegram_id, direction=OLDER, cursor=None):
+    """Страница ленты: первая берётся из кэша, остальные — запросом по ключу.
+
+    Одинаковые запросы, выполняющиеся одновременно, объединяются (coalesce).
+    """
+    settings = settings_cache.get(telegram_id)
+    if settings is None:
+        version = settings_cache.version
+        settings = await coalesce.fetch_one(
             "SELECT items_per_page, default_source_id FROM user_settings "
             "WHERE user_id = (SELECT id FROM users WHERE telegram_id = %s)",
-            (user.id,)
+            (telegram_id,)
         )
-        
-        if not settings:
-            await update.message.reply_text("Ваши настройки не найдены. Используйте /start для инициализации.")
-            return
-        
-        items_per_page = settings[0] or 5
-        default_source_id = settings[1]
-        
-        if default_source_id:
-            news = db.fetch_all(
-                "SELECT n.title, n.url, s.base_url FROM news n "
-                "JOIN sources s ON n.source_id = s.id "
-                "WHERE s.id = %s ORDER BY n.published_at DESC LIMIT %s",
-                (default_source_id, items_per_page)
-            )
-        else:
-            news = db.fetch_all(
-                "SELECT n.title, n.url, s.base_url FROM news n "
-                "JOIN sources s ON n.source_id = s.id "
-                "ORDER BY n.published_at DESC LIMIT %s",
-                (items_per_page,)
-            )
-        
-        if not news:
-            await update.message.reply_text("Пока нет новостей. Попробуйте позже!")
-            return
-        
-        response = "Последние новости:\n\n"
-        for item in news:
-            domain = item[2].replace('www.', '').split('/')[0]
-            response += f"{item[0]}\n<a href='{item[1]}'>Читать</a>\n\n"
-        
-        await update.message.reply_text(
-            text=response,
-            parse_mode='HTML',
-            disable_web_page_preview=True
+        if settings:
+            settings_cache.set(telegram_id, settings, version)
+    
+    if not settings:
+        await reply("Ваши настройки не найдены. Используйте /start для инициализации.")
+        return
+    
+    items_per_page = settings[0] or 5
+    default_source_id = settings[1]
+    
+    if cursor is None:
+        cache_key = (default_source_id, items_per_page)
+        news = news_cache.get(cache_key)
+        if news is None:
+            version = news_cache.version
+            news = await coalesce.fetch_all(*build_page_query(default_source_id, page_fetch_size(items_per_page)))
+            news_cache.set(cache_key, news, version)
+    else:
+        news = await coalesce.fetch_all(
+            *build_page_query(default_source_id, page_fetch_size(items_per_page), direction, cursor)
         )
+    
+    news, has_more = collapse_stories(news, items_per_page)
+    if direction == NEWER:
+        news = news[::-1]
+    
+    if not news:
+        await reply("Пока нет новостей. Попробуйте позже!")
+        return
+    
+    response = "Последние новости:\n\n"
+    for item in news:
+        response += f"{item[2]}\n"
+        if item[5]:
+            response += f"<i>{html.escape(shorten(item[5], 200, placeholder='…'))}</i>\n"
+        response += f"<a href='{item[3]}'>Читать</a>\n\n"
+    
+    has_newer = cursor is not None and (direction == OLDER or has_more)
+    has_older = direction == NEWER or has_more
+    buttons = []
+    if has_newer:
+        buttons.append(InlineKeyboardButton("⬅️ Новее", callback_data=encode_cursor(NEWER, news[0][1], news[0][0])))
+    if has_older:
+        buttons.append(InlineKeyboardButton("Старее ➡️", callback_data=encode_cursor(OLDER, news[-1][1], news[-1][0])))
+    
+    await reply(
+        text=response,
+        parse_mode='HTML',
+        disable_web_page_preview=True,
+        reply_markup=InlineKeyboardMarkup([buttons]) if buttons else None
+    )
+
+async def handle_news(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    try:
+        await show_news_page(update.message.reply_text, update.effective_user.id)
     except Exception as e:
         logger.error(f"Ошибка получения новостей: {e}")
         await update.message.reply_text("Произошла ошибка при получении новостей. Попробуйте позже.")
+
+async def news_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    
+    try:
+        direction, published_at, news_id = decode_cursor(query.data)
+        await show_news_page(query.edit_message_text, query.from_user.id, direction, (published_at, news_id))
+    except Exception as e:
+        logger.error(f"Ошибка листания новостей: {e}")
+        await query.answer("Произошла ошибка. Попробуйте снова.", show_alert=True)
+
+async def show_search_page(reply, query_id, text, source_id, page):
+    """Страница результатов поиска с кнопками листания и фильтра по источнику.
+
+    Всё состояние поиска — в callback_data кнопок (id запроса в
+    search_queries, источник, страница), так что нажатие может обработать
+    любая копия бота.
+    """
+    page_size = config.SEARCH_CONFIG['page_size']
+    last_page = config.SEARCH_CONFIG['max_pages'] - 1
+    query, params = build_search_query(text, source_id, page_size + 1, page * page_size)
+    rows = await coalesce.fetch_all(query, params)
+    sources = await coalesce.fetch_all(SOURCES_QUERY)
+
+    keyboard = []
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton("⬅️ Назад", callback_data=encode_page(query_id, source_id, page - 1)))
+    if len(rows) > page_size and page < last_page:
+        navigation.append(InlineKeyboardButton("Далее ➡️", callback_data=encode_page(query_id, source_id, page + 1)))
+    if navigation:
+        keyboard.append(navigation)
+    filters_row = [InlineKeyboardButton(
+        f"{'✅ ' if source_id is None else ''}Все", callback_data=encode_page(query_id, None, 0)
+    )]
+    for row_source_id, source_name in sources:
+        mark = '✅ ' if source_id == row_source_id else ''
+        filters_row.append(
+            InlineKeyboardButton(f"{mark}{source_name}", callback_data=encode_page(query_id, row_source_id, 0))
+        )
+    keyboard += [filters_row[i:i + 3] for i in range(0, len(filters_row), 3)]
+
+    if rows:
+        message = render_results(text, rows[:page_size], page)
+        if len(rows) > page_size and page == last_page:
+            message += "Показаны лучшие совпадения, уточните запрос, чтобы увидеть остальные."
+    else:
+        message = "По вашему запросу ничего не найдено."
+    await reply(
+        text=message,
+        parse_mode='HTML',
+        disable_web_page_preview=True,
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
+
+async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = ' '.join(context.args or []).strip()[:config.SEARCH_CONFIG['max_query_length']]
+    if not text:
+        await update.message.reply_text("Укажите запрос, например: /search ключевая ставка")
+        return
+
+    try:
+        query_id = await save_search_query(text)
+        await show_search_page(update.message.reply_text, query_id, text, None, 0)
+    except Exception as e:
+        logger.error(f"Ошибка поиска: {e}")
+        await update.message.reply_text("Произошла ошибка при поиске. Попробуйте позже.")
+
+async def save_search_query(text):
+    """id сохранённого запроса; сессия закрывается до чтения результатов.
+
+    show_search_page читает через coalesce, каждому чтению нужна своя
+    сессия из того же пула: держать эту сессию во время чтений нельзя, иначе
+    при заполненном пуле обработчики ждут друг друга до checkout_timeout.
+    """
+    db = AsyncDatabase()
+    try:
+        cursor = await db.execute(SAVE_SEARCH_QUERY, (text,), commit=True)
+        row = cursor.fetchone() if cursor is not None else None
     finally:
-        db.close()
+        await db.close()
+    if not row:
+        raise RuntimeError("запрос не сохранён")
+    return row[0]
+
+async def search_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    try:
+        query_id, source_id, page = decode_page(query.data)
+    except ValueError:
+        await query.edit_message_text("Поиск устарел, повторите команду /search")
+        return
+
+    try:
+        row = await coalesce.fetch_one(LOAD_SEARCH_QUERY, (query_id,))
+        if not row:
+            await query.edit_message_text("Поиск устарел, повторите команду /search")
+            return
+        await show_search_page(
+            query.edit_message_text, query_id, row[0], source_id, min(page, config.SEARCH_CONFIG['max_pages'] - 1)
+        )
+    except BadRequest as e:
+        # повторное нажатие на уже выбранный фильтр: сообщение не изменилось
+        if 'not modified' not in str(e):
+            logger.error(f"Ошибка поиска: {e}")
+    except Exception as e:
+        logger.error(f"Ошибка поиска: {e}")
+        await query.edit_message_text("Произошла ошибка при поиске. Попробуйте позже.")
 
 async def settings_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     keyboard = [
         [InlineKeyboardButton("Источник по умолчанию", callback_data='set_default_source')],
         [InlineKeyboardButton("Количество новостей на страницу", callback_data='set_items_per_page')],
+        [InlineKeyboardButton("Дайджест вместо рассылки", callback_data='set_digest')],
         [InlineKeyboardButton("Назад", callback_data='back_to_main')]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -138,9 +294,8 @@ async def settings_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     data = query.data
     
     if data == 'set_default_source':
-        db = Database()
         try:
-            sources = db.fetch_all("SELECT id, name FROM sources")
+            sources = await coalesce.fetch_all(SOURCES_QUERY)
             
             keyboard = []
             for source in sources:
@@ -152,34 +307,69 @@ async def settings_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
         except Exception as e:
             logger.error(f"Ошибка получения источников: {e}")
             await query.edit_message_text("Произошла ошибка при загрузке источников.")
-        finally:
-            db.close()
     
     elif data.startswith('set_source_'):
         source_id = data.split('_')[-1]
         user_id = query.from_user.id
-        db = Database()
+        db = AsyncDatabase()
         
         try:
-            db.execute(
+            await db.execute(
                 "UPDATE user_settings SET default_source_id = %s "
                 "WHERE user_id = (SELECT id FROM users WHERE telegram_id = %s)",
                 (source_id, user_id),
                 commit=True
             )
+            invalidate_settings(user_id)
+            await notify(db, SETTINGS_CHANNEL, user_id, commit=True)
             
-            source_name = db.fetch_one("SELECT name FROM sources WHERE id = %s", (source_id,))[0]
+            source_name = (await db.fetch_one("SELECT name FROM sources WHERE id = %s", (source_id,)))[0]
             await query.edit_message_text(text=f"Источник по умолчанию установлен: {source_name}")
         except Exception as e:
             logger.error(f"Ошибка установки источника: {e}")
             await query.edit_message_text("Произошла ошибка при установке источника.")
         finally:
-            db.close()
+            await db.close()
     
     elif data == 'set_items_per_page':
         await query.edit_message_text("Введите количество новостей на страницу (1-20):")
         return SET_ITEMS_PER_PAGE
     
+    elif data == 'set_digest':
+        db = AsyncDatabase()
+        try:
+            row = await db.fetch_one(
+                "SELECT s.digest_mode, s.digest_time FROM user_settings s "
+                "JOIN users u ON u.id = s.user_id WHERE u.telegram_id = %s",
+                (query.from_user.id,)
+            )
+        finally:
+            await db.close()
+        current = digest.describe(*row) if row else digest.describe('off')
+        keyboard = [
+            [InlineKeyboardButton("Выключен", callback_data='digest_off')],
+            [InlineKeyboardButton("Каждый час", callback_data='digest_hourly')],
+            [InlineKeyboardButton("Раз в день", callback_data='digest_daily')],
+            [InlineKeyboardButton("Назад", callback_data='back_to_settings')]
+        ]
+        await query.edit_message_text(
+            text=f"Дайджест: {current}.\nВ режиме дайджеста новые статьи приходят одним сообщением по расписанию.",
+            reply_markup=InlineKeyboardMarkup(keyboard)
+        )
+    
+    elif data in ('digest_off', 'digest_hourly'):
+        mode = data.split('_')[-1]
+        try:
+            await save_digest_mode(query.from_user.id, mode)
+            await query.edit_message_text(text=f"Дайджест: {digest.describe(mode)}")
+        except Exception as e:
+            logger.error(f"Ошибка установки дайджеста: {e}")
+            await query.edit_message_text("Произошла ошибка при настройке дайджеста.")
+    
+    elif data == 'digest_daily':
+        await query.edit_message_text("Введите время дайджеста в формате ЧЧ:ММ (время сервера):")
+        return SET_DIGEST_TIME
+    
     elif data == 'back_to_settings':
         await settings_command(update, context)
         return ConversationHandler.END
@@ -191,19 +381,43 @@ async def settings_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     return ConversationHandler.END
 
+async def save_digest_mode(telegram_id, mode, at=None):
+    db = AsyncDatabase()
+    try:
+        await digest.save_mode(db, telegram_id, mode, at)
+        invalidate_settings(telegram_id)
+        await notify(db, SETTINGS_CHANNEL, telegram_id, commit=True)
+    finally:
+        await db.close()
+
+async def set_digest_time(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    at = digest.parse_time(update.message.text)
+    if at is None:
+        await update.message.reply_text("Введите время в формате ЧЧ:ММ, например 08:30")
+        return SET_DIGEST_TIME
+    try:
+        await save_digest_mode(update.message.from_user.id, 'daily', at)
+        await update.message.reply_text(f"Дайджест: {digest.describe('daily', at)}")
+    except Exception as e:
+        logger.error(f"Ошибка установки дайджеста: {e}")
+        await update.message.reply_text("Произошла ошибка при настройке дайджеста.")
+    return ConversationHandler.END
+
 async def set_items_per_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.message.from_user.id
-    db = Database()
+    db = AsyncDatabase()
     
     try:
         count = int(update.message.text)
         if 1 <= count <= 20:
-            db.execute(
+            await db.execute(
                 "UPDATE user_settings SET items_per_page = %s "
                 "WHERE user_id = (SELECT id FROM users WHERE telegram_id = %s)",
                 (count, user_id),
                 commit=True
             )
+            invalidate_settings(user_id)
+            await notify(db, SETTINGS_CHANNEL, user_id, commit=True)
             await update.message.reply_text(f"Установлено количество новостей: {count}")
         else:
             await update.message.reply_text("Введите число от 1 до 20")
@@ -213,35 +427,29 @@ async def set_items_per_page(update: Update, context: ContextTypes.DEFAULT_TYPE)
         logger.error(f"Ошибка установки количества новостей: {e}")
         await update.message.reply_text("Произошла ошибка при установке количества.")
     finally:
-        db.close()
+        await db.close()
     
     return ConversationHandler.END
 
-async def subscriptions_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = update.effective_user
-    db = Database()
+async def subscriptions_markup(telegram_id):
+    subscriptions = await coalesce.fetch_all(
+        "SELECT sub.source_id FROM subscriptions sub "
+        "WHERE sub.user_id = (SELECT id FROM users WHERE telegram_id = %s)",
+        (telegram_id,)
+    )
+    subscribed = {row[0] for row in subscriptions}
     
+    keyboard = []
+    for source_id, source_name in await coalesce.fetch_all(SOURCES_QUERY):
+        button_text = f"{'✅ ' if source_id in subscribed else '❌ '}{source_name}"
+        keyboard.append([InlineKeyboardButton(button_text, callback_data=f"toggle_sub_{source_id}")])
+    
+    keyboard.append([InlineKeyboardButton("Готово", callback_data='done_subs')])
+    return InlineKeyboardMarkup(keyboard)
+
+async def subscriptions_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        subscriptions = db.fetch_all(
-            "SELECT s.id, s.name FROM subscriptions sub "
-            "JOIN sources s ON sub.source_id = s.id "
-            "WHERE sub.user_id = (SELECT id FROM users WHERE telegram_id = %s)",
-            (user.id,)
-        )
-        
-        all_sources = db.fetch_all("SELECT id, name FROM sources")
-        
-        keyboard = []
-        for source in all_sources:
-            source_id, source_name = source
-            is_subscribed = any(sub[0] == source_id for sub in subscriptions)
-            button_text = f"{'✅ ' if is_subscribed else '❌ '}{source_name}"
-            callback_data = f"toggle_sub_{source_id}"
-            keyboard.append([InlineKeyboardButton(button_text, callback_data=callback_data)])
-        
-        keyboard.append([InlineKeyboardButton("Готово", callback_data='done_subs')])
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
+        reply_markup = await subscriptions_markup(update.effective_user.id)
         await update.message.reply_text(
             "📬 Управление подписками. Выберите источники:",
             reply_markup=reply_markup
@@ -249,8 +457,6 @@ async def subscriptions_command(update: Update, context: ContextTypes.DEFAULT_TY
     except Exception as e:
         logger.error(f"Ошибка получения подписок: {e}")
         await update.message.reply_text("Произошла ошибка при загрузке подписок.")
-    finally:
-        db.close()
 
 async def subscriptions_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
@@ -264,38 +470,50 @@ async def subscriptions_button(update: Update, context: ContextTypes.DEFAULT_TYP
     if data.startswith('toggle_sub_'):
         source_id = data.split('_')[-1]
         user_id = query.from_user.id
-        db = Database()
-        
         try:
-            is_subscribed = db.fetch_one(
-                "SELECT id FROM subscriptions WHERE "
-                "user_id = (SELECT id FROM users WHERE telegram_id = %s) AND source_id = %s",
-                (user_id, source_id)
-            )
-            
-            if is_subscribed:
-                db.execute(
-                    "DELETE FROM subscriptions WHERE "
-                    "user_id = (SELECT id FROM users WHERE telegram_id = %s) AND source_id = %s",
-                    (user_id, source_id),
-                    commit=True
-                )
-                logger.info(f"Пользователь {user_id} отписался от источника {source_id}")
-            else:
-                db.execute(
-                    "INSERT INTO subscriptions (user_id, source_id) VALUES "
-                    "((SELECT id FROM users WHERE telegram_id = %s), %s)",
-                    (user_id, source_id),
-                    commit=True
-                )
-                logger.info(f"Пользователь {user_id} подписался на источник {source_id}")
-            
-            await subscriptions_command(update, context)
+            await toggle_subscription(user_id, source_id)
+            await query.edit_message_reply_markup(reply_markup=await subscriptions_markup(user_id))
         except Exception as e:
             logger.error(f"Ошибка обновления подписки: {e}")
             await query.answer("Произошла ошибка. Попробуйте снова.", show_alert=True)
-        finally:
-            db.close()
+
+async def toggle_subscription(telegram_id, source_id):
+    """Подписка или отписка; сессия закрывается до построения клавиатуры (см. save_search_query)"""
+    db = AsyncDatabase()
+    try:
+        is_subscribed = await db.fetch_one(
+            "SELECT id FROM subscriptions WHERE "
+            "user_id = (SELECT id FROM users WHERE telegram_id = %s) AND source_id = %s",
+            (telegram_id, source_id)
+        )
+        
+        if is_subscribed:
+            await db.execute(
+                "DELETE FROM subscriptions WHERE "
+                "user_id = (SELECT id FROM users WHERE telegram_id = %s) AND source_id = %s",
+                (telegram_id, source_id),
+                commit=True
+            )
+            logger.info(f"Пользователь {telegram_id} отписался от источника {source_id}")
+        else:
+            await db.execute(
+                "INSERT INTO subscriptions (user_id, source_id) VALUES "
+                "((SELECT id FROM users WHERE telegram_id = %s), %s)",
+                (telegram_id, source_id),
+                commit=True
+            )
+            await db.execute(
+                "INSERT INTO delivery_watermarks (user_id, last_news_id) "
+                "SELECT id, COALESCE((SELECT MAX(id) FROM news), 0) FROM users WHERE telegram_id = %s "
+                "ON CONFLICT (user_id) DO UPDATE SET last_news_id = EXCLUDED.last_news_id "
+                "WHERE NOT EXISTS (SELECT 1 FROM subscriptions sub "
+                "WHERE sub.user_id = delivery_watermarks.user_id AND sub.source_id <> %s)",
+                (telegram_id, source_id),
+                commit=True
+            )
+            logger.info(f"Пользователь {telegram_id} подписался на источник {source_id}")
+    finally:
+        await db.close()
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     help_text = "Список доступных команд:\n\n"
@@ -307,20 +525,28 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.message:
         await update.message.reply_text("Произошла непредвиденная ошибка. Пожалуйста, попробуйте позже.")
 
+def handler(name, callback):
+    """Обработчик с метриками и ограничением частоты запросов пользователя"""
+    return instrument_handler(name, coalesce.guarded(callback))
+
 def setup_handlers(application):
-    application.add_handler(CommandHandler("start", start))
-    application.add_handler(CommandHandler("news", handle_news))
-    application.add_handler(CommandHandler("settings", settings_command))
-    application.add_handler(CommandHandler("subscriptions", subscriptions_command))
-    application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(CommandHandler("start", handler("start", start)))
+    application.add_handler(CommandHandler("news", handler("news", handle_news)))
+    application.add_handler(CommandHandler("search", handler("search", search_command)))
+    application.add_handler(CommandHandler("settings", handler("settings", settings_command)))
+    application.add_handler(CommandHandler("subscriptions", handler("subscriptions", subscriptions_command)))
+    application.add_handler(CommandHandler("help", handler("help", help_command)))
     
-    application.add_handler(CallbackQueryHandler(settings_button, pattern='^(set_default_source|set_source_|set_items_per_page|back_to)'))
-    application.add_handler(CallbackQueryHandler(subscriptions_button, pattern='^(toggle_sub_|done_subs)'))
+    application.add_handler(CallbackQueryHandler(handler("settings_button", settings_button), pattern='^(set_default_source|set_source_|set_items_per_page|set_digest|digest_(off|hourly)|back_to)'))
+    application.add_handler(CallbackQueryHandler(handler("subscriptions_button", subscriptions_button), pattern='^(toggle_sub_|done_subs)'))
+    application.add_handler(CallbackQueryHandler(handler("news_button", news_button), pattern='^news_[on]_'))
+    application.add_handler(CallbackQueryHandler(handler("search_button", search_button), pattern='^search_'))
     
     conv_handler = ConversationHandler(
-        entry_points=[CallbackQueryHandler(settings_button, pattern='^set_items_per_page$')],
+        entry_points=[CallbackQueryHandler(handler("settings_button", settings_button), pattern='^(set_items_per_page|digest_daily)$')],
         states={
-            SET_ITEMS_PER_PAGE: [MessageHandler(filters.TEXT & ~filters.COMMAND, set_items_per_page)]
+            SET_ITEMS_PER_PAGE: [MessageHandler(filters.TEXT & ~filters.COMMAND, handler("set_items_per_page", set_items_per_page))],
+            SET_DIGEST_TIME: [MessageHandler(filters.TEXT & ~filters.COMMAND, handler("set_digest_time", set_digest_time))]
         },
         fallbacks=[CommandHandler("cancel", lambda u, c: ConversationHandler.END)]
     )
@@ -328,22 +554,255 @@ def setup_handlers(application):
     
     application.add_error_handler(error_handler)
 
-def news_scheduler():
-    """Фоновый поток для периодического сбора новостей"""
+async def retention_job():
+    """Периодический перенос старых статей в архив"""
     while True:
         try:
-            fetch_all_news()
-            logger.info("Новости успешно обновлены")
+            await run_in_db(archive_old_news)
         except Exception as e:
-            logger.error(f"Ошибка при обновлении новостей: {e}")
-        time.sleep(1800)  
+            logger.error(f"Ошибка архивации новостей: {e}")
+        await asyncio.sleep(config.RETENTION_CONFIG['interval'])
 
-def main():
-    scheduler_thread = threading.Thread(target=news_scheduler, daemon=True)
-    scheduler_thread.start()
+def start_metrics(services):
+    """Сервер метрик; если порт занят (несколько копий на одном хосте), бот работает без него"""
+    if config.METRICS_CONFIG['enabled']:
+        profiler = None
+        if config.METRICS_CONFIG['profiler']:
+            profiler = SamplingProfiler(config.METRICS_CONFIG['profiler_interval']).start()
+        try:
+            server = MetricsServer(config.METRICS_CONFIG['host'], config.METRICS_CONFIG['port'], profiler)
+        except OSError as e:
+            logger.error(
+                f"Сервер метрик не запущен ({config.METRICS_CONFIG['host']}:{config.METRICS_CONFIG['port']}): {e}. "
+                "Задайте другой порт через --metrics-port или METRICS_PORT"
+            )
+            if profiler:
+                profiler.stop()
+            return
+        services['metrics'] = server.start()
+
+async def start_scraping(services):
+    """Сбор, обогащение и архивация: только на копии, получившей роль сборщика.
+
+    Об изменениях в news копии-серверы узнают через NOTIFY.
+    """
+    if config.SCRAPER_CONFIG['parse_mode'] == 'process':
+        await asyncio.to_thread(get_parse_pool)
+    try:
+        await asyncio.to_thread(url_filter.warm)
+    except Exception as e:
+        logger.error(f"Ошибка загрузки фильтра URL: {e}")
+
+    enrichment_config = dict(config.ENRICHMENT_CONFIG)
+    crawler = None
+    if enrichment_config.pop('enabled'):
+        crawler = EnrichmentCrawler(**enrichment_config)
+        crawler.start()
+        services['enrichment'] = crawler
+
+    def on_collected(spec, stats):
+        if stats.get('inserted') and crawler:
+            crawler.trigger()
+
+    scheduler = NewsScheduler(
+        SOURCES,
+        collect_source,
+        max_concurrent=config.SCRAPER_CONFIG['max_workers'],
+        timeout=config.SCRAPER_CONFIG['source_timeout'],
+        on_collected=on_collected,
+        **config.SCHEDULER_CONFIG
+    )
+    scheduler.start()
+    services['scheduler'] = scheduler
+    services['retention'] = asyncio.create_task(retention_job())
     logger.info("Служба сбора новостей запущена")
+
+async def stop_scraping(services):
+    retention = services.pop('retention', None)
+    if retention:
+        retention.cancel()
+    for name in ('scheduler', 'enrichment'):
+        service = services.pop(name, None)
+        if service:
+            await service.stop()
+    await asyncio.to_thread(close_parse_pool)
+    await asyncio.to_thread(url_filter.save)
+    logger.info("Служба сбора новостей остановлена")
+
+def scraper_election(services):
+    return LeaderElection(
+        'scraper', SCRAPER_LOCK_ID,
+        lambda: start_scraping(services),
+        lambda: stop_scraping(services),
+        config.CLUSTER_CONFIG['election_interval']
+    )
+
+def start_serving(application):
+    """Рассылка (одна копия на кластер) и подписка на уведомления об изменениях.
+
+    На каждый срок лидерства создаётся новый DeliveryEngine: очередь и
+    отметки отправки прошлого срока устарели, пока рассылкой занималась
+    другая копия.
+    """
+    term = {}
+
+    async def start_delivery():
+        delivery = DeliveryEngine(application.bot, **config.DELIVERY_CONFIG)
+        send_queue_size.set_function(delivery.queue.qsize)
+        delivery.start()
+        term['delivery'] = delivery
+
+    async def stop_delivery():
+        delivery = term.pop('delivery', None)
+        send_queue_size.set_function(lambda: 0)
+        if delivery:
+            await delivery.stop()
+
+    def trigger_delivery():
+        delivery = term.get('delivery')
+        if delivery:
+            delivery.trigger()
+
+    election = LeaderElection(
+        'delivery', DELIVERY_LOCK_ID, start_delivery, stop_delivery,
+        config.CLUSTER_CONFIG['election_interval']
+    )
+    election.start()
+
+    def on_news_changed(payload):
+        invalidate_news(payload['source_id'])
+        if payload.get('inserted'):
+            trigger_delivery()
+
+    def on_settings_changed(telegram_id):
+        invalidate_settings(telegram_id)
+
+    def on_connect():
+        # Пока соединения не было, уведомления терялись
+        news_cache.invalidate()
+        settings_cache.invalidate()
+        trigger_delivery()
+
+    listener = NotificationListener(
+        {NEWS_CHANNEL: on_news_changed, SETTINGS_CHANNEL: on_settings_changed},
+        on_connect=on_connect,
+        reconnect_delay=config.CLUSTER_CONFIG['reconnect_delay']
+    )
+    listener.start()
+    application.bot_data['delivery_election'] = election
+    application.bot_data['listener'] = listener
+
+async def on_startup(application):
+    role = application.bot_data.get('role', config.BOT_ROLE)
+    start_metrics(application.bot_data)
+    start_serving(application)
+    if role == 'all':
+        election = scraper_election(application.bot_data)
+        election.start()
+        application.bot_data['scraper_election'] = election
+
+async def on_shutdown(application):
+    for name in ('listener', 'scraper_election', 'delivery_election'):
+        service = application.bot_data.get(name)
+        if service:
+            await service.stop()
+    metrics_server = application.bot_data.get('metrics')
+    if metrics_server:
+        metrics_server.stop()
+    close_pool()
+
+async def run_scraper():
+    """Отдельный процесс сборщика без подключения к Telegram"""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    services = {}
+    start_metrics(services)
+    election = scraper_election(services)
+    election.start()
+    logger.info("Сборщик запущен, ожидание роли...")
+    try:
+        await stop_event.wait()
+    finally:
+        await election.stop()
+        if 'metrics' in services:
+            services['metrics'].stop()
+        close_pool()
+
+async def run_webhook(application):
+    """Работа через webhook: обновления принимает встроенный HTTP-сервер"""
+    webhook_config = config.WEBHOOK_CONFIG
+    if not webhook_config['secret_token']:
+        raise RuntimeError("Для режима webhook задайте WEBHOOK_SECRET")
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    await application.initialize()
+    await on_startup(application)
+    await application.start()
+    server = WebhookServer(
+        application,
+        host=webhook_config['host'],
+        port=webhook_config['port'],
+        path=webhook_config['path'],
+        secret_token=webhook_config['secret_token'],
+        max_concurrent=webhook_config['max_concurrent']
+    )
+    await server.start()
+    await application.bot.set_webhook(
+        url=webhook_config['url'],
+        secret_token=webhook_config['secret_token'],
+        allowed_updates=Update.ALL_TYPES
+    )
+    logger.info("Бот запущен в режиме webhook...")
+
+    try:
+        await stop_event.wait()
+    finally:
+        await server.stop(webhook_config['drain_timeout'])
+        await application.stop()
+        await on_shutdown(application)
+        await application.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="Новостной Telegram-бот")
+    parser.add_argument(
+        '--role', choices=('all', 'scraper', 'server'), default=config.BOT_ROLE,
+        help="scraper — только сбор новостей, server — только работа с пользователями"
+    )
+    parser.add_argument(
+        '--metrics-port', type=int, default=config.METRICS_CONFIG['port'],
+        help="порт сервера метрик; у каждого процесса на хосте свой, 0 — любой свободный"
+    )
+    args = parser.parse_args()
+    config.METRICS_CONFIG['port'] = args.metrics_port
+
+    apply_migrations()
+    register_sources()
+
+    if args.role == 'scraper':
+        asyncio.run(run_scraper())
+        return
     
-    application = Application.builder().token(config.BOT_TOKEN).build()
+    if config.BOT_MODE == 'webhook':
+        application = Application.builder().token(config.BOT_TOKEN).build()
+        application.bot_data['role'] = args.role
+        setup_handlers(application)
+        asyncio.run(run_webhook(application))
+        return
+    
+    application = (
+        Application.builder()
+        .token(config.BOT_TOKEN)
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
+    application.bot_data['role'] = args.role
     setup_handlers(application)
     
     logger.info("Бот запущен...")
@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import OrderedDict
+
+from config import CACHE_CONFIG
+
+
+class TTLCache:
+    """Потокобезопасный LRU-кэш с ограничением размера и временем жизни.
+
+    invalidate() увеличивает version. Значение, прочитанное из БД до
+    инвалидации, не попадёт в кэш: set() принимает версию, полученную до
+    запроса, и игнорирует запись, если она устарела.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, version=None):
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, predicate=None):
+        with self._lock:
+            self.version += 1
+            if predicate is None:
+                self._data.clear()
+                return
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+    def __len__(self):
+        return len(self._data)
+
+
+news_cache = TTLCache(CACHE_CONFIG['news_maxsize'], CACHE_CONFIG['news_ttl'])
+settings_cache = TTLCache(CACHE_CONFIG['settings_maxsize'], CACHE_CONFIG['settings_ttl'])
+
+
+def invalidate_news(source_id):
+    """Сброс списков последних новостей источника и общего списка"""
+    news_cache.invalidate(lambda key: key[0] in (source_id, None))
+
+
+def invalidate_settings(telegram_id):
+    settings_cache.invalidate(lambda key: key == telegram_id)
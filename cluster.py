@@ -0,0 +1,220 @@
+"""Работа нескольких копий бота с одной БД.
+
+Сбор новостей и рассылку выполняет только одна копия: та, что удерживает
+соответствующий advisory lock PostgreSQL. Блокировка сессионная и держится
+на отдельном соединении, поэтому при падении процесса или обрыве связи
+сервер освобождает её сам, и роль переходит к другой копии.
+
+Сборщик после записи новых статей отправляет NOTIFY в той же транзакции,
+копии, обслуживающие пользователей, слушают канал (LISTEN) и сразу
+сбрасывают кэши и запускают рассылку.
+"""
+import asyncio
+import json
+import logging
+
+import psycopg2
+from psycopg2 import extensions
+
+import config
+
+logger = logging.getLogger(__name__)
+
+SCRAPER_LOCK_ID = 7301002
+DELIVERY_LOCK_ID = 7301003
+NEWS_CHANNEL = 'news_changed'
+SETTINGS_CHANNEL = 'settings_changed'
+KEEPALIVE = {'keepalives': 1, 'keepalives_idle': 30, 'keepalives_interval': 10, 'keepalives_count': 3}
+
+
+def connect():
+    """Отдельное соединение вне пула: для блокировок и LISTEN"""
+    connection = psycopg2.connect(**{**KEEPALIVE, **config.DB_CONFIG})
+    connection.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+    return connection
+
+
+def notify(db, channel, payload, commit=False):
+    """NOTIFY в текущей транзакции db: уйдёт подписчикам только после commit.
+
+    Подходит и для AsyncDatabase: тогда результат нужно дождаться (await).
+    """
+    return db.execute("SELECT pg_notify(%s, %s)", (channel, json.dumps(payload)), commit=commit)
+
+
+class LeaderLock:
+    """Сессионный advisory lock на выделенном соединении"""
+
+    def __init__(self, lock_id):
+        self.lock_id = lock_id
+        self._connection = None
+
+    @property
+    def held(self):
+        return self._connection is not None
+
+    def try_acquire(self):
+        if self._connection is None:
+            connection = connect()
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_lock(%s)", (self.lock_id,))
+                acquired = cursor.fetchone()[0]
+            if not acquired:
+                connection.close()
+                return False
+            self._connection = connection
+        return True
+
+    def check(self):
+        """Соединение живо, значит блокировка всё ещё наша"""
+        if self._connection is None:
+            return False
+        try:
+            with self._connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            return True
+        except psycopg2.Error:
+            self._drop()
+            return False
+
+    def release(self):
+        if self._connection is None:
+            return
+        try:
+            with self._connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (self.lock_id,))
+        except psycopg2.Error as e:
+            logger.warning(f"Не удалось снять блокировку {self.lock_id}: {e}")
+        finally:
+            self._drop()
+
+    def _drop(self):
+        connection, self._connection = self._connection, None
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+
+
+class LeaderElection:
+    """Периодическая попытка стать ведущим для роли.
+
+    Получив блокировку, вызывает on_elected; потеряв её (обрыв соединения),
+    вызывает on_deposed и снова пытается её получить. Между потерей связи и
+    её обнаружением возможен короткий период с двумя ведущими: запись новостей
+    идемпотентна (ON CONFLICT), рассылка сдвигает отметки условно.
+    """
+
+    def __init__(self, name, lock_id, on_elected, on_deposed, interval=10):
+        self.name = name
+        self.lock = LeaderLock(lock_id)
+        self.on_elected = on_elected
+        self.on_deposed = on_deposed
+        self.interval = interval
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.lock.held:
+            await self.on_deposed()
+            await asyncio.to_thread(self.lock.release)
+
+    async def _loop(self):
+        while True:
+            try:
+                if self.lock.held:
+                    if not await asyncio.to_thread(self.lock.check):
+                        logger.warning(f"Потеряна роль {self.name}")
+                        await self.on_deposed()
+                elif await asyncio.to_thread(self.lock.try_acquire):
+                    logger.info(f"Эта копия выполняет роль {self.name}")
+                    await self.on_elected()
+            except Exception as e:
+                logger.error(f"Ошибка выбора ведущего для {self.name}: {e}")
+            await asyncio.sleep(self.interval)
+
+
+class NotificationListener:
+    """LISTEN на выделенном соединении, чтение через add_reader цикла событий.
+
+    handlers — словарь канал -> функция(payload), payload уже разобран из
+    JSON. on_connect вызывается при каждом (пере)подключении: уведомления,
+    отправленные, пока соединения не было, потеряны, и состояние нужно
+    перечитать.
+    """
+
+    def __init__(self, handlers, on_connect=None, reconnect_delay=5):
+        self.handlers = handlers
+        self.on_connect = on_connect
+        self.reconnect_delay = reconnect_delay
+        self._connection = None
+        self._fileno = None
+        self._loop = None
+        self._task = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self._connect_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._disconnect()
+
+    async def _connect_loop(self):
+        while self._connection is None:
+            connection = None
+            try:
+                connection = await asyncio.to_thread(connect)
+                with connection.cursor() as cursor:
+                    for channel in self.handlers:
+                        cursor.execute(f"LISTEN {channel}")
+            except psycopg2.Error as e:
+                if connection is not None:
+                    connection.close()
+                logger.error(f"Не удалось подписаться на уведомления: {e}")
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+            self._connection = connection
+            self._fileno = connection.fileno()
+            self._loop.add_reader(self._fileno, self._on_readable)
+            logger.info(f"Подписка на каналы: {', '.join(self.handlers)}")
+            if self.on_connect:
+                self.on_connect()
+
+    def _on_readable(self):
+        try:
+            self._connection.poll()
+        except psycopg2.Error as e:
+            logger.warning(f"Соединение для уведомлений потеряно: {e}")
+            self._disconnect()
+            self._task = self._loop.create_task(self._connect_loop())
+            return
+
+        while self._connection.notifies:
+            notification = self._connection.notifies.pop(0)
+            handler = self.handlers.get(notification.channel)
+            if handler is None:
+                continue
+            try:
+                handler(json.loads(notification.payload) if notification.payload else None)
+            except Exception as e:
+                logger.error(f"Ошибка обработки уведомления {notification.channel}: {e}")
+
+    def _disconnect(self):
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        self._loop.remove_reader(self._fileno)
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
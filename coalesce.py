@@ -0,0 +1,143 @@
+"""Защита БД и лимита Telegram при всплесках запросов.
+
+SingleFlight объединяет одинаковые чтения, выполняющиеся одновременно:
+первый обработчик запускает запрос, остальные ждут его результат. Кэш
+(cache.py) отвечает на повторные запросы после ответа БД, SingleFlight —
+на одновременные, пока кэш ещё пуст или был сброшен.
+
+UserThrottle ограничивает частоту обновлений от одного пользователя
+(token bucket), Debouncer отбрасывает повторные нажатия одной и той же
+кнопки. guarded() применяет оба к обработчику бота.
+"""
+import asyncio
+import functools
+import logging
+import time
+from collections import OrderedDict
+
+import metrics
+from config import COALESCE_CONFIG
+from database import AsyncDatabase
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Один выполняющийся запрос на ключ, результат получают все ожидающие.
+
+    Запрос выполняется в отдельной задаче: отмена одного ожидающего (например,
+    по таймауту обработчика) не прерывает запрос для остальных.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, fn, *args):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn(*args))
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            metrics.coalesced_reads.inc()
+        return await asyncio.shield(task)
+
+    def __len__(self):
+        return len(self._calls)
+
+
+class UserThrottle:
+    """Token bucket на пользователя: burst обновлений сразу, далее rate в секунду.
+
+    Хранится состояние не больше max_users пользователей (LRU): у вытесненного
+    пользователя ведро снова полное, что для давно неактивных и так верно.
+    rate=0 отключает ограничение.
+    """
+
+    def __init__(self, rate=1.0, burst=5, max_users=100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_users = max_users
+        self._buckets = OrderedDict()
+
+    def allow(self, user_id, now=None):
+        if not self.rate:
+            return True
+        now = time.monotonic() if now is None else now
+        tokens, updated = self._buckets.pop(user_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[user_id] = (tokens, now)
+        if len(self._buckets) > self.max_users:
+            self._buckets.popitem(last=False)
+        return allowed
+
+
+class Debouncer:
+    """Повтор того же ключа раньше чем через interval секунд считается дублем"""
+
+    def __init__(self, interval=1.0, max_keys=100000):
+        self.interval = interval
+        self.max_keys = max_keys
+        self._seen = OrderedDict()
+
+    def repeated(self, key, now=None):
+        now = time.monotonic() if now is None else now
+        last = self._seen.pop(key, None)
+        self._seen[key] = now
+        if len(self._seen) > self.max_keys:
+            self._seen.popitem(last=False)
+        return last is not None and now - last < self.interval
+
+
+reads = SingleFlight()
+throttle = UserThrottle(COALESCE_CONFIG['user_rate'], COALESCE_CONFIG['user_burst'], COALESCE_CONFIG['max_users'])
+debouncer = Debouncer(COALESCE_CONFIG['debounce_interval'], COALESCE_CONFIG['max_users'])
+
+
+async def _read(method, query, params):
+    db = AsyncDatabase()
+    try:
+        return await getattr(db, method)(query, params, raise_errors=True)
+    finally:
+        await db.close()
+
+
+async def fetch_all(query, params=()):
+    """fetch_all на отдельном соединении, одинаковые одновременные запросы объединяются.
+
+    Ошибка БД выбрасывается всем ожидающим, а не превращается в пустой
+    результат: иначе его разделили бы все они и он попал бы в кэш.
+    """
+    return await reads.do(('fetch_all', query, tuple(params)), _read, 'fetch_all', query, params)
+
+
+async def fetch_one(query, params=()):
+    return await reads.do(('fetch_one', query, tuple(params)), _read, 'fetch_one', query, params)
+
+
+def guarded(callback, throttle=throttle, debouncer=debouncer):
+    """Обёртка обработчика: лимит частоты на пользователя и защита от двойных нажатий.
+
+    Лишние сообщения отбрасываются без ответа, чтобы не тратить лимит
+    отправки; на лишние нажатия кнопок отвечается answer(), иначе Telegram
+    показывает у кнопки индикатор загрузки.
+    """
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        user = update.effective_user
+        query = update.callback_query
+        if user is not None:
+            if query is not None and debouncer.repeated((user.id, query.data)):
+                metrics.throttled_updates.inc(reason='debounce')
+                await query.answer()
+                return None
+            if not throttle.allow(user.id):
+                metrics.throttled_updates.inc(reason='rate')
+                if query is not None:
+                    await query.answer("Слишком часто, подождите немного")
+                return None
+        return await callback(update, context)
+    return wrapper
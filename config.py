@@ -13,3 +13,148 @@ DB_CONFIG = {
     'port': '5432'
 }
 
+
+DB_POOL_CONFIG = {
+    'minconn': 1,
+    'maxconn': 10,
+    'checkout_timeout': 5,
+    'health_check_interval': 30
+}
+
+SCRAPER_CONFIG = {
+    'max_workers': 4,
+    'source_timeout': 10,
+    'cycle_deadline': 60,
+    'fetch_cache_path': 'fetch_cache.json',
+    'sources_path': 'sources.json',
+    # 'thread' — разбор в потоке сборщика, 'process' — в пуле процессов
+    # parse_workers, чтобы разбор не занимал GIL процесса бота
+    'parse_mode': 'thread',
+    'parse_workers': 2
+}
+
+SCHEDULER_CONFIG = {
+    'min_interval': 60,
+    'max_interval': 7200,
+    'jitter': 0.1,
+    'max_backoff': 1800,
+    'target_items': 3
+}
+
+DELIVERY_CONFIG = {
+    'global_rate': 30,
+    'per_chat_interval': 1.0,
+    'max_headlines': 10,
+    'workers': 8,
+    'max_attempts': 5,
+    'digest_per_source': 5,
+    'digest_interval': 60,
+    # столько раз подряд Telegram отклоняет сообщение, прежде чем статьи пропускаются
+    'max_rejections': 3
+}
+
+CACHE_CONFIG = {
+    'news_maxsize': 256,
+    'news_ttl': 600,
+    'settings_maxsize': 10000,
+    'settings_ttl': 3600
+}
+
+# Лимит обновлений от одного пользователя (token bucket) и интервал,
+# в течение которого повторное нажатие той же кнопки игнорируется
+COALESCE_CONFIG = {
+    'user_rate': 1.0,
+    'user_burst': 5,
+    'debounce_interval': 1.0,
+    'max_users': 100000
+}
+
+RETENTION_CONFIG = {
+    'archive_after_days': 90,
+    'batch_size': 10000,
+    'interval': 86400
+}
+
+METRICS_CONFIG = {
+    'enabled': True,
+    'host': '127.0.0.1',
+    # у каждого процесса на одном хосте должен быть свой порт (METRICS_PORT или --metrics-port)
+    'port': int(os.getenv('METRICS_PORT', '9108')),
+    'profiler': False,
+    'profiler_interval': 0.01
+}
+
+# 'polling' для разработки, 'webhook' для работы за HTTPS-прокси
+BOT_MODE = 'polling'
+
+WEBHOOK_CONFIG = {
+    'url': 'https://example.com/telegram',
+    'host': '127.0.0.1',
+    'port': 8443,
+    'path': '/telegram',
+    'secret_token': os.getenv('WEBHOOK_SECRET', ''),
+    'max_concurrent': 64,
+    'drain_timeout': 30
+}
+
+# Отпечатки сохранённых URL (url_filter.py): ~8 МБ памяти и диска на миллион статей
+URL_FILTER_CONFIG = {
+    'enabled': True,
+    'path': 'url_filter.bin',
+    'merge_threshold': 50000,
+    'save_interval': 300
+}
+
+DEDUP_CONFIG = {
+    'max_items': 5000,
+    'num_perm': 64,
+    'bands': 16,
+    'threshold': 0.5,
+    'shingle_size': 4
+}
+
+SEARCH_CONFIG = {
+    'page_size': 5,
+    'max_pages': 20,
+    'max_query_length': 200
+}
+
+ENRICHMENT_CONFIG = {
+    'enabled': True,
+    'concurrency': 16,
+    'per_host': 2,
+    'host_interval': 1.0,
+    'batch_size': 100,
+    'host_batch': 10,
+    'lease': 300,
+    'max_attempts': 4,
+    'retry_delay': 60,
+    'timeout': 10,
+    'max_bytes': 512 * 1024,
+    'poll_interval': 30
+}
+
+HTTP_CONFIG = {
+    'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'timeout': 10,
+    'max_bytes': 5 * 1024 * 1024,
+    'pool_connections': 32,
+    'pool_maxsize': 8,
+    'retries': 3,
+    'backoff_factor': 0.5,
+    'dns_ttl': 300
+}
+
+# Роли копий: 'all' — всё в одном процессе, 'scraper' — только сбор,
+# 'server' — только работа с пользователями (задаётся и флагом --role)
+BOT_ROLE = os.getenv('BOT_ROLE', 'all')
+
+CLUSTER_CONFIG = {
+    'election_interval': 10,
+    'reconnect_delay': 5
+}
+
+EXPORT_CONFIG = {
+    'batch_size': 5000,
+    'progress_every': 1000000
+}
@@ -1,25 +1,172 @@
+import asyncio
+import contextvars
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import psycopg2
-from psycopg2 import OperationalError
-from config import DB_CONFIG
+from psycopg2 import OperationalError, extensions
+from psycopg2.extras import execute_values
+from psycopg2.pool import PoolError
+from config import DB_CONFIG, DB_POOL_CONFIG
+from metrics import db_timer
+
+
+class PoolTimeoutError(Exception):
+    """Не удалось получить соединение из пула за отведённое время"""
+
+
+class ConnectionPool:
+    """Потокобезопасный пул соединений с PostgreSQL.
+
+    Соединения переиспользуются между запросами, при нехватке свободных
+    getconn() ждёт не дольше checkout_timeout секунд. Соединение, простоявшее
+    без дела дольше health_check_interval, перед выдачей проверяется SELECT 1.
+    """
+
+    def __init__(self, minconn=1, maxconn=10, checkout_timeout=5, health_check_interval=30, **connect_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self._connect_kwargs = connect_kwargs
+        self._idle = []
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        for _ in range(minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    def _connect(self):
+        connection = psycopg2.connect(**self._connect_kwargs)
+        print("Успешное подключение к PostgreSQL")
+        return connection
+
+    def _is_healthy(self, connection, last_used):
+        if connection.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _release_slot(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def getconn(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolError("Пул соединений закрыт")
+                if self._idle:
+                    connection, last_used = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    self._size += 1
+                    connection, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeoutError(
+                        f"нет свободных соединений ({self.maxconn}) в течение {self.checkout_timeout} с"
+                    )
+                self._cond.wait(remaining)
+
+        if connection is not None:
+            if self._is_healthy(connection, last_used):
+                return connection
+            print("Соединение с PostgreSQL не прошло проверку, переподключение")
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+        try:
+            return self._connect()
+        except Exception:
+            self._release_slot()
+            raise
+
+    def putconn(self, connection):
+        if not connection.closed:
+            try:
+                if connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+            except Exception:
+                connection.close()
+
+        with self._cond:
+            if connection.closed or self._closed:
+                self._size -= 1
+                if not connection.closed:
+                    connection.close()
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for connection, _ in idle:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if not DB_CONFIG.get('password'):
+                    print("Внимание: пароль для БД не указан в конфигурации!")
+                _pool = ConnectionPool(**DB_POOL_CONFIG, **DB_CONFIG)
+    return _pool
+
+
+def close_pool():
+    """Закрытие всех соединений пула (при остановке бота)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            print("Соединения с PostgreSQL закрыты")
+
 
 class Database:
-    def __init__(self):
+    _stream_ids = itertools.count(1)
+
+    def __init__(self, pool=None):
         self.connection = None
         self.cursor = None
-        
-        if not DB_CONFIG.get('password'):
-            print("Внимание: пароль для БД не указан в конфигурации!")
-        
+        self._pool = None
+
         try:
-            self.connection = psycopg2.connect(
-                dbname=DB_CONFIG['dbname'],
-                user=DB_CONFIG['user'],
-                password=DB_CONFIG['password'],
-                host=DB_CONFIG['host'],
-                port=DB_CONFIG['port']
-            )
+            self._pool = pool or get_pool()
+            self.connection = self._pool.getconn()
             self.cursor = self.connection.cursor()
-            print("Успешное подключение к PostgreSQL")
+        except PoolTimeoutError as e:
+            print(f"Пул соединений исчерпан: {e}")
         except OperationalError as e:
             print(f"Ошибка подключения к PostgreSQL: {e}")
         except KeyError as e:
@@ -31,11 +178,12 @@ class Database:
         if not self.connection:
             print("Нет подключения к БД. Запрос не выполнен.")
             return None
-            
+
         try:
-            self.cursor.execute(query, params or ())
-            if commit:
-                self.connection.commit()
+            with db_timer('execute'):
+                self.cursor.execute(query, params or ())
+                if commit:
+                    self.connection.commit()
             return self.cursor
         except Exception as e:
             print(f"Ошибка выполнения SQL-запроса: {e}")
@@ -43,36 +191,175 @@ class Database:
                 self.connection.rollback()
             return None
 
-    def fetch_one(self, query, params=None):
+    def fetch_one(self, query, params=None, raise_errors=False):
+        """Первая строка результата или None (и при ошибке, если не raise_errors)"""
         if not self.connection:
+            if raise_errors:
+                raise OperationalError("Нет подключения к БД")
             return None
         try:
-            self.cursor.execute(query, params or ())
-            return self.cursor.fetchone()
+            with db_timer('fetch_one'):
+                self.cursor.execute(query, params or ())
+                return self.cursor.fetchone()
         except Exception as e:
             print(f"Ошибка при получении данных: {e}")
+            if raise_errors:
+                raise
             return None
 
-    def fetch_all(self, query, params=None):
+    def fetch_all(self, query, params=None, raise_errors=False):
+        """Все строки результата; при ошибке [] или, с raise_errors, исключение.
+
+        raise_errors нужен там, где результат кэшируется: пустой список после
+        сбоя нельзя отличить от пустой выборки.
+        """
         if not self.connection:
+            if raise_errors:
+                raise OperationalError("Нет подключения к БД")
             return []
         try:
-            self.cursor.execute(query, params or ())
-            return self.cursor.fetchall()
+            with db_timer('fetch_all'):
+                self.cursor.execute(query, params or ())
+                return self.cursor.fetchall()
         except Exception as e:
             print(f"Ошибка при получении данных: {e}")
+            if raise_errors:
+                raise
             return []
 
+    def stream(self, query, params=None, batch_size=2000):
+        """Построчное чтение большой выборки через именованный (серверный) курсор.
+
+        Строки запрашиваются у сервера пачками по batch_size, так что память
+        клиента не зависит от размера результата. Курсор живёт внутри
+        транзакции: пока генератор не исчерпан или не закрыт, соединение
+        занято, по завершении транзакция откатывается, поэтому незафиксированные
+        изменения на этом соединении нужно закоммитить до вызова.
+        В отличие от fetch_all ошибка не превращается в пустой результат,
+        иначе выгрузка молча оборвалась бы на середине.
+        """
+        if not self.connection:
+            raise OperationalError("Нет подключения к БД")
+
+        cursor = self.connection.cursor(name=f'stream_{next(Database._stream_ids)}')
+        cursor.itersize = batch_size
+        try:
+            with db_timer('stream'):
+                cursor.execute(query, params or ())
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            try:
+                cursor.close()
+            except psycopg2.Error:
+                pass
+            self.connection.rollback()
+
+    def execute_values(self, query, argslist, template=None, commit=False):
+        """Многострочная вставка одним запросом; возвращает строки RETURNING"""
+        if not self.connection:
+            print("Нет подключения к БД. Запрос не выполнен.")
+            return None
+
+        try:
+            with db_timer('execute_values'):
+                rows = execute_values(
+                    self.cursor, query, argslist,
+                    template=template, page_size=max(len(argslist), 1), fetch=True
+                )
+                if commit:
+                    self.connection.commit()
+            return rows
+        except Exception as e:
+            print(f"Ошибка выполнения SQL-запроса: {e}")
+            self.connection.rollback()
+            return None
+
     def close(self):
-        """Явное закрытие соединения с базой данных"""
+        """Возврат соединения в пул"""
         try:
             if self.cursor:
                 self.cursor.close()
             if self.connection:
-                self.connection.close()
-                print("Соединение с PostgreSQL закрыто")
+                self._pool.putconn(self.connection)
         except Exception as e:
             print(f"Ошибка при закрытии соединения: {e}")
         finally:
             self.cursor = None
-            self.connection = None
\ No newline at end of file
+            self.connection = None
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_sessions = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=DB_POOL_CONFIG['maxconn'],
+                    thread_name_prefix='db'
+                )
+    return _executor
+
+
+async def run_in_db(func, *args):
+    """Выполнение блокирующего вызова psycopg2 вне цикла событий"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_get_executor(), context.run, func, *args)
+
+
+class AsyncDatabase:
+    """Асинхронная обёртка над Database для обработчиков бота.
+
+    Соединение берётся из пула при первом запросе и возвращается в close().
+    Число одновременных сессий ограничено размером пула, поэтому ожидание
+    свободного соединения происходит в цикле событий, а не в занятом потоке.
+    """
+
+    def __init__(self):
+        self._db = None
+
+    async def _get_db(self):
+        global _sessions
+        if self._db is None:
+            if _sessions is None:
+                _sessions = asyncio.Semaphore(DB_POOL_CONFIG['maxconn'])
+            try:
+                await asyncio.wait_for(_sessions.acquire(), DB_POOL_CONFIG['checkout_timeout'])
+            except asyncio.TimeoutError:
+                raise PoolTimeoutError("нет свободных соединений для обработчика")
+            try:
+                self._db = await run_in_db(Database)
+            except BaseException:
+                _sessions.release()
+                raise
+        return self._db
+
+    async def execute(self, query, params=None, commit=False):
+        db = await self._get_db()
+        return await run_in_db(db.execute, query, params, commit)
+
+    async def fetch_one(self, query, params=None, raise_errors=False):
+        db = await self._get_db()
+        return await run_in_db(db.fetch_one, query, params, raise_errors)
+
+    async def fetch_all(self, query, params=None, raise_errors=False):
+        db = await self._get_db()
+        return await run_in_db(db.fetch_all, query, params, raise_errors)
+
+    async def close(self):
+        if self._db is None:
+            return
+        db, self._db = self._db, None
+        try:
+            await run_in_db(db.close)
+        finally:
+            _sessions.release()
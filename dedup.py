@@ -0,0 +1,154 @@
+import logging
+import random
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+from config import DEDUP_CONFIG
+
+logger = logging.getLogger(__name__)
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+NON_WORD = re.compile(r'[^\w]+', re.UNICODE)
+
+
+def normalize_title(title):
+    title = title.lower().replace('ё', 'е')
+    return NON_WORD.sub(' ', title).strip()
+
+
+def shingles(title, size=4):
+    text = normalize_title(title)
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class MinHasher:
+    def __init__(self, num_perm=64, seed=1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._params = [
+            (rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME)) for _ in range(num_perm)
+        ]
+
+    def signature(self, shingle_set):
+        hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingle_set]
+        if not hashes:
+            return None
+        return tuple(
+            min((a * h + b) % MERSENNE_PRIME for h in hashes) & MAX_HASH
+            for a, b in self._params
+        )
+
+
+def similarity(first, second):
+    return sum(1 for a, b in zip(first, second) if a == b) / len(first)
+
+
+class StoryIndex:
+    """Инкрементальная кластеризация заголовков в сюжеты (MinHash + LSH).
+
+    Хранит сигнатуры последних max_items статей. Сигнатура делится на bands
+    полос, статьи с совпавшей полосой становятся кандидатами, и из них
+    выбирается самая похожая с оценкой сходства по Жаккару не ниже threshold.
+    Стоимость добавления не зависит от размера таблицы news: число кандидатов
+    ограничено окном последних статей.
+    """
+
+    def __init__(self, max_items=5000, num_perm=64, bands=16, threshold=0.5, shingle_size=4):
+        if num_perm % bands:
+            raise ValueError("num_perm должен делиться на bands")
+        self.max_items = max_items
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.hasher = MinHasher(num_perm)
+        self.warmed = False
+        self._items = OrderedDict()
+        self._buckets = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def _band_keys(self, signature):
+        return [
+            (band, signature[band * self.rows:(band + 1) * self.rows])
+            for band in range(self.bands)
+        ]
+
+    def _evict(self):
+        while len(self._items) > self.max_items:
+            news_id, (signature, _) = self._items.popitem(last=False)
+            self._unlink(news_id, signature)
+
+    def _unlink(self, news_id, signature):
+        for key in self._band_keys(signature):
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(news_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def _best_match(self, signature):
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates |= self._buckets.get(key, set())
+
+        best_story, best_score = None, self.threshold
+        for candidate in candidates:
+            candidate_signature, story_id = self._items[candidate]
+            score = similarity(signature, candidate_signature)
+            if score >= best_score:
+                best_story, best_score = story_id, score
+        return best_story
+
+    def assign(self, news_id, title, story_id=None):
+        """Добавление статьи; возвращает id сюжета (id первой статьи кластера)"""
+        signature = self.hasher.signature(shingles(title, self.shingle_size))
+        if signature is None:
+            return story_id or news_id
+
+        with self._lock:
+            if story_id is None:
+                story_id = self._best_match(signature) or news_id
+            self._items[news_id] = (signature, story_id)
+            for key in self._band_keys(signature):
+                self._buckets.setdefault(key, set()).add(news_id)
+            self._evict()
+        return story_id
+
+    def remove(self, news_ids):
+        with self._lock:
+            for news_id in news_ids:
+                entry = self._items.pop(news_id, None)
+                if entry is not None:
+                    self._unlink(news_id, entry[0])
+
+    def warm(self, db):
+        """Загрузка последних статей из БД при первом использовании.
+
+        Загрузка идёт под блокировкой, так что assign из других потоков ждёт
+        её окончания, а не работает с наполовину заполненным индексом.
+        warmed ставится только после успешного чтения: ошибка БД
+        выбрасывается, и следующий вызов повторит попытку.
+        """
+        with self._lock:
+            if self.warmed:
+                return
+            rows = db.fetch_all(
+                "SELECT id, title, story_id FROM news ORDER BY id DESC LIMIT %s",
+                (self.max_items,),
+                raise_errors=True
+            )
+            for news_id, title, story_id in reversed(rows):
+                self.assign(news_id, title, story_id)
+            self.warmed = True
+        logger.info(f"Story index warmed with {len(rows)} items")
+
+
+story_index = StoryIndex(**DEDUP_CONFIG)
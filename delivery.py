@@ -0,0 +1,327 @@
+import asyncio
+import html
+import logging
+import time
+from datetime import timedelta
+
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+
+from database import Database, run_in_db
+from digest import fetch_digests
+
+logger = logging.getLogger(__name__)
+
+PENDING_QUERY = (
+    "SELECT user_id, telegram_id, last_id, total, story_id, title, url FROM ("
+    "  SELECT w.user_id, u.telegram_id, n.id, n.title, n.url, COALESCE(n.story_id, n.id) AS story_id,"
+    "         MAX(n.id) OVER (PARTITION BY w.user_id) AS last_id,"
+    "         COUNT(*) OVER (PARTITION BY w.user_id) AS total,"
+    "         ROW_NUMBER() OVER (PARTITION BY w.user_id ORDER BY n.id DESC) AS rn"
+    "  FROM delivery_watermarks w"
+    "  JOIN users u ON u.id = w.user_id"
+    "  JOIN subscriptions sub ON sub.user_id = w.user_id"
+    "  JOIN news n ON n.source_id = sub.source_id AND n.id > w.last_news_id"
+    "  WHERE NOT EXISTS ("
+    "    SELECT 1 FROM user_settings s WHERE s.user_id = w.user_id AND s.digest_mode <> 'off'"
+    "  )"
+    ") pending WHERE rn <= %s ORDER BY user_id, id"
+)
+
+
+def fetch_pending(max_headlines):
+    """Новые статьи для всех подписчиков одним запросом.
+
+    Для каждого пользователя возвращаются не больше max_headlines последних
+    статей и last_id — максимальный id, до которого сдвигается его отметка
+    доставки после отправки. Статьи одного сюжета из разных источников
+    схлопываются в один заголовок. Пользователи в режиме дайджеста
+    пропускаются.
+
+    last_id — максимум по всем новым статьям, а не только по попавшим в
+    сообщение: при большом отставании (например, после простоя) отправляются
+    max_headlines самых свежих, а более старые помечаются доставленными без
+    отправки. Их число передаётся в skipped, и сообщение заканчивается
+    строкой о пропущенных статьях со ссылкой на /news.
+    """
+    db = Database()
+    try:
+        rows = db.fetch_all(PENDING_QUERY, (max_headlines,))
+    finally:
+        db.close()
+
+    deliveries = {}
+    seen = set()
+    for user_id, telegram_id, last_id, total, story_id, title, url in rows:
+        delivery = deliveries.setdefault(user_id, {
+            'user_id': user_id, 'chat_id': telegram_id, 'last_id': last_id,
+            'skipped': max(total - max_headlines, 0), 'items': []
+        })
+        if (user_id, story_id) in seen:
+            continue
+        seen.add((user_id, story_id))
+        delivery['items'].append((title, url))
+    return list(deliveries.values())
+
+
+def advance_watermark(user_id, last_id):
+    db = Database()
+    try:
+        return db.execute(
+            "UPDATE delivery_watermarks SET last_news_id = %s, updated_at = CURRENT_TIMESTAMP "
+            "WHERE user_id = %s AND last_news_id < %s",
+            (last_id, user_id, last_id),
+            commit=True
+        ) is not None
+    finally:
+        db.close()
+
+
+def render_delivery(items, skipped=0):
+    message = "Новое по вашим подпискам:\n\n"
+    for title, url in items:
+        message += f"{html.escape(title)}\n<a href='{html.escape(url)}'>Читать</a>\n\n"
+    if skipped:
+        message += f"…и ещё более ранних статей: {skipped}. Вся лента — /news"
+    return message
+
+
+def _chat_gone(error):
+    """Чат удалён или бот заблокирован: повторять отправку бессмысленно"""
+    return isinstance(error, Forbidden) or 'chat not found' in str(error).lower()
+
+
+def _retry_seconds(error):
+    retry_after = error.retry_after
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class RateLimiter:
+    """Асинхронный token bucket с возможностью глобальной паузы после 429"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class DeliveryEngine:
+    """Рассылка новых статей подписчикам.
+
+    trigger() запускает пересчёт: один запрос находит всех пользователей с
+    новыми статьями, каждому ставится в очередь одно сообщение со всеми
+    заголовками. Отправители соблюдают общий лимит Telegram и интервал между
+    сообщениями в один чат, на 429 ждут retry_after. Отметка доставки
+    (delivery_watermarks) сдвигается только после успешной отправки, поэтому
+    после перезапуска статьи не теряются и не отправляются повторно.
+
+    Раз в digest_interval секунд проверяются дайджесты, у которых наступил
+    слот; они идут через ту же очередь и ту же отметку доставки.
+    """
+
+    def __init__(self, bot, global_rate=30, per_chat_interval=1.0, max_headlines=10,
+                 workers=8, max_attempts=5, digest_per_source=5, digest_interval=60, max_rejections=3):
+        self.bot = bot
+        self.per_chat_interval = per_chat_interval
+        self.max_headlines = max_headlines
+        self.max_attempts = max_attempts
+        self.max_rejections = max_rejections
+        self.digest_per_source = digest_per_source
+        self.digest_interval = digest_interval
+        self.limiter = RateLimiter(global_rate)
+        self.queue = asyncio.Queue()
+        self._workers_count = workers
+        self._in_flight = set()
+        self._last_sent = {}
+        self._rejections = {}
+        self._deferred = {}
+        self._trigger = asyncio.Event()
+        self._tasks = []
+
+    def start(self):
+        self._tasks.append(asyncio.create_task(self._planner()))
+        self._tasks.append(asyncio.create_task(self._digests()))
+        for _ in range(self._workers_count):
+            self._tasks.append(asyncio.create_task(self._worker()))
+        self.trigger()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def trigger(self):
+        self._trigger.set()
+
+    async def _planner(self):
+        while True:
+            await self._trigger.wait()
+            self._trigger.clear()
+            try:
+                deliveries = await run_in_db(fetch_pending, self.max_headlines)
+            except Exception as e:
+                logger.error(f"Ошибка расчёта рассылки: {e}")
+                continue
+
+            queued = self._enqueue(deliveries)
+            if queued:
+                logger.info(f"В очередь рассылки добавлено сообщений: {queued}")
+
+    async def _digests(self):
+        while True:
+            try:
+                deliveries = await run_in_db(fetch_digests, self.digest_per_source)
+            except Exception as e:
+                logger.error(f"Ошибка расчёта дайджестов: {e}")
+                deliveries = []
+            queued = self._enqueue(deliveries, defer=True)
+            if queued:
+                logger.info(f"В очередь рассылки добавлено дайджестов: {queued}")
+            await asyncio.sleep(self.digest_interval)
+
+    def _enqueue(self, deliveries, defer=False):
+        """Постановка в очередь, не больше одной доставки на пользователя.
+
+        Обычная рассылка для пользователя, которому уже идёт отправка,
+        пропускается: следующий пересчёт найдёт те же статьи. Дайджест так
+        пропустить нельзя (defer): DIGEST_QUERY уже сдвинул next_digest_at,
+        и слот был бы потерян, поэтому он откладывается до конца текущей
+        отправки.
+        """
+        queued = 0
+        for delivery in deliveries:
+            if delivery['user_id'] in self._in_flight:
+                if defer:
+                    self._deferred[delivery['user_id']] = delivery
+                continue
+            self._in_flight.add(delivery['user_id'])
+            self.queue.put_nowait(delivery)
+            queued += 1
+        return queued
+
+    async def _wait_for_chat(self, chat_id):
+        last_sent = self._last_sent.get(chat_id)
+        if last_sent is not None:
+            delay = last_sent + self.per_chat_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    def _mark_sent(self, chat_id):
+        now = time.monotonic()
+        self._last_sent[chat_id] = now
+        if len(self._last_sent) > 10000:
+            self._last_sent = {
+                chat: sent for chat, sent in self._last_sent.items()
+                if now - sent < self.per_chat_interval
+            }
+
+    async def _worker(self):
+        while True:
+            delivery = await self.queue.get()
+            try:
+                if await self._send(delivery):
+                    await run_in_db(advance_watermark, delivery['user_id'], delivery['last_id'])
+            except Exception as e:
+                logger.error(f"Ошибка рассылки пользователю {delivery['chat_id']}: {e}")
+            finally:
+                self._in_flight.discard(delivery['user_id'])
+                deferred = self._deferred.pop(delivery['user_id'], None)
+                if deferred is not None:
+                    self._enqueue([deferred])
+                self.queue.task_done()
+
+    async def _send(self, delivery):
+        """Отправка всех сообщений доставки; True — отметку доставки можно сдвинуть.
+
+        Дайджест может состоять из нескольких сообщений (messages), обычная
+        рассылка — всегда одно. Если одно из них не ушло, отметка остаётся на
+        месте и при следующей попытке отправляется вся доставка.
+        """
+        chat_id = delivery['chat_id']
+        messages = delivery.get('messages') or [render_delivery(delivery['items'], delivery.get('skipped', 0))]
+        for text in messages:
+            try:
+                sent = await self._send_message(chat_id, text)
+            except BadRequest as e:
+                return self._rejected(delivery, e)
+            if sent is None:
+                return True
+            if not sent:
+                return False
+        self._rejections.pop(delivery['user_id'], None)
+        return True
+
+    def _rejected(self, delivery, error):
+        """Telegram отклонил само сообщение (битая разметка, длина).
+
+        Повтор той же доставки отклоняется так же, и пользователь больше не
+        получал бы ничего. Поэтому отметка стоит на месте только первые
+        max_rejections - 1 раз (вдруг причина была временной), затем статьи
+        записываются в лог как недоставленные и отметка сдвигается.
+        """
+        user_id = delivery['user_id']
+        rejections = self._rejections.get(user_id, 0) + 1
+        if rejections < self.max_rejections:
+            self._rejections[user_id] = rejections
+            logger.error(
+                f"Telegram отклонил сообщение для {delivery['chat_id']} "
+                f"({rejections} из {self.max_rejections}), отметка не сдвинута: {error}"
+            )
+            return False
+        self._rejections.pop(user_id, None)
+        urls = [url for _, url in delivery.get('items', ())]
+        logger.error(
+            f"Сообщение для {delivery['chat_id']} отклонено {rejections} раз, статьи до id "
+            f"{delivery['last_id']} пропущены: {error}; {', '.join(urls) or 'дайджест'}"
+        )
+        return True
+
+    async def _send_message(self, chat_id, text):
+        """Отправка с повторами: True — отправлено, None — чат недоступен, False — ошибка.
+
+        Отказ Telegram принять само сообщение (BadRequest) выбрасывается.
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            await self._wait_for_chat(chat_id)
+            await self.limiter.acquire()
+            try:
+                await self.bot.send_message(
+                    chat_id=chat_id, text=text, parse_mode='HTML', disable_web_page_preview=True
+                )
+                self._mark_sent(chat_id)
+                return True
+            except RetryAfter as e:
+                seconds = _retry_seconds(e)
+                logger.warning(f"Превышен лимит Telegram, пауза {seconds} с")
+                self.limiter.pause(seconds)
+            except (Forbidden, BadRequest) as e:
+                if _chat_gone(e):
+                    logger.info(f"Пользователь {chat_id} недоступен, рассылка пропущена: {e}")
+                    return None
+                raise
+            except TelegramError as e:
+                logger.warning(f"Ошибка отправки {chat_id} (попытка {attempt}): {e}")
+                await asyncio.sleep(min(2 ** attempt, 30))
+        return False
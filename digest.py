@@ -0,0 +1,134 @@
+import html
+import re
+from datetime import time
+
+from database import Database
+
+MODES = ('off', 'hourly', 'daily')
+MAX_MESSAGE_LENGTH = 4000
+
+# Один запрос на слот: data-modifying CTE сдвигает расписание всех
+# пользователей, у которых подошло время, остальные CTE группируют их по
+# набору подписок и отметке доставки, и для каждой группы выбираются top N
+# новых статей каждого источника (по индексу news (source_id, id)).
+# snapshot фиксирует верхнюю границу: до неё сдвигаются отметки доставки,
+# поэтому пользователи одной группы и дальше остаются в одной группе.
+# Группа — пара (набор подписок, отметка доставки), а не один набор
+# подписок: у подписчиков с разными отметками разный список новых статей,
+# и общий текст по одному набору подписок был бы для части из них неверен.
+# Пока отметки совпадают (после первого общего дайджеста), группы те же.
+DIGEST_QUERY = (
+    "WITH snapshot AS (SELECT COALESCE(MAX(id), 0) AS max_id FROM news), "
+    "due AS ("
+    "  UPDATE user_settings s SET last_digest_at = LOCALTIMESTAMP,"
+    "         next_digest_at = digest_next_slot(s.digest_mode, s.digest_time, LOCALTIMESTAMP)"
+    "  WHERE s.digest_mode <> 'off' AND s.next_digest_at <= LOCALTIMESTAMP"
+    "  RETURNING s.user_id"
+    "), members AS ("
+    "  SELECT d.user_id, u.telegram_id, w.last_news_id AS since_id,"
+    "         array_agg(sub.source_id ORDER BY sub.source_id) AS source_ids"
+    "  FROM due d"
+    "  JOIN users u ON u.id = d.user_id"
+    "  JOIN delivery_watermarks w ON w.user_id = d.user_id"
+    "  JOIN subscriptions sub ON sub.user_id = d.user_id"
+    "  GROUP BY d.user_id, u.telegram_id, w.last_news_id"
+    "), groups AS ("
+    "  SELECT source_ids, since_id,"
+    "         array_agg(user_id ORDER BY user_id) AS user_ids,"
+    "         array_agg(telegram_id ORDER BY user_id) AS chat_ids"
+    "  FROM members GROUP BY source_ids, since_id"
+    ") "
+    "SELECT g.user_ids, g.chat_ids, snapshot.max_id, items.rows "
+    "FROM groups g CROSS JOIN snapshot "
+    "CROSS JOIN LATERAL ("
+    "  SELECT json_agg(json_build_array(src.name, n.title, n.url, COALESCE(n.story_id, n.id))"
+    "                  ORDER BY src.name, n.id DESC) AS rows"
+    "  FROM sources src"
+    "  CROSS JOIN LATERAL ("
+    "    SELECT id, title, url, story_id FROM news"
+    "    WHERE source_id = src.id AND id > g.since_id AND id <= snapshot.max_id"
+    "    ORDER BY id DESC LIMIT %s"
+    "  ) n"
+    "  WHERE src.id = ANY(g.source_ids)"
+    ") items "
+    "WHERE items.rows IS NOT NULL"
+)
+
+
+def parse_time(text):
+    """Время дайджеста в формате ЧЧ:ММ или None"""
+    match = re.fullmatch(r'\s*(\d{1,2})[:.](\d{2})\s*', text)
+    if not match:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2))
+    if hour > 23 or minute > 59:
+        return None
+    return time(hour, minute)
+
+
+def describe(mode, at=None):
+    if mode == 'hourly':
+        return "каждый час"
+    if mode == 'daily' and at is not None:
+        return f"ежедневно в {at:%H:%M}"
+    return "выключен"
+
+
+def render_digest(rows):
+    """Сообщения дайджеста: заголовки по источникам, сюжет показывается один раз.
+
+    Всё, что не помещается в лимит сообщения Telegram, переносится в
+    следующие сообщения (заголовок источника повторяется), а не
+    отбрасывается: отметка доставки сдвигается на весь snapshot.
+    """
+    messages = []
+    message = "Дайджест по вашим подпискам\n"
+    seen = set()
+    current = None
+    for source_name, title, url, story_id in rows:
+        if story_id in seen:
+            continue
+        seen.add(story_id)
+        line = f"• <a href='{html.escape(url)}'>{html.escape(title)}</a>\n"
+        heading = f"\n<b>{html.escape(source_name)}</b>\n"
+        block = (heading if source_name != current else "") + line
+        if len(message) + len(block) > MAX_MESSAGE_LENGTH:
+            messages.append(message)
+            message = "Дайджест (продолжение)\n" + heading + line
+        else:
+            message += block
+        current = source_name
+    messages.append(message)
+    return messages
+
+
+def fetch_digests(per_source):
+    """Дайджесты всех пользователей, у которых наступил слот.
+
+    Текст строится один раз на группу с одинаковыми подписками и отметкой
+    доставки; пользователи группы получают один и тот же список сообщений.
+    """
+    db = Database()
+    try:
+        cursor = db.execute(DIGEST_QUERY, (per_source,), commit=True)
+        groups = cursor.fetchall() if cursor is not None else []
+    finally:
+        db.close()
+
+    deliveries = []
+    for user_ids, chat_ids, max_id, rows in groups:
+        messages = render_digest(rows)
+        for user_id, chat_id in zip(user_ids, chat_ids):
+            deliveries.append({'user_id': user_id, 'chat_id': chat_id, 'last_id': max_id, 'messages': messages})
+    return deliveries
+
+
+def save_mode(db, telegram_id, mode, at=None):
+    """Запрос смены режима (для AsyncDatabase — с await)"""
+    return db.execute(
+        "UPDATE user_settings SET digest_mode = %s, digest_time = %s, "
+        "next_digest_at = digest_next_slot(%s, %s, LOCALTIMESTAMP) "
+        "WHERE user_id = (SELECT id FROM users WHERE telegram_id = %s)",
+        (mode, at, mode, at, telegram_id),
+        commit=True
+    )
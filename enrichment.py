@@ -0,0 +1,271 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+
+import metrics
+from cache import invalidate_news
+from cluster import NEWS_CHANNEL, notify
+from database import Database, run_in_db
+from extraction import extract_article_meta
+from http_client import http_client
+
+logger = logging.getLogger(__name__)
+
+PERMANENT_STATUSES = {400, 401, 403, 404, 410, 451}
+
+CLAIM_QUERY = (
+    "UPDATE enrichment_frontier f SET attempts = f.attempts + 1, "
+    "next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => %s) "
+    "FROM ("
+    "  SELECT news_id FROM enrichment_frontier WHERE news_id IN ("
+    "    SELECT news_id FROM ("
+    "      SELECT news_id, ROW_NUMBER() OVER (PARTITION BY host ORDER BY next_attempt_at) AS rn"
+    "      FROM enrichment_frontier"
+    "      WHERE status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP"
+    "    ) due WHERE rn <= %s"
+    "  ) AND status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP"
+    "  ORDER BY next_attempt_at LIMIT %s FOR UPDATE SKIP LOCKED"
+    ") claimed WHERE f.news_id = claimed.news_id "
+    "RETURNING f.news_id, f.url, f.host, f.attempts"
+)
+
+
+class PermanentError(Exception):
+    pass
+
+
+def claim_batch(batch_size, host_batch, lease):
+    """Выборка статей для обработки.
+
+    Строки блокируются FOR UPDATE SKIP LOCKED и сразу получают next_attempt_at
+    через lease секунд: если процесс упадёт, не закончив работу, строки снова
+    станут доступны после аренды, а параллельные обработчики их не возьмут.
+    С одного хоста берётся не больше host_batch статей, чтобы партию не
+    занял один сайт.
+    """
+    db = Database()
+    try:
+        cursor = db.execute(CLAIM_QUERY, (lease, host_batch, batch_size), commit=True)
+        return cursor.fetchall() if cursor is not None else []
+    finally:
+        db.close()
+
+
+def complete(news_id, published_at, summary):
+    """Запись результата и удаление статьи из очереди одной транзакцией.
+
+    Возвращает пару (записано, source_id): source_id — источник, чья лента
+    изменилась (сдвинулось время публикации), иначе None. Кэши сбрасывает
+    announce_changes один раз на партию.
+    """
+    db = Database()
+    try:
+        row = db.fetch_one(
+            "UPDATE news SET published_at = COALESCE(%s, published_at), summary = COALESCE(%s, summary) "
+            "WHERE id = %s RETURNING source_id",
+            (published_at, summary, news_id)
+        )
+        if db.execute("DELETE FROM enrichment_frontier WHERE news_id = %s", (news_id,), commit=True) is None:
+            return False, None
+        return True, row[0] if row is not None and published_at is not None else None
+    finally:
+        db.close()
+
+
+def announce_changes(source_ids):
+    """Один NOTIFY и один сброс кэша ленты на источник после партии"""
+    if not source_ids:
+        return
+    db = Database()
+    try:
+        if not db.connection:
+            logger.warning("Уведомление об изменении лент не отправлено: нет подключения к БД")
+        else:
+            for source_id in sorted(source_ids):
+                notify(db, NEWS_CHANNEL, {'source_id': source_id, 'inserted': 0})
+            db.connection.commit()
+    finally:
+        db.close()
+    for source_id in source_ids:
+        invalidate_news(source_id)
+
+
+def fail(news_id, error, retry_delay, max_attempts, permanent=False):
+    """Отложенный повтор с экспоненциальной задержкой или отказ после max_attempts"""
+    db = Database()
+    try:
+        return db.execute(
+            "UPDATE enrichment_frontier SET last_error = %s, "
+            "status = CASE WHEN %s OR attempts >= %s THEN 'failed' ELSE 'pending' END, "
+            "next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => %s * power(2, attempts - 1)) "
+            "WHERE news_id = %s",
+            (str(error)[:500], permanent, max_attempts, retry_delay, news_id),
+            commit=True
+        ) is not None
+    finally:
+        db.close()
+
+
+def fetch_article(url, timeout, max_bytes):
+    """Загрузка начала страницы статьи: метаданные находятся в <head>"""
+    response = http_client.get(url, timeout=timeout, max_bytes=max_bytes, truncate=True)
+    if response.status_code in PERMANENT_STATUSES:
+        raise PermanentError(f"HTTP {response.status_code}")
+    response.raise_for_status()
+    return response.text
+
+
+def plausible(published_at, now=None):
+    """Отсев явно ошибочных дат: из будущего или старше года"""
+    now = now or datetime.now()
+    return published_at is not None and now - timedelta(days=365) <= published_at <= now + timedelta(hours=1)
+
+
+class HostThrottle:
+    """Вежливость по отношению к сайту: не больше per_host одновременных
+    запросов и не чаще одного запроса в interval секунд на хост.
+    """
+
+    def __init__(self, per_host=2, interval=1.0):
+        self.per_host = per_host
+        self.interval = interval
+        self._semaphores = {}
+        self._locks = {}
+        self._next_slot = {}
+        self._active = {}
+
+    async def acquire(self, host):
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.per_host))
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        self._active[host] = self._active.get(host, 0) + 1
+        try:
+            await semaphore.acquire()
+        except BaseException:
+            self._active[host] -= 1
+            raise
+        try:
+            async with lock:
+                delay = self._next_slot.get(host, 0) - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self._next_slot[host] = time.monotonic() + self.interval
+        except BaseException:
+            self.release(host)
+            raise
+
+    def release(self, host):
+        self._semaphores[host].release()
+        self._active[host] -= 1
+
+    def forget_idle(self):
+        """Удаление состояния хостов без запросов в работе"""
+        now = time.monotonic()
+        for host in [host for host, active in self._active.items() if not active]:
+            if self._next_slot.get(host, 0) < now:
+                del self._active[host]
+                self._semaphores.pop(host, None)
+                self._locks.pop(host, None)
+                self._next_slot.pop(host, None)
+
+
+class EnrichmentCrawler:
+    """Дообогащение новых статей временем публикации и анонсом.
+
+    Очередь хранится в enrichment_frontier, статьи выбираются партиями,
+    всего одновременно выполняется не больше concurrency запросов, для
+    каждого хоста действуют ограничения HostThrottle. trigger() будит
+    обработчик сразу после записи новых статей, иначе очередь проверяется
+    раз в poll_interval секунд.
+    """
+
+    def __init__(self, concurrency=16, per_host=2, host_interval=1.0, batch_size=100, host_batch=10,
+                 lease=300, max_attempts=4, retry_delay=60, timeout=10, max_bytes=512 * 1024,
+                 poll_interval=30):
+        self.batch_size = batch_size
+        self.host_batch = host_batch
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.poll_interval = poll_interval
+        self.throttle = HostThrottle(per_host, host_interval)
+        self._concurrency = concurrency
+        self._slots = None
+        self._wakeup = None
+        self._task = None
+
+    def start(self):
+        self._slots = asyncio.Semaphore(self._concurrency)
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def trigger(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _loop(self):
+        while True:
+            try:
+                claimed = await run_in_db(claim_batch, self.batch_size, self.host_batch, self.lease)
+            except Exception as e:
+                logger.error(f"Ошибка выборки статей для обогащения: {e}")
+                claimed = []
+
+            if claimed:
+                results = await asyncio.gather(*(self._process(*row) for row in claimed), return_exceptions=True)
+                changed = set()
+                for row, result in zip(claimed, results):
+                    if isinstance(result, Exception):
+                        logger.error(f"Ошибка обогащения статьи {row[0]}: {result}")
+                    elif result is not None:
+                        changed.add(result)
+                try:
+                    await run_in_db(announce_changes, changed)
+                except Exception as e:
+                    logger.error(f"Ошибка уведомления об изменении лент: {e}")
+                self.throttle.forget_idle()
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _process(self, news_id, url, host, attempts):
+        """Обработка одной статьи; возвращает источник, чья лента изменилась, или None"""
+        await self.throttle.acquire(host)
+        try:
+            async with self._slots:
+                html = await asyncio.to_thread(fetch_article, url, self.timeout, self.max_bytes)
+        except Exception as e:
+            permanent = isinstance(e, PermanentError)
+            logger.warning(f"Не удалось загрузить {url} (попытка {attempts}): {e}")
+            metrics.enrichment_results.inc(status='failed' if permanent else 'retry')
+            await run_in_db(fail, news_id, e, self.retry_delay, self.max_attempts, permanent)
+            return None
+        finally:
+            self.throttle.release(host)
+
+        try:
+            published_at, summary = await asyncio.to_thread(extract_article_meta, html)
+        except Exception as e:
+            logger.warning(f"Не удалось разобрать {url}: {e}")
+            published_at = summary = None
+        if not plausible(published_at):
+            published_at = None
+        if summary:
+            summary = summary[:1000]
+
+        done, source_id = await run_in_db(complete, news_id, published_at, summary)
+        if done:
+            metrics.enrichment_results.inc(status='ok' if published_at or summary else 'empty')
+        return source_id
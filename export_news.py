@@ -0,0 +1,135 @@
+"""Выгрузка новостей из news и news_archive в NDJSON или CSV.
+
+Строки читаются серверным курсором (Database.stream) и сразу пишутся в
+файл, поэтому память не зависит от объёма выгрузки. Бот запускать не нужно:
+
+    python export_news.py news.ndjson.gz --source ТАСС --since 2024-01-01 --until 2024-02-01
+    python export_news.py - --format csv --table archive > archive.csv
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import logging
+import sys
+from contextlib import closing
+from datetime import date
+
+from config import EXPORT_CONFIG
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ('id', 'source', 'title', 'url', 'published_at', 'summary')
+TABLES = {'news': ('news',), 'archive': ('news_archive',), 'all': ('news', 'news_archive')}
+
+
+def build_export_query(table='all', source=None, since=None, until=None):
+    """Запрос выгрузки: UNION ALL по выбранным таблицам без общей сортировки.
+
+    Сортировка всего результата заставила бы сервер материализовать его
+    целиком; внутри таблицы строки идут в порядке хранения. source — имя или
+    id источника, since/until — границы published_at (until не включается).
+    """
+    conditions, params = [], []
+    if source is not None:
+        conditions.append("(s.name = %s OR s.id::text = %s)")
+        params += [source, str(source)]
+    if since is not None:
+        conditions.append("n.published_at >= %s")
+        params.append(since)
+    if until is not None:
+        conditions.append("n.published_at < %s")
+        params.append(until)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    parts = [
+        f"SELECT n.id, s.name, n.title, n.url, n.published_at, n.summary "
+        f"FROM {name} n JOIN sources s ON s.id = n.source_id{where}"
+        for name in TABLES[table]
+    ]
+    return " UNION ALL ".join(parts), params * len(parts)
+
+
+class NdjsonWriter:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, row):
+        record = dict(zip(COLUMNS, row))
+        if record['published_at'] is not None:
+            record['published_at'] = record['published_at'].isoformat()
+        self.stream.write(json.dumps(record, ensure_ascii=False))
+        self.stream.write('\n')
+
+
+class CsvWriter:
+    def __init__(self, stream):
+        self.writer = csv.writer(stream)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, row):
+        self.writer.writerow(row)
+
+
+WRITERS = {'ndjson': NdjsonWriter, 'csv': CsvWriter}
+
+
+def open_output(path, compress):
+    """Текстовый поток для записи: файл или stdout ('-'), при compress — gzip"""
+    if path == '-':
+        if compress:
+            return io.TextIOWrapper(gzip.GzipFile(fileobj=sys.stdout.buffer, mode='wb'), encoding='utf-8', newline='')
+        return io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', newline='', write_through=False)
+    if compress:
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def export(rows, writer, progress_every=None):
+    """Запись строк; возвращает их количество"""
+    count = 0
+    for row in rows:
+        writer.write(row)
+        count += 1
+        if progress_every and count % progress_every == 0:
+            logger.info(f"Выгружено строк: {count}")
+    return count
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Выгрузка новостей в NDJSON/CSV")
+    parser.add_argument('output', help="файл или '-' для stdout")
+    parser.add_argument('--format', choices=WRITERS, help="по умолчанию по расширению файла, иначе ndjson")
+    parser.add_argument('--gzip', action='store_true', help="сжатие gzip (включается и расширением .gz)")
+    parser.add_argument('--table', choices=TABLES, default='all', help="news, archive или обе")
+    parser.add_argument('--source', help="имя или id источника")
+    parser.add_argument('--since', type=date.fromisoformat, help="с даты публикации, ГГГГ-ММ-ДД")
+    parser.add_argument('--until', type=date.fromisoformat, help="до даты публикации (не включая)")
+    parser.add_argument('--batch-size', type=int, default=EXPORT_CONFIG['batch_size'],
+                        help="строк за одно обращение к серверу")
+    args = parser.parse_args()
+
+    name = args.output[:-3] if args.output.endswith('.gz') else args.output
+    output_format = args.format or ('csv' if name.endswith('.csv') else 'ndjson')
+    compress = args.gzip or args.output.endswith('.gz')
+
+    db = Database()
+    if not db.connection:
+        sys.exit("Нет подключения к БД")
+    try:
+        query, params = build_export_query(args.table, args.source, args.since, args.until)
+        # Генератор закрывается до db.close(), даже если упала запись:
+        # его finally закрывает серверный курсор на ещё живом соединении
+        with closing(db.stream(query, params, args.batch_size)) as rows, \
+                open_output(args.output, compress) as stream:
+            count = export(rows, WRITERS[output_format](stream), EXPORT_CONFIG['progress_every'])
+    finally:
+        db.close()
+    logger.info(f"Готово, выгружено строк: {count}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Разбор страниц источников.
+
+Модуль не зависит от БД и конфигурации бота: его же импортируют процессы
+пула разбора (SCRAPER_CONFIG['parse_mode'] = 'process').
+"""
+import json
+from datetime import datetime
+from functools import lru_cache
+from urllib.parse import urljoin
+
+import soupsieve
+from bs4 import BeautifulSoup, SoupStrainer
+
+WARMUP_HTML = '<html><body><article><a class="warmup" href="/">warmup</a></article></body></html>'
+
+
+@lru_cache(maxsize=None)
+def _compile(selector):
+    return soupsieve.compile(selector)
+
+def _strainer(spec):
+    return SoupStrainer(**spec.strainer) if spec.strainer else None
+
+def extract_records(html, spec):
+    """Пары (заголовок, ссылка) со страницы по описанию источника"""
+    soup = BeautifulSoup(html, 'lxml', parse_only=_strainer(spec))
+    records = []
+    seen = set()
+
+    for item in _compile(spec.item_selector).select(soup):
+        if spec.link == 'self':
+            link_elem = item
+        elif spec.link == 'parent':
+            link_elem = item.find_parent('a')
+        else:
+            link_elem = _compile(spec.link).select_one(item)
+        if link_elem is None or not link_elem.get('href'):
+            continue
+
+        title_elem = link_elem if spec.link not in ('self', 'parent') else item
+        title = title_elem.get_text().strip()
+        link = urljoin(spec.base_url, link_elem['href'])
+        if title and link not in seen:
+            seen.add(link)
+            records.append((title, link))
+    return records
+
+def extract_items(html, spec):
+    """Извлечение заголовков и ссылок со страницы по описанию источника"""
+    return [{'title': title, 'url': url} for title, url in extract_records(html, spec)]
+
+def warm_worker(specs=()):
+    """Инициализация процесса пула: загрузка lxml и компиляция селекторов"""
+    BeautifulSoup(WARMUP_HTML, 'lxml')
+    for spec in specs:
+        _compile(spec.item_selector)
+        if spec.link not in ('self', 'parent'):
+            _compile(spec.link)
+
+PUBLISHED_META = (
+    ('property', 'article:published_time'),
+    ('name', 'article:published_time'),
+    ('itemprop', 'datePublished'),
+    ('name', 'pubdate'),
+    ('name', 'publish-date'),
+)
+SUMMARY_META = (
+    ('property', 'og:description'),
+    ('name', 'description'),
+    ('name', 'twitter:description'),
+)
+ARTICLE_STRAINER = SoupStrainer(['meta', 'script'])
+
+
+def _parse_datetime(value):
+    """ISO 8601 в наивное локальное время (как news.published_at); None, если не разобрать"""
+    if not isinstance(value, str) or not value.strip():
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+def _json_ld_objects(data):
+    if isinstance(data, list):
+        for entry in data:
+            yield from _json_ld_objects(entry)
+    elif isinstance(data, dict):
+        yield data
+        yield from _json_ld_objects(data.get('@graph', []))
+
+def extract_article_meta(html):
+    """Время публикации и анонс статьи из OpenGraph/meta и JSON-LD.
+
+    Возвращает пару (published_at, summary), любой элемент может быть None.
+    """
+    soup = BeautifulSoup(html, 'lxml', parse_only=ARTICLE_STRAINER)
+    published_at = summary = None
+
+    for script in soup.find_all('script', type='application/ld+json'):
+        try:
+            data = json.loads(script.string or '')
+        except ValueError:
+            continue
+        for entry in _json_ld_objects(data):
+            published_at = published_at or _parse_datetime(entry.get('datePublished'))
+            description = entry.get('description')
+            if not summary and isinstance(description, str) and description.strip():
+                summary = description.strip()
+
+    for attribute, value in PUBLISHED_META:
+        if published_at:
+            break
+        tag = soup.find('meta', attrs={attribute: value})
+        if tag is not None:
+            published_at = _parse_datetime(tag.get('content'))
+    for attribute, value in SUMMARY_META:
+        if summary:
+            break
+        tag = soup.find('meta', attrs={attribute: value})
+        if tag is not None and tag.get('content', '').strip():
+            summary = tag['content'].strip()
+
+    return published_at, summary
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from http_client import http_client
+
+logger = logging.getLogger(__name__)
+
+
+class FetchCache:
+    """Условная загрузка страниц источников.
+
+    Для каждого источника хранятся ETag, Last-Modified и SHA-256 тела
+    последнего обработанного ответа. fetch() отправляет условный запрос и
+    возвращает None, если сервер ответил 304 или тело не изменилось.
+    Новые валидаторы сохраняются на диск только после commit(), то есть
+    когда страница успешно разобрана и записана в БД.
+    """
+
+    def __init__(self, path, client=None):
+        self.path = path
+        self.client = client or http_client
+        self._lock = threading.Lock()
+        self._state = {}
+        self._pending = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self._state = json.load(f)
+        except FileNotFoundError:
+            self._state = {}
+        except Exception as e:
+            logger.warning(f"Fetch cache {self.path} is unreadable, starting empty: {e}")
+            self._state = {}
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Cannot persist fetch cache: {e}")
+
+    def fetch(self, key, url, headers=None, timeout=10):
+        with self._lock:
+            cached = dict(self._state.get(key, {}))
+
+        request_headers = dict(headers or {})
+        if cached.get('etag'):
+            request_headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            request_headers['If-Modified-Since'] = cached['last_modified']
+
+        response = self.client.get(url, headers=request_headers, timeout=timeout)
+        if response.status_code == 304:
+            logger.info(f"{key}: not modified")
+            return None
+        response.raise_for_status()
+
+        body_hash = hashlib.sha256(response.content).hexdigest()
+        entry = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'hash': body_hash
+        }
+        if body_hash == cached.get('hash'):
+            logger.info(f"{key}: body unchanged")
+            with self._lock:
+                self._state[key] = entry
+                self._save()
+            return None
+
+        with self._lock:
+            self._pending[key] = entry
+        return response.text
+
+    def commit(self, key):
+        with self._lock:
+            entry = self._pending.pop(key, None)
+            if entry is None:
+                return
+            self._state[key] = entry
+            self._save()
+
+    def discard(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
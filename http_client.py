@@ -0,0 +1,276 @@
+import ipaddress
+import logging
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.compat import chardet
+from urllib3 import PoolManager
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError, NameResolutionError, NewConnectionError
+from urllib3.util import connection as urllib3_connection
+from urllib3.util.retry import Retry
+
+from config import HTTP_CONFIG
+
+try:
+    import brotli  # noqa: F401  urllib3 распаковывает br, только если установлен brotli
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = 'gzip, deflate, br'
+    except ImportError:
+        ACCEPT_ENCODING = 'gzip, deflate'
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class ResponseTooLarge(requests.RequestException):
+    pass
+
+
+class DnsCache:
+    """Кэш разрешения имён для соединений urllib3.
+
+    Адреса хоста берутся из кэша (ttl секунд), TCP-соединение открывается
+    к IP, а TLS по-прежнему проверяется по исходному имени хоста. Если ни
+    один закэшированный адрес не отвечает, запись сбрасывается. Кэш
+    подключается только к пулам DnsCachingAdapter, глобальная функция
+    urllib3 не подменяется.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, host, port):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((host, port))
+            if entry is not None and entry[1] > now:
+                return entry[0]
+        addresses = []
+        for *_, sockaddr in socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM):
+            if sockaddr[0] not in addresses:
+                addresses.append(sockaddr[0])
+        with self._lock:
+            self._entries[(host, port)] = (addresses, now + self.ttl)
+        return addresses
+
+    def forget(self, host, port):
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+    def create_connection(self, address, *args, **kwargs):
+        host, port = address
+        try:
+            ipaddress.ip_address(host.strip('[]'))
+            return urllib3_connection.create_connection(address, *args, **kwargs)
+        except ValueError:
+            pass
+
+        last_error = None
+        for ip in self.resolve(host, port):
+            try:
+                return urllib3_connection.create_connection((ip, port), *args, **kwargs)
+            except OSError as e:
+                last_error = e
+        self.forget(host, port)
+        raise last_error or OSError(f"No addresses for {host}")
+
+
+class _DnsCachingConnection:
+    """Примесь к соединению urllib3: сокет открывается через DnsCache пула.
+
+    Повторяет HTTPConnection._new_conn, включая преобразование ошибок
+    сокета в исключения urllib3, от которых зависят повторы Retry.
+    """
+
+    dns_cache = None
+
+    def _new_conn(self):
+        if self.dns_cache is None:
+            return super()._new_conn()
+        try:
+            sock = self.dns_cache.create_connection(
+                (self._dns_host, self.port),
+                self.timeout,
+                source_address=self.source_address,
+                socket_options=self.socket_options,
+            )
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        except socket.timeout as e:
+            raise ConnectTimeoutError(
+                self, f"Connection to {self.host} timed out. (connect timeout={self.timeout})"
+            ) from e
+        except OSError as e:
+            raise NewConnectionError(self, f"Failed to establish a new connection: {e}") from e
+        return sock
+
+
+class DnsCachingHTTPConnection(_DnsCachingConnection, HTTPConnection):
+    pass
+
+
+class DnsCachingHTTPSConnection(_DnsCachingConnection, HTTPSConnection):
+    pass
+
+
+class _DnsCachingPool:
+    dns_cache = None
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        conn.dns_cache = self.dns_cache
+        return conn
+
+
+class DnsCachingHTTPConnectionPool(_DnsCachingPool, HTTPConnectionPool):
+    ConnectionCls = DnsCachingHTTPConnection
+
+
+class DnsCachingHTTPSConnectionPool(_DnsCachingPool, HTTPSConnectionPool):
+    ConnectionCls = DnsCachingHTTPSConnection
+
+
+class DnsCachingPoolManager(PoolManager):
+    """PoolManager, пулы которого открывают соединения через общий DnsCache"""
+
+    def __init__(self, *args, dns_cache=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dns_cache = dns_cache
+        self.pool_classes_by_scheme = {
+            'http': DnsCachingHTTPConnectionPool,
+            'https': DnsCachingHTTPSConnectionPool,
+        }
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super()._new_pool(scheme, host, port, request_context)
+        pool.dns_cache = self.dns_cache
+        return pool
+
+
+class DnsCachingAdapter(HTTPAdapter):
+    """HTTPAdapter с DnsCache: действует только на сессию, к которой примонтирован"""
+
+    def __init__(self, dns_cache=None, **kwargs):
+        self.dns_cache = dns_cache
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = DnsCachingPoolManager(
+            num_pools=connections, maxsize=maxsize, block=block, dns_cache=self.dns_cache, **pool_kwargs
+        )
+
+
+def _detect_encoding(content):
+    if not content:
+        return None
+    return chardet.detect(content[:65536])['encoding']
+
+
+@dataclass
+class HttpResponse:
+    url: str
+    status_code: int
+    headers: dict
+    content: bytes
+    encoding: str = None
+    truncated: bool = False
+    _response: requests.Response = field(default=None, repr=False)
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+    def raise_for_status(self):
+        if self._response is not None:
+            self._response.raise_for_status()
+
+
+class HttpClient:
+    """Общий HTTP-клиент сборщиков.
+
+    Одна requests.Session с пулами keep-alive соединений по хостам
+    (pool_connections хостов, до pool_maxsize соединений на хост), повторами
+    с экспоненциальной задержкой на 5xx и сбои соединения, сжатием
+    gzip/deflate (и br, если установлен brotli) и ограничением размера
+    ответа после распаковки.
+    """
+
+    def __init__(self, user_agent, timeout=10, max_bytes=5 * 1024 * 1024, pool_connections=32,
+                 pool_maxsize=8, retries=3, backoff_factor=0.5, dns_ttl=300):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({'GET', 'HEAD'}),
+            backoff_factor=backoff_factor,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        self.dns_cache = DnsCache(dns_ttl) if dns_ttl else None
+        adapter = DnsCachingAdapter(
+            self.dns_cache, pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({'User-Agent': user_agent, 'Accept-Encoding': ACCEPT_ENCODING})
+
+    def get(self, url, headers=None, timeout=None, max_bytes=None, truncate=False):
+        """GET с ограничением размера.
+
+        Если тело больше max_bytes, при truncate=True возвращается его начало
+        (truncated=True), иначе выбрасывается ResponseTooLarge.
+        """
+        max_bytes = max_bytes or self.max_bytes
+        with self.session.get(url, headers=headers, timeout=timeout or self.timeout, stream=True) as response:
+            length = response.headers.get('Content-Length')
+            if not truncate and length and length.isdigit() and int(length) > max_bytes:
+                raise ResponseTooLarge(f"{url}: Content-Length {length} exceeds {max_bytes}")
+
+            chunks = []
+            size = 0
+            truncated = False
+            for chunk in response.iter_content(chunk_size=65536):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > max_bytes:
+                    if not truncate:
+                        raise ResponseTooLarge(f"{url}: body exceeds {max_bytes} bytes")
+                    truncated = True
+                    break
+            content = b''.join(chunks)[:max_bytes]
+
+            return HttpResponse(
+                url=response.url,
+                status_code=response.status_code,
+                headers=response.headers,
+                content=content,
+                encoding=response.encoding or _detect_encoding(content),
+                truncated=truncated,
+                _response=response
+            )
+
+    def close(self):
+        self.session.close()
+
+
+http_client = HttpClient(**HTTP_CONFIG)
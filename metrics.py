@@ -0,0 +1,310 @@
+import bisect
+import collections
+import contextvars
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+current_handler = contextvars.ContextVar('current_handler', default='background')
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = collections.defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        with self._lock:
+            self._values[_labels_key(labels)] += amount
+
+    def value(self, **labels):
+        return self._values.get(_labels_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def __init__(self, name, documentation):
+        super().__init__(name, documentation)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_labels_key(labels)] = value
+
+    def set_function(self, function, **labels):
+        """Значение вычисляется при каждом чтении метрик"""
+        with self._lock:
+            self._functions[_labels_key(labels)] = function
+
+    def samples(self):
+        samples = super().samples()
+        with self._lock:
+            functions = list(self._functions.items())
+        for key, function in functions:
+            try:
+                samples.append((self.name, key, function()))
+            except Exception as e:
+                logger.warning(f"Ошибка вычисления метрики {self.name}: {e}")
+        return samples
+
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _labels_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels):
+        series = self._series.get(_labels_key(labels))
+        return series[2] if series else 0
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            series_items = [(key, (list(s[0]), s[1], s[2])) for key, s in self._series.items()]
+        for key, (counts, total, count) in series_items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                samples.append((f'{self.name}_bucket', key, cumulative, (('le', le),)))
+            samples.append((f'{self.name}_sum', key, total))
+            samples.append((f'{self.name}_count', key, count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation):
+        return self._register(Counter(name, documentation))
+
+    def gauge(self, name, documentation):
+        return self._register(Gauge(name, documentation))
+
+    def histogram(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, buckets))
+
+    def render(self):
+        """Текстовый формат экспозиции Prometheus"""
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for sample in metric.samples():
+                name, key, value = sample[:3]
+                extra = sample[3] if len(sample) > 3 else ()
+                lines.append(f'{name}{_format_labels(key, extra)} {float(value)!r}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+handler_seconds = registry.histogram('bot_handler_seconds', 'Время обработки команд и callback-запросов')
+handler_errors = registry.counter('bot_handler_errors_total', 'Исключения в обработчиках')
+db_query_seconds = registry.histogram('db_query_seconds', 'Время SQL-запросов')
+db_queries = registry.counter('db_queries_total', 'SQL-запросы по обработчикам')
+parse_seconds = registry.histogram('scrape_parse_seconds', 'Загрузка и разбор страницы источника')
+ingest_seconds = registry.histogram('scrape_ingest_seconds', 'Запись новостей источника в БД')
+scrape_results = registry.counter('scrape_runs_total', 'Запуски сбора по источникам и результатам')
+news_inserted = registry.counter('news_inserted_total', 'Добавленные статьи')
+scrape_last_success = registry.gauge(
+    'scrape_last_success_timestamp_seconds', 'Время последнего успешного сбора источника (unix time)'
+)
+send_queue_size = registry.gauge('delivery_queue_size', 'Сообщения в очереди рассылки')
+enrichment_results = registry.counter('enrichment_results_total', 'Обработанные страницы статей по результатам')
+coalesced_reads = registry.counter('coalesced_reads_total', 'Чтения, получившие результат уже выполняющегося запроса')
+url_filter_hits = registry.counter('url_filter_hits_total', 'Заголовки, отброшенные фильтром известных URL до обращения к БД')
+throttled_updates = registry.counter('throttled_updates_total', 'Отброшенные обновления по причинам')
+
+
+def instrument_handler(name, callback):
+    """Обёртка обработчика бота: время выполнения и счётчик SQL-запросов по имени"""
+    async def wrapper(update, context):
+        token = current_handler.set(name)
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception:
+            handler_errors.inc(handler=name)
+            raise
+        finally:
+            handler_seconds.observe(time.perf_counter() - started, handler=name)
+            current_handler.reset(token)
+
+    wrapper.__name__ = getattr(callback, '__name__', name)
+    return wrapper
+
+
+@contextmanager
+def db_timer(operation):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        db_query_seconds.observe(time.perf_counter() - started, operation=operation)
+        db_queries.inc(handler=current_handler.get())
+
+
+class SamplingProfiler:
+    """Статистический профилировщик: раз в interval секунд снимает стеки всех
+    потоков и копит их в формате collapsed stacks (для flamegraph.pl/speedscope).
+    """
+
+    def __init__(self, interval=0.01, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({code.co_filename.rsplit("/", 1)[-1]}:{frame.f_lineno})')
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            with self._lock:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def collapsed(self):
+        with self._lock:
+            return '\n'.join(f'{stack} {count}' for stack, count in self.stacks.most_common()) + '\n'
+
+
+class MetricsServer:
+    """HTTP-сервер метрик: /metrics — Prometheus, /profile — стеки профилировщика"""
+
+    def __init__(self, host='127.0.0.1', port=9108, profiler=None):
+        self.profiler = profiler
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body = registry.render().encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                elif self.path == '/profile' and server.profiler:
+                    body = server.profiler.collapsed().encode('utf-8')
+                    content_type = 'text/plain; charset=utf-8'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics', daemon=True)
+        self._thread.start()
+        logger.info(f"Метрики доступны на порту {self.port}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self.profiler:
+            self.profiler.stop()
@@ -0,0 +1,214 @@
+"""Версионные миграции схемы БД.
+
+Файлы migrations/NNNN_описание.sql применяются по порядку номеров, каждый в
+своей транзакции; применённые версии записываются в schema_migrations.
+Параллельный запуск нескольких копий бота сериализуется advisory lock.
+
+    python migrate.py                  применить новые миграции
+    python migrate.py --check-plans    проверить планы горячих запросов
+    python migrate.py --archive        перенести старые статьи в news_archive
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+from datetime import datetime
+
+from config import RETENTION_CONFIG
+from database import Database
+from pagination import NEWER, OLDER, build_page_query, page_fetch_size
+from search import build_search_query
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_LOCK_ID = 7301001
+MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.sql$')
+
+HOT_QUERIES = {
+    'news_first_page_by_source': build_page_query(1, page_fetch_size(5)),
+    'news_first_page': build_page_query(None, page_fetch_size(5)),
+    'news_older_page_by_source': build_page_query(1, page_fetch_size(5), OLDER, (datetime(2024, 1, 1), 1000)),
+    'news_newer_page': build_page_query(None, page_fetch_size(5), NEWER, (datetime(2024, 1, 1), 1000)),
+    'subscribers_by_source': (
+        "SELECT user_id FROM subscriptions WHERE source_id = %s",
+        (1,)
+    ),
+    'new_news_by_source': (
+        "SELECT id, title, url FROM news WHERE source_id = %s AND id > %s ORDER BY id",
+        (1, 0)
+    ),
+}
+# Запросы с ранжированием: сортировка найденных строк неизбежна, проверяется
+# только отсутствие последовательного чтения
+RANKED_QUERIES = {
+    'search': build_search_query('ключевая ставка', None, 6, 0),
+    'search_by_source': build_search_query('oil prices', 1, 6, 0),
+}
+CHECKED_TABLES = {'news', 'news_archive', 'subscriptions'}
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+def apply_migrations(directory=MIGRATIONS_DIR):
+    """Применение всех ещё не применённых миграций; возвращает их версии"""
+    db = Database()
+    if not db.connection:
+        raise RuntimeError("Нет подключения к БД, миграции не применены")
+
+    connection = db.connection
+    cursor = db.cursor
+    applied_now = []
+    try:
+        cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        cursor.execute(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, "
+            "name TEXT NOT NULL, "
+            "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        )
+        connection.commit()
+
+        cursor.execute("SELECT version FROM schema_migrations")
+        applied = {row[0] for row in cursor.fetchall()}
+
+        for version, name, path in load_migrations(directory):
+            if version in applied:
+                continue
+            with open(path, encoding='utf-8') as f:
+                sql = f.read()
+            try:
+                cursor.execute(sql)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (version, name)
+                )
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                logger.error(f"Ошибка миграции {version:04d}_{name}")
+                raise
+            applied_now.append(version)
+            logger.info(f"Применена миграция {version:04d}_{name}")
+    finally:
+        try:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+            connection.commit()
+        finally:
+            db.close()
+    return applied_now
+
+
+def plan_problems(plan, tables=CHECKED_TABLES, allow_sort=False):
+    """Узлы плана EXPLAIN (FORMAT JSON), читающие или сортирующие таблицы без индекса"""
+    problems = []
+
+    def relations(node):
+        found = {node['Relation Name']} if node.get('Relation Name') in tables else set()
+        for child in node.get('Plans', []):
+            found |= relations(child)
+        return found
+
+    def walk(node):
+        node_type = node.get('Node Type')
+        if node_type == 'Seq Scan' and node.get('Relation Name') in tables:
+            problems.append(f"Seq Scan on {node['Relation Name']}")
+        elif node_type in ('Sort', 'Incremental Sort') and not allow_sort:
+            for relation in sorted(relations(node)):
+                problems.append(f"{node_type} on {relation}")
+        for child in node.get('Plans', []):
+            walk(child)
+
+    walk(plan['Plan'])
+    return problems
+
+
+def check_query_plans():
+    """Проверка, что горячие запросы обслуживаются индексами.
+
+    На маленьких таблицах планировщик обоснованно выбирает Seq Scan, поэтому
+    он запрещается (enable_seqscan = off): если подходящего индекса нет,
+    последовательное чтение всё равно останется в плане.
+    """
+    db = Database()
+    if not db.connection:
+        raise RuntimeError("Нет подключения к БД")
+
+    results = {}
+    try:
+        db.cursor.execute("SET LOCAL enable_seqscan = off")
+        queries = [(name, query, False) for name, query in HOT_QUERIES.items()]
+        queries += [(name, query, True) for name, query in RANKED_QUERIES.items()]
+        for name, (query, params), allow_sort in queries:
+            db.cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+            plan = db.cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            results[name] = plan_problems(plan[0], allow_sort=allow_sort)
+    finally:
+        db.connection.rollback()
+        db.close()
+    return results
+
+
+def archive_old_news(days=None, batch_size=None):
+    """Перенос статей старше days дней в news_archive; возвращает число строк"""
+    days = days or RETENTION_CONFIG['archive_after_days']
+    batch_size = batch_size or RETENTION_CONFIG['batch_size']
+    total = 0
+    while True:
+        db = Database()
+        try:
+            if not db.connection:
+                logger.warning("Архивация прервана: нет подключения к БД")
+                break
+            row = db.fetch_one("SELECT archive_news(make_interval(days => %s), %s)", (days, batch_size))
+            db.connection.commit()
+        finally:
+            db.close()
+        moved = row[0] if row else 0
+        total += moved
+        if moved < batch_size:
+            break
+    if total:
+        logger.info(f"Перенесено в архив статей: {total}")
+    return total
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Миграции схемы БД")
+    parser.add_argument('--check-plans', action='store_true', help="проверить планы горячих запросов")
+    parser.add_argument('--archive', action='store_true', help="перенести старые статьи в архив")
+    args = parser.parse_args()
+
+    if args.check_plans:
+        failed = False
+        for name, problems in check_query_plans().items():
+            print(f"{name}: {'OK' if not problems else ', '.join(problems)}")
+            failed = failed or bool(problems)
+        sys.exit(1 if failed else 0)
+
+    if args.archive:
+        print(f"Перенесено в архив: {archive_old_news()}")
+        return
+
+    applied = apply_migrations()
+    print(f"Применено миграций: {len(applied)}")
+
+
+if __name__ == '__main__':
+    main()
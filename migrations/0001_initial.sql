@@ -1,4 +1,4 @@
-CREATE TABLE users (
+CREATE TABLE IF NOT EXISTS users (
     id SERIAL PRIMARY KEY,
     telegram_id BIGINT UNIQUE NOT NULL,
     username VARCHAR(255),
@@ -6,14 +6,14 @@ CREATE TABLE users (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
-CREATE TABLE sources (
+CREATE TABLE IF NOT EXISTS sources (
     id SERIAL PRIMARY KEY,
     name VARCHAR(255) NOT NULL,
     base_url VARCHAR(255) NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
-CREATE TABLE news (
+CREATE TABLE IF NOT EXISTS news (
     id SERIAL PRIMARY KEY,
     source_id INTEGER NOT NULL REFERENCES sources(id),
     title TEXT NOT NULL,
@@ -22,7 +22,7 @@ CREATE TABLE news (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
-CREATE TABLE subscriptions (
+CREATE TABLE IF NOT EXISTS subscriptions (
     id SERIAL PRIMARY KEY,
     user_id INTEGER NOT NULL REFERENCES users(id),
     source_id INTEGER NOT NULL REFERENCES sources(id),
@@ -30,15 +30,28 @@ CREATE TABLE subscriptions (
     UNIQUE (user_id, source_id)
 );
 
-CREATE TABLE user_settings (
+CREATE TABLE IF NOT EXISTS user_settings (
     id SERIAL PRIMARY KEY,
     user_id INTEGER NOT NULL UNIQUE REFERENCES users(id),
     default_source_id INTEGER REFERENCES sources(id),
     items_per_page INTEGER DEFAULT 5
 );
 
-INSERT INTO sources (name, base_url) VALUES
-('Bloomberg', 'bloomberg.com'),
-('Коммерсантъ', 'kommersant.ru'),
-('Reuters', 'reuters.com'),
-('ТАСС', 'tass.ru');
\ No newline at end of file
+CREATE TABLE IF NOT EXISTS delivery_watermarks (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id),
+    last_news_id INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO delivery_watermarks (user_id, last_news_id)
+SELECT DISTINCT user_id, (SELECT COALESCE(MAX(id), 0) FROM news) FROM subscriptions
+ON CONFLICT (user_id) DO NOTHING;
+
+INSERT INTO sources (name, base_url)
+SELECT v.name, v.base_url FROM (VALUES
+    ('Bloomberg', 'bloomberg.com'),
+    ('Коммерсантъ', 'kommersant.ru'),
+    ('Reuters', 'reuters.com'),
+    ('ТАСС', 'tass.ru')
+) AS v (name, base_url)
+WHERE NOT EXISTS (SELECT 1 FROM sources);
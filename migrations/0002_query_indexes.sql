@@ -0,0 +1,11 @@
+-- /news по источнику: WHERE source_id = ? ORDER BY published_at DESC
+CREATE INDEX IF NOT EXISTS news_source_published_idx ON news (source_id, published_at DESC, id DESC);
+
+-- /news по всем источникам: ORDER BY published_at DESC
+CREATE INDEX IF NOT EXISTS news_published_idx ON news (published_at DESC, id DESC);
+
+-- рассылка: новые статьи источника после отметки доставки
+CREATE INDEX IF NOT EXISTS news_source_id_idx ON news (source_id, id);
+
+-- рассылка: подписчики источника
+CREATE INDEX IF NOT EXISTS subscriptions_source_idx ON subscriptions (source_id, user_id);
@@ -0,0 +1,36 @@
+-- Старые статьи переносятся из news в news_archive пачками, чтобы рабочая
+-- таблица и её индексы оставались небольшими. Секционирование news по дате
+-- не подходит: уникальный индекс по url должен был бы включать ключ секции.
+CREATE TABLE IF NOT EXISTS news_archive (
+    id INTEGER PRIMARY KEY,
+    source_id INTEGER NOT NULL REFERENCES sources(id),
+    title TEXT NOT NULL,
+    url TEXT NOT NULL,
+    published_at TIMESTAMP,
+    created_at TIMESTAMP,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS news_archive_published_idx ON news_archive (published_at);
+
+CREATE OR REPLACE FUNCTION archive_news(older_than INTERVAL, batch_size INTEGER DEFAULT 10000)
+RETURNS INTEGER AS $$
+DECLARE
+    moved INTEGER;
+BEGIN
+    WITH doomed AS (
+        SELECT id FROM news
+        WHERE published_at < CURRENT_TIMESTAMP - older_than
+        ORDER BY published_at
+        LIMIT batch_size
+    ), moved_rows AS (
+        DELETE FROM news n USING doomed d WHERE n.id = d.id
+        RETURNING n.id, n.source_id, n.title, n.url, n.published_at, n.created_at
+    )
+    INSERT INTO news_archive (id, source_id, title, url, published_at, created_at)
+    SELECT id, source_id, title, url, published_at, created_at FROM moved_rows;
+
+    GET DIAGNOSTICS moved = ROW_COUNT;
+    RETURN moved;
+END;
+$$ LANGUAGE plpgsql;
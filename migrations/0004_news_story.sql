@@ -0,0 +1,27 @@
+-- Сюжет: id первой статьи кластера похожих заголовков из разных источников
+ALTER TABLE news ADD COLUMN IF NOT EXISTS story_id INTEGER;
+ALTER TABLE news_archive ADD COLUMN IF NOT EXISTS story_id INTEGER;
+
+CREATE INDEX IF NOT EXISTS news_story_idx ON news (story_id);
+
+CREATE OR REPLACE FUNCTION archive_news(older_than INTERVAL, batch_size INTEGER DEFAULT 10000)
+RETURNS INTEGER AS $$
+DECLARE
+    moved INTEGER;
+BEGIN
+    WITH doomed AS (
+        SELECT id FROM news
+        WHERE published_at < CURRENT_TIMESTAMP - older_than
+        ORDER BY published_at
+        LIMIT batch_size
+    ), moved_rows AS (
+        DELETE FROM news n USING doomed d WHERE n.id = d.id
+        RETURNING n.id, n.source_id, n.title, n.url, n.published_at, n.created_at, n.story_id
+    )
+    INSERT INTO news_archive (id, source_id, title, url, published_at, created_at, story_id)
+    SELECT id, source_id, title, url, published_at, created_at, story_id FROM moved_rows;
+
+    GET DIAGNOSTICS moved = ROW_COUNT;
+    RETURN moved;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,54 @@
+-- Полнотекстовый поиск по заголовкам. Конфигурация разбора (морфология)
+-- задаётся для источника, вектор вычисляется триггером при вставке статьи.
+ALTER TABLE sources ADD COLUMN IF NOT EXISTS search_config regconfig NOT NULL DEFAULT 'simple';
+UPDATE sources SET search_config = 'english' WHERE name IN ('Bloomberg', 'Reuters');
+UPDATE sources SET search_config = 'russian' WHERE name IN ('Коммерсантъ', 'ТАСС');
+
+ALTER TABLE news ADD COLUMN IF NOT EXISTS search_vector tsvector;
+ALTER TABLE news_archive ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+CREATE OR REPLACE FUNCTION news_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := to_tsvector(
+        COALESCE((SELECT search_config FROM sources WHERE id = NEW.source_id), 'simple'::regconfig),
+        NEW.title
+    );
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS news_search_vector_trg ON news;
+CREATE TRIGGER news_search_vector_trg
+BEFORE INSERT OR UPDATE OF title, source_id ON news
+FOR EACH ROW EXECUTE FUNCTION news_search_vector();
+
+UPDATE news n SET search_vector = to_tsvector(s.search_config, n.title)
+FROM sources s WHERE s.id = n.source_id AND n.search_vector IS NULL;
+UPDATE news_archive n SET search_vector = to_tsvector(s.search_config, n.title)
+FROM sources s WHERE s.id = n.source_id AND n.search_vector IS NULL;
+
+CREATE INDEX IF NOT EXISTS news_search_idx ON news USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS news_archive_search_idx ON news_archive USING GIN (search_vector);
+
+CREATE OR REPLACE FUNCTION archive_news(older_than INTERVAL, batch_size INTEGER DEFAULT 10000)
+RETURNS INTEGER AS $$
+DECLARE
+    moved INTEGER;
+BEGIN
+    WITH doomed AS (
+        SELECT id FROM news
+        WHERE published_at < CURRENT_TIMESTAMP - older_than
+        ORDER BY published_at
+        LIMIT batch_size
+    ), moved_rows AS (
+        DELETE FROM news n USING doomed d WHERE n.id = d.id
+        RETURNING n.id, n.source_id, n.title, n.url, n.published_at, n.created_at, n.story_id,
+                  n.search_vector
+    )
+    INSERT INTO news_archive (id, source_id, title, url, published_at, created_at, story_id, search_vector)
+    SELECT id, source_id, title, url, published_at, created_at, story_id, search_vector FROM moved_rows;
+
+    GET DIAGNOSTICS moved = ROW_COUNT;
+    RETURN moved;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,4 @@
+-- Листание ленты идёт по ключу (published_at, id), NULL в нём ломает сравнение
+UPDATE news SET published_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE published_at IS NULL;
+ALTER TABLE news ALTER COLUMN published_at SET DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE news ALTER COLUMN published_at SET NOT NULL;
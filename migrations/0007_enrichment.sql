@@ -0,0 +1,59 @@
+-- Дообогащение статей: время публикации и анонс со страницы статьи.
+-- Новые статьи попадают в очередь enrichment_frontier триггером в той же
+-- транзакции, что и вставка; обработанные строки удаляются, поэтому после
+-- перезапуска работа не повторяется.
+ALTER TABLE news ADD COLUMN IF NOT EXISTS summary TEXT;
+ALTER TABLE news_archive ADD COLUMN IF NOT EXISTS summary TEXT;
+
+CREATE TABLE IF NOT EXISTS enrichment_frontier (
+    news_id INTEGER PRIMARY KEY REFERENCES news(id) ON DELETE CASCADE,
+    url TEXT NOT NULL,
+    host TEXT NOT NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS enrichment_frontier_due_idx
+    ON enrichment_frontier (next_attempt_at) WHERE status = 'pending';
+
+CREATE OR REPLACE FUNCTION enqueue_enrichment() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO enrichment_frontier (news_id, url, host)
+    VALUES (NEW.id, NEW.url, COALESCE(lower(substring(NEW.url FROM '^[a-z]+://([^/:?#]+)')), ''))
+    ON CONFLICT (news_id) DO NOTHING;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS news_enqueue_enrichment_trg ON news;
+CREATE TRIGGER news_enqueue_enrichment_trg
+AFTER INSERT ON news
+FOR EACH ROW EXECUTE FUNCTION enqueue_enrichment();
+
+CREATE OR REPLACE FUNCTION archive_news(older_than INTERVAL, batch_size INTEGER DEFAULT 10000)
+RETURNS INTEGER AS $$
+DECLARE
+    moved INTEGER;
+BEGIN
+    WITH doomed AS (
+        SELECT id FROM news
+        WHERE published_at < CURRENT_TIMESTAMP - older_than
+        ORDER BY published_at
+        LIMIT batch_size
+    ), moved_rows AS (
+        DELETE FROM news n USING doomed d WHERE n.id = d.id
+        RETURNING n.id, n.source_id, n.title, n.url, n.published_at, n.created_at, n.story_id,
+                  n.search_vector, n.summary
+    )
+    INSERT INTO news_archive (id, source_id, title, url, published_at, created_at, story_id,
+                              search_vector, summary)
+    SELECT id, source_id, title, url, published_at, created_at, story_id, search_vector, summary
+    FROM moved_rows;
+
+    GET DIAGNOSTICS moved = ROW_COUNT;
+    RETURN moved;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,30 @@
+-- Дайджест: вместо рассылки каждой новой статьи пользователь получает одно
+-- сообщение раз в час или раз в день в выбранное время (время сервера).
+-- next_digest_at хранится явно, чтобы выборка пользователей слота шла по
+-- частичному индексу, а не вычислялась для каждой строки user_settings.
+ALTER TABLE user_settings ADD COLUMN IF NOT EXISTS digest_mode VARCHAR(8) NOT NULL DEFAULT 'off';
+ALTER TABLE user_settings ADD COLUMN IF NOT EXISTS digest_time TIME;
+ALTER TABLE user_settings ADD COLUMN IF NOT EXISTS last_digest_at TIMESTAMP;
+ALTER TABLE user_settings ADD COLUMN IF NOT EXISTS next_digest_at TIMESTAMP;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'user_settings_digest_mode_check') THEN
+        ALTER TABLE user_settings ADD CONSTRAINT user_settings_digest_mode_check
+            CHECK (digest_mode IN ('off', 'hourly', 'daily')
+                   AND (digest_mode <> 'daily' OR digest_time IS NOT NULL));
+    END IF;
+END;
+$$;
+
+CREATE INDEX IF NOT EXISTS user_settings_digest_due_idx
+    ON user_settings (next_digest_at) WHERE digest_mode <> 'off';
+
+-- Ближайший слот строго после момента after
+CREATE OR REPLACE FUNCTION digest_next_slot(mode TEXT, at TIME, after TIMESTAMP) RETURNS TIMESTAMP AS $$
+    SELECT CASE mode
+        WHEN 'hourly' THEN date_trunc('hour', after) + interval '1 hour'
+        WHEN 'daily' THEN date_trunc('day', after) + at
+            + CASE WHEN at <= after::time THEN interval '1 day' ELSE interval '0' END
+    END;
+$$ LANGUAGE sql IMMUTABLE;
@@ -0,0 +1,8 @@
+-- Тексты поисковых запросов. callback_data кнопок поиска ограничена 64
+-- байтами, поэтому в ней хранится id запроса, источник и страница, а сам
+-- текст — здесь: листание работает на любой копии бота, без состояния в
+-- памяти процесса. Одинаковые запросы хранятся один раз.
+CREATE TABLE IF NOT EXISTS search_queries (
+    id SERIAL PRIMARY KEY,
+    query TEXT NOT NULL UNIQUE
+);
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+EPOCH = datetime(1970, 1, 1)
+OLDER, NEWER = 'o', 'n'
+CALLBACK_PREFIX = 'news_'
+STORY_OVERFETCH = 3
+
+
+def _base36(number):
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    result = ''
+    while True:
+        number, remainder = divmod(number, 36)
+        result = digits[remainder] + result
+        if not number:
+            return result
+
+
+def encode_cursor(direction, published_at, news_id):
+    """callback_data кнопки листания: направление и позиция (published_at, id).
+
+    Время хранится в микросекундах от эпохи, оба числа — в base36, так что
+    строка занимает около 30 байт при лимите Telegram в 64.
+    """
+    microseconds = (published_at - EPOCH) // timedelta(microseconds=1)
+    return f"{CALLBACK_PREFIX}{direction}_{_base36(microseconds)}_{_base36(news_id)}"
+
+
+def decode_cursor(data):
+    direction, microseconds, news_id = data[len(CALLBACK_PREFIX):].split('_')
+    if direction not in (OLDER, NEWER):
+        raise ValueError(f"Unknown direction: {direction}")
+    return direction, EPOCH + timedelta(microseconds=int(microseconds, 36)), int(news_id, 36)
+
+
+def build_page_query(source_id, limit, direction=OLDER, cursor=None):
+    """Одна страница ленты по ключу (published_at, id).
+
+    Условие по кортежу и сортировка совпадают с индексами
+    news (source_id, published_at DESC, id DESC) и news (published_at DESC, id DESC),
+    поэтому стоимость запроса не зависит от глубины листания. Страница назад
+    (NEWER) читается по индексу в обратную сторону и разворачивается вызывающим.
+    """
+    conditions, params = [], []
+    if source_id:
+        conditions.append("n.source_id = %s")
+        params.append(source_id)
+    if cursor is not None:
+        conditions.append(f"(n.published_at, n.id) {'<' if direction == OLDER else '>'} (%s, %s)")
+        params += list(cursor)
+    order = "DESC" if direction == OLDER else "ASC"
+
+    query = "SELECT n.id, n.published_at, n.title, n.url, COALESCE(n.story_id, n.id), n.summary FROM news n "
+    if conditions:
+        query += "WHERE " + " AND ".join(conditions) + " "
+    query += f"ORDER BY n.published_at {order}, n.id {order} LIMIT %s"
+    return query, params + [limit]
+
+
+def page_fetch_size(items_per_page):
+    """Сколько строк читать на страницу: с запасом на статьи уже показанных сюжетов"""
+    return items_per_page * STORY_OVERFETCH + 1
+
+
+def collapse_stories(rows, items_per_page):
+    """Первые items_per_page статей разных сюжетов и признак следующей страницы.
+
+    Сюжеты схлопываются после LIMIT, поэтому запрос читает
+    page_fetch_size(items_per_page) строк: иначе каждая повторная статья
+    сюжета укорачивала бы страницу. Если запас кончился раньше, чем набралась
+    страница, а строки в выборке ещё могли остаться, следующая страница
+    считается существующей. Сюжет — пятый столбец строки build_page_query.
+    """
+    page, stories = [], set()
+    for row in rows:
+        if row[4] in stories:
+            continue
+        if len(page) == items_per_page:
+            return page, True
+        stories.add(row[4])
+        page.append(row)
+    return page, len(rows) >= page_fetch_size(items_per_page)
@@ -1,116 +1,289 @@
-from bs4 import BeautifulSoup
-import requests
-import re
 from datetime import datetime
 from database import Database
+from extraction import extract_items, extract_records, warm_worker
+from http_cache import FetchCache
+from sources import load_sources, sync_sources
+from cache import invalidate_news
+from cluster import NEWS_CHANNEL, notify
+import metrics
+from dedup import story_index
+from url_filter import url_filter
 import logging
+import multiprocessing
+import threading
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from config import SCRAPER_CONFIG
 
 logger = logging.getLogger(__name__)
-USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+fetch_cache = FetchCache(SCRAPER_CONFIG['fetch_cache_path'])
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+_scrape_executor = None
+_scrape_lock = threading.Lock()
+_scrape_in_flight = {}
 
-def parse_bloomberg():
-    try:
-        url = "https://www.bloomberg.com/markets"
-        response = requests.get(url, headers={'User-Agent': USER_AGENT}, timeout=10)
-        soup = BeautifulSoup(response.text, 'lxml')
-        news = []
-        
-        for article in soup.select('article.story-list-story'):
-            title_elem = article.select_one('a.story-list-story__info__headline')
-            if title_elem:
-                title = title_elem.text.strip()
-                link = 'https://www.bloomberg.com' + title_elem['href']
-                news.append({'title': title, 'url': link})
-        return news
-    except Exception as e:
-        logger.error(f"Error parsing Bloomberg: {e}")
-        return []
+def get_parse_pool():
+    """Пул процессов для разбора страниц (создаётся при первом обращении).
 
-def parse_kommersant():
-    try:
-        url = "https://www.kommersant.ru/"
-        response = requests.get(url, headers={'User-Agent': USER_AGENT}, timeout=10)
-        soup = BeautifulSoup(response.text, 'lxml')
-        news = []
-        
-        for item in soup.select('.uho__link'):
-            title = item.text.strip()
-            link = item['href']
-            if not link.startswith('http'):
-                link = 'https://www.kommersant.ru' + link
-            news.append({'title': title, 'url': link})
-        return news
-    except Exception as e:
-        logger.error(f"Error parsing Kommersant: {e}")
-        return []
+    Процессы запускаются через spawn, а не fork: в родительском процессе уже
+    работают потоки планировщика и пула соединений. Все процессы стартуют
+    сразу и прогреваются, поэтому первый цикл сбора не ждёт импорта lxml.
+    """
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            workers = SCRAPER_CONFIG['parse_workers']
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=warm_worker,
+                initargs=(tuple(SOURCES),)
+            )
+            try:
+                for future in [pool.submit(warm_worker) for _ in range(workers)]:
+                    future.result()
+            except Exception:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+            _parse_pool = pool
+            logger.info(f"Parse pool started with {workers} processes")
+        return _parse_pool
 
-def parse_reuters():
-    try:
-        url = "https://www.reuters.com/"
-        response = requests.get(url, headers={'User-Agent': USER_AGENT}, timeout=10)
-        soup = BeautifulSoup(response.text, 'lxml')
-        news = []
-        
-        for article in soup.select('article.story'):
-            title_elem = article.select_one('a[data-testid="Heading"]')
-            if title_elem:
-                title = title_elem.text.strip()
-                link = 'https://www.reuters.com' + title_elem['href']
-                news.append({'title': title, 'url': link})
-        return news
-    except Exception as e:
-        logger.error(f"Error parsing Reuters: {e}")
-        return []
+def close_parse_pool():
+    global _parse_pool
+    with _parse_pool_lock:
+        pool, _parse_pool = _parse_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
 
-def parse_tass():
+def extract(html, spec, timeout=None):
+    """Разбор страницы в текущем процессе или в пуле, по SCRAPER_CONFIG['parse_mode']"""
+    if SCRAPER_CONFIG['parse_mode'] != 'process':
+        return extract_items(html, spec)
     try:
-        url = "https://tass.ru/"
-        response = requests.get(url, headers={'User-Agent': USER_AGENT}, timeout=10)
-        soup = BeautifulSoup(response.text, 'lxml')
-        news = []
-        
-        for item in soup.select('.news-card__title'):
-            title = item.text.strip()
-            link = item.find_parent('a')['href']
-            if not link.startswith('http'):
-                link = 'https://tass.ru' + link
-            news.append({'title': title, 'url': link})
-        return news
-    except Exception as e:
-        logger.error(f"Error parsing TASS: {e}")
-        return []
+        records = get_parse_pool().submit(extract_records, html, spec).result(timeout=timeout)
+    except BrokenProcessPool:
+        logger.error("Parse pool is broken, restarting")
+        close_parse_pool()
+        raise
+    return [{'title': title, 'url': url} for title, url in records]
+
+def parse_source(spec, timeout=10):
+    html = fetch_cache.fetch(spec.name, spec.url, timeout=timeout)
+    if html is None:
+        return None
+    return extract(html, spec, timeout=timeout)
 
 def save_news_to_db(source_name, news_items):
+    """Сохранение новостей одного источника одной транзакцией.
+
+    URL, уже известные url_filter, отбрасываются до обращения к БД;
+    остальные вставляются одним многострочным INSERT, а дубликаты, которых
+    фильтр не знал, отбрасывает ON CONFLICT по уникальному news.url. Новым
+    статьям в той же транзакции проставляется story_id из индекса похожих заголовков и
+    отправляется NOTIFY для копий, обслуживающих пользователей.
+    Возвращает пару (добавлено, дубликатов) или None при ошибке записи.
+    """
     if not news_items:
-        return
-    
+        return 0, 0
+
+    try:
+        url_filter.warm()
+    except Exception as e:
+        logger.warning(f"URL filter warm-up failed: {e}")
+
+    unique_items = {}
+    for item in news_items:
+        unique_items.setdefault(item['url'], item)
+    known = len(unique_items)
+    unique_items = {url: unique_items[url] for url in url_filter.unknown(unique_items)}
+    known -= len(unique_items)
+    if known:
+        metrics.url_filter_hits.inc(known)
+    if not unique_items:
+        logger.info(f"{source_name}: added 0 news, skipped {len(news_items)} known urls")
+        return 0, len(news_items)
+
     db = Database()
     try:
         source = db.fetch_one("SELECT id FROM sources WHERE name = %s", (source_name,))
-        
+
         if not source:
             logger.warning(f"Source not found: {source_name}")
-            return
-        
-        for item in news_items:
-            exists = db.fetch_one("SELECT id FROM news WHERE url = %s", (item['url'],))
-            if not exists:
-                db.execute(
-                    "INSERT INTO news (source_id, title, url, published_at) VALUES (%s, %s, %s, %s)",
-                    (source[0], item['title'], item['url'], datetime.now()),
-                    commit=True
-                )
-                logger.info(f"Added news: {item['title'][:50]}...")
+            return 0, 0
+
+        try:
+            story_index.warm(db)
+        except Exception as e:
+            db.connection.rollback()
+            logger.warning(f"Story index warm-up failed: {e}")
+        published_at = datetime.now()
+        rows = db.execute_values(
+            "INSERT INTO news (source_id, title, url, published_at) VALUES %s "
+            "ON CONFLICT (url) DO NOTHING RETURNING id, url",
+            [(source[0], item['title'], url, published_at) for url, item in unique_items.items()]
+        )
+        if rows is None:
+            logger.error(f"Error saving news for {source_name}")
+            return None
+
+        new_ids = sorted(rows)
+        stories = [
+            (news_id, story_index.assign(news_id, unique_items[url]['title']))
+            for news_id, url in new_ids
+        ]
+        if stories:
+            notify(db, NEWS_CHANNEL, {'source_id': source[0], 'inserted': len(stories)})
+            updated = db.execute_values(
+                "UPDATE news SET story_id = v.story_id FROM (VALUES %s) AS v (id, story_id) "
+                "WHERE news.id = v.id RETURNING news.id",
+                stories,
+                commit=True
+            )
+            if updated is None:
+                story_index.remove([news_id for news_id, _ in stories])
+                logger.error(f"Error saving news for {source_name}")
+                return None
+        else:
+            db.connection.commit()
+
+        url_filter.add(unique_items, max((news_id for news_id, _ in rows), default=0))
+        url_filter.maybe_save()
+
+        inserted = len(rows)
+        duplicates = len(news_items) - inserted
+        if inserted:
+            invalidate_news(source[0])
+        logger.info(f"{source_name}: added {inserted} news, skipped {duplicates} duplicates")
+        return inserted, duplicates
     except Exception as e:
         logger.error(f"Error saving news: {e}")
+        return None
     finally:
         db.close()
 
-def fetch_all_news():
+SOURCES = load_sources(SCRAPER_CONFIG['sources_path'])
+
+def register_sources():
+    db = Database()
+    try:
+        sync_sources(db, SOURCES)
+    finally:
+        db.close()
+
+def collect_source(spec, timeout, deadline=None):
+    token = metrics.current_handler.set('scraper')
+    try:
+        stats = _collect_source(spec, timeout, deadline)
+    finally:
+        metrics.current_handler.reset(token)
+
+    metrics.scrape_results.inc(source=spec.name, status=stats['status'])
+    if stats['status'] in ('ok', 'unchanged'):
+        metrics.scrape_last_success.set(time.time(), source=spec.name)
+    if stats['inserted']:
+        metrics.news_inserted.inc(stats['inserted'], source=spec.name)
+    return stats
+
+def _collect_source(spec, timeout, deadline=None):
+    started = time.monotonic()
+    source_name = spec.name
+    try:
+        with metrics.parse_seconds.time(source=source_name):
+            items = parse_source(spec, timeout=timeout)
+    except Exception as e:
+        logger.error(f"Error parsing {source_name}: {e}")
+        fetch_cache.discard(source_name)
+        return _empty_stats(started, 'error')
+    if items is None:
+        return _empty_stats(started, 'unchanged')
+    if deadline is not None and time.monotonic() > deadline:
+        logger.warning(f"{source_name}: parsed after the cycle deadline, not saved")
+        fetch_cache.discard(source_name)
+        return _empty_stats(started, 'timeout')
+
+    with metrics.ingest_seconds.time(source=source_name):
+        saved = save_news_to_db(source_name, items)
+    if saved is None:
+        fetch_cache.discard(source_name)
+        return _empty_stats(started, 'error')
+    if items:
+        fetch_cache.commit(source_name)
+    else:
+        fetch_cache.discard(source_name)
+    inserted, duplicates = saved
+    return {
+        'items': len(items),
+        'inserted': inserted,
+        'duplicates': duplicates,
+        'seconds': time.monotonic() - started,
+        'status': 'ok'
+    }
+
+def _empty_stats(started, status):
+    return {'items': 0, 'inserted': 0, 'duplicates': 0, 'seconds': time.monotonic() - started, 'status': status}
+
+def _get_scrape_executor():
+    global _scrape_executor
+    with _scrape_lock:
+        if _scrape_executor is None:
+            _scrape_executor = ThreadPoolExecutor(
+                max_workers=SCRAPER_CONFIG['max_workers'], thread_name_prefix='scraper'
+            )
+        return _scrape_executor
+
+def fetch_all_news(concurrent=True):
+    """Сбор новостей со всех источников.
+
+    В параллельном режиме источники опрашиваются одновременно в общем пуле
+    потоков (не больше max_workers), а весь цикл ограничен cycle_deadline
+    секундами. Поток нельзя прервать, поэтому источник, не успевший к сроку,
+    получает статус timeout, а его работа, если разбор ещё не закончен, не
+    доходит до записи в БД. Пока прежний запуск источника не завершился,
+    новый не начинается (статус busy). Возвращает статистику по каждому
+    источнику.
+    """
     logger.info("Начало сбора новостей...")
-    save_news_to_db('Bloomberg', parse_bloomberg())
-    save_news_to_db('Коммерсантъ', parse_kommersant())
-    save_news_to_db('Reuters', parse_reuters())
-    save_news_to_db('ТАСС', parse_tass())
-    logger.info("Сбор новостей завершен")
\ No newline at end of file
+    started = time.monotonic()
+    timeout = SCRAPER_CONFIG['source_timeout']
+    stats = {}
+
+    if not concurrent:
+        for spec in SOURCES:
+            stats[spec.name] = collect_source(spec, timeout)
+    else:
+        deadline = started + SCRAPER_CONFIG['cycle_deadline']
+        executor = _get_scrape_executor()
+        futures = {}
+        with _scrape_lock:
+            for spec in SOURCES:
+                previous = _scrape_in_flight.get(spec.name)
+                if previous is not None and not previous.done():
+                    logger.warning(f"{spec.name}: previous run still in progress, skipped")
+                    stats[spec.name] = _empty_stats(started, 'busy')
+                    continue
+                future = executor.submit(collect_source, spec, timeout, deadline)
+                _scrape_in_flight[spec.name] = future
+                futures[future] = spec.name
+        done, not_done = wait(futures, timeout=max(0, deadline - time.monotonic()))
+        for future in done:
+            source_name = futures[future]
+            try:
+                stats[source_name] = future.result()
+            except Exception as e:
+                logger.error(f"Error collecting {source_name}: {e}")
+                stats[source_name] = _empty_stats(started, 'error')
+        for future in not_done:
+            source_name = futures[future]
+            logger.warning(f"{source_name} missed the cycle deadline")
+            stats[source_name] = _empty_stats(started, 'timeout')
+
+    for source_name, source_stats in stats.items():
+        logger.info(
+            f"{source_name}: {source_stats['items']} items, {source_stats['inserted']} new "
+            f"in {source_stats['seconds']:.2f}s ({source_stats['status']})"
+        )
+    logger.info(f"Сбор новостей завершен за {time.monotonic() - started:.2f}s")
+    return stats
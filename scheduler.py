@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SourceState:
+    def __init__(self, spec, now):
+        self.spec = spec
+        self.interval = spec.interval
+        self.next_run = now
+        self.last_success = None
+        self.failures = 0
+        self.running = False
+
+
+class NewsScheduler:
+    """Планировщик сбора новостей в цикле событий бота.
+
+    У каждого источника свой интервал: он сокращается, если источник часто
+    публикует новое (ориентир — target_items новых статей за запуск), и
+    растёт, если новых статей нет. После ошибки источник повторяется с
+    экспоненциальной задержкой от min_interval до max_backoff. Один источник
+    никогда не опрашивается параллельно сам с собой.
+    """
+
+    def __init__(self, specs, collect, min_interval=60, max_interval=7200, jitter=0.1,
+                 max_backoff=1800, target_items=3, max_concurrent=4, timeout=10, rng=None,
+                 on_collected=None):
+        self.collect = collect
+        self.on_collected = on_collected
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self.target_items = target_items
+        self.timeout = timeout
+        self._rng = rng or random.Random()
+        self._max_concurrent = max_concurrent
+        now = time.monotonic()
+        self.states = [SourceState(spec, now) for spec in specs]
+        self._semaphore = None
+        self._wakeup = None
+        self._task = None
+        self._runs = set()
+
+    def _clamp(self, interval):
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def reschedule(self, state, stats, now):
+        """Расчёт следующего запуска по результату сбора"""
+        if stats['status'] in ('error', 'timeout'):
+            state.failures += 1
+            delay = min(self.min_interval * 2 ** (state.failures - 1), self.max_backoff)
+        else:
+            state.failures = 0
+            inserted = stats.get('inserted', 0)
+            if inserted and state.last_success is not None:
+                rate = inserted / max(now - state.last_success, 1)
+                ideal = self.target_items / rate
+                state.interval = self._clamp(0.5 * state.interval + 0.5 * ideal)
+            elif not inserted:
+                state.interval = self._clamp(state.interval * 1.5)
+            state.last_success = now
+            delay = state.interval
+
+        delay *= self._rng.uniform(1 - self.jitter, 1 + self.jitter)
+        state.next_run = now + delay
+        return delay
+
+    def start(self):
+        self._semaphore = asyncio.Semaphore(self._max_concurrent)
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._loop())
+        logger.info(f"Планировщик запущен, источников: {len(self.states)}")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, *self._runs, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            now = time.monotonic()
+            for state in self.states:
+                if not state.running and state.next_run <= now:
+                    state.running = True
+                    run = asyncio.create_task(self._run_source(state))
+                    self._runs.add(run)
+                    run.add_done_callback(self._runs.discard)
+
+            waiting = [state.next_run for state in self.states if not state.running]
+            timeout = max(min(waiting) - now, 0) if waiting else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run_source(self, state):
+        try:
+            async with self._semaphore:
+                try:
+                    stats = await asyncio.to_thread(self.collect, state.spec, self.timeout)
+                except Exception as e:
+                    logger.error(f"Ошибка сбора {state.spec.name}: {e}")
+                    stats = {'status': 'error', 'inserted': 0}
+            delay = self.reschedule(state, stats, time.monotonic())
+            logger.info(
+                f"{state.spec.name}: {stats['status']}, новых {stats.get('inserted', 0)}, "
+                f"следующий запуск через {delay:.0f} с"
+            )
+            if self.on_collected:
+                self.on_collected(state.spec, stats)
+        finally:
+            state.running = False
+            self._wakeup.set()
@@ -0,0 +1,63 @@
+import html
+
+CALLBACK_PREFIX = 'search_'
+SAVE_SEARCH_QUERY = (
+    "INSERT INTO search_queries (query) VALUES (%s) "
+    "ON CONFLICT (query) DO UPDATE SET query = EXCLUDED.query RETURNING id"
+)
+LOAD_SEARCH_QUERY = "SELECT query FROM search_queries WHERE id = %s"
+
+# Заголовки проиндексированы с морфологией своего источника (sources.search_config),
+# поэтому запрос разбирается обеими конфигурациями и объединяется через OR:
+# русские слова совпадут с русскими основами, английские — с английскими.
+TSQUERY = "(websearch_to_tsquery('russian', %s) || websearch_to_tsquery('english', %s))"
+
+SEARCH_BRANCH = (
+    "(SELECT n.id, n.title, n.url, n.published_at, n.source_id, "
+    "ts_rank_cd(n.search_vector, {tsquery}) AS rank "
+    "FROM {table} n WHERE n.search_vector @@ {tsquery}{source_filter} "
+    "ORDER BY rank DESC, n.published_at DESC, n.id DESC LIMIT %s)"
+)
+
+
+def build_search_query(text, source_id=None, limit=5, offset=0):
+    """SQL и параметры поиска по news и news_archive.
+
+    Совпадения выбираются по GIN-индексам search_vector, каждая таблица
+    отдаёт не больше offset + limit лучших строк, итоговая сортировка идёт
+    по рангу, затем по дате публикации. Ранг считается для всех совпадений,
+    поэтому глубина листания ограничена SEARCH_CONFIG['max_pages'] и
+    offset не растёт без предела.
+    """
+    source_filter = " AND n.source_id = %s" if source_id else ""
+    branch = SEARCH_BRANCH.format(tsquery=TSQUERY, table='{table}', source_filter=source_filter)
+    branch_params = [text, text, text, text] + ([source_id] if source_id else []) + [offset + limit]
+
+    query = (
+        "SELECT f.title, f.url, f.published_at, s.name FROM ("
+        + branch.format(table='news') + " UNION ALL " + branch.format(table='news_archive')
+        + ") f JOIN sources s ON s.id = f.source_id "
+        "ORDER BY f.rank DESC, f.published_at DESC, f.id DESC LIMIT %s OFFSET %s"
+    )
+    return query, branch_params * 2 + [limit, offset]
+
+
+def render_results(text, rows, page):
+    message = f"🔎 Результаты по запросу «{html.escape(text)}», страница {page + 1}:\n\n"
+    for title, url, published_at, source_name in rows:
+        date = published_at.strftime('%d.%m.%Y') if published_at else ''
+        message += (
+            f"{html.escape(title)}\n"
+            f"<i>{html.escape(source_name)}, {date}</i> <a href='{html.escape(url)}'>Читать</a>\n\n"
+        )
+    return message
+
+
+def encode_page(query_id, source_id, page):
+    """callback_data кнопки поиска: id сохранённого запроса, источник, страница"""
+    return f"{CALLBACK_PREFIX}{query_id}_{source_id or 0}_{page}"
+
+
+def decode_page(data):
+    query_id, source_id, page = (int(part) for part in data[len(CALLBACK_PREFIX):].split('_'))
+    return query_id, source_id or None, page
@@ -0,0 +1,68 @@
+import json
+import logging
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SourceSpec:
+    """Описание источника новостей.
+
+    name должен совпадать с sources.name в БД. item_selector выбирает
+    элементы-новости, link задаёт, где искать ссылку: 'self' (сам элемент),
+    'parent' (ближайший родительский <a>) или CSS-селектор внутри элемента.
+    strainer — аргументы SoupStrainer для частичного разбора страницы.
+    language — конфигурация полнотекстового поиска PostgreSQL для заголовков
+    ('russian', 'english' или 'simple').
+    """
+    name: str
+    url: str
+    item_selector: str
+    link: str = 'self'
+    base_url: str = ''
+    strainer: dict = field(default=None, hash=False, compare=False)
+    interval: int = 1800
+    enabled: bool = True
+    language: str = 'simple'
+
+    def __post_init__(self):
+        if not self.base_url:
+            object.__setattr__(self, 'base_url', self.url)
+
+
+def load_sources(path):
+    with open(path, encoding='utf-8') as f:
+        entries = json.load(f)
+
+    specs = []
+    names = set()
+    for entry in entries:
+        spec = SourceSpec(**entry)
+        if spec.name in names:
+            raise ValueError(f"Duplicate source in {path}: {spec.name}")
+        names.add(spec.name)
+        if spec.enabled:
+            specs.append(spec)
+    return specs
+
+
+def sync_sources(db, specs):
+    """Добавление в таблицу sources источников, описанных только в конфигурации"""
+    if not specs:
+        return
+    rows = db.execute_values(
+        "INSERT INTO sources (name, base_url, search_config) "
+        "SELECT v.name, v.base_url, v.search_config::regconfig "
+        "FROM (VALUES %s) AS v (name, base_url, search_config) "
+        "WHERE NOT EXISTS (SELECT 1 FROM sources s WHERE s.name = v.name) "
+        "RETURNING name",
+        [(spec.name, _domain(spec.base_url), spec.language) for spec in specs],
+        commit=True
+    )
+    for row in rows or []:
+        logger.info(f"Registered new source: {row[0]}")
+
+
+def _domain(url):
+    return url.split('://')[-1].split('/')[0].replace('www.', '')
@@ -0,0 +1,41 @@
+import time
+
+from cache import TTLCache
+
+
+def test_lru_eviction():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_ttl_expiry():
+    cache = TTLCache(maxsize=10, ttl=0.01)
+    cache.set('a', [])
+    assert cache.get('a') == []
+    time.sleep(0.02)
+    assert cache.get('a') is None
+
+
+def test_invalidate_by_predicate():
+    cache = TTLCache()
+    cache.set((1, 5), ['one'])
+    cache.set((2, 5), ['two'])
+    cache.set((None, 5), ['all'])
+    cache.invalidate(lambda key: key[0] in (1, None))
+    assert cache.get((1, 5)) is None
+    assert cache.get((None, 5)) is None
+    assert cache.get((2, 5)) == ['two']
+
+
+def test_stale_read_is_not_cached():
+    cache = TTLCache()
+    version = cache.version
+    cache.invalidate(lambda key: key == 'a')
+    cache.set('a', 'stale', version)
+    assert cache.get('a') is None
@@ -0,0 +1,89 @@
+import asyncio
+import os
+
+import pytest
+
+import config
+from benchmarks.ephemeral_pg import EphemeralPostgres, find_pg_bin, use_database
+from cluster import LeaderElection, LeaderLock, NotificationListener, NEWS_CHANNEL, notify
+from database import Database, close_pool
+
+pytestmark = pytest.mark.skipif(
+    find_pg_bin() is None or os.geteuid() == 0,
+    reason="нужен PostgreSQL (initdb), запуск не от root"
+)
+
+
+@pytest.fixture(scope='module')
+def postgres():
+    saved = dict(config.DB_CONFIG)
+    with EphemeralPostgres() as pg:
+        use_database(pg.db_config())
+        yield pg
+        close_pool()
+    config.DB_CONFIG.clear()
+    config.DB_CONFIG.update(saved)
+
+
+def test_leader_lock_is_exclusive(postgres):
+    first, second = LeaderLock(1), LeaderLock(1)
+    assert first.try_acquire()
+    assert not second.try_acquire()
+    assert first.check()
+    first.release()
+    assert second.try_acquire()
+    second.release()
+
+
+def test_election_hands_over_role(postgres):
+    events = []
+
+    def callbacks(name):
+        async def elected():
+            events.append((name, 'elected'))
+
+        async def deposed():
+            events.append((name, 'deposed'))
+        return elected, deposed
+
+    async def scenario():
+        first = LeaderElection('a', 2, *callbacks('a'), interval=0.05)
+        second = LeaderElection('b', 2, *callbacks('b'), interval=0.05)
+        first.start()
+        await asyncio.sleep(0.3)
+        second.start()
+        await asyncio.sleep(0.3)
+        await first.stop()
+        await asyncio.sleep(0.3)
+        await second.stop()
+
+    asyncio.run(scenario())
+    assert events == [('a', 'elected'), ('a', 'deposed'), ('b', 'elected'), ('b', 'deposed')]
+
+
+def test_listener_receives_notify_after_commit(postgres):
+    received = []
+
+    async def scenario():
+        connected = asyncio.Event()
+        listener = NotificationListener({NEWS_CHANNEL: received.append}, on_connect=connected.set)
+        listener.start()
+        await asyncio.wait_for(connected.wait(), 5)
+
+        db = Database()
+        try:
+            notify(db, NEWS_CHANNEL, {'source_id': 1, 'inserted': 3})
+            await asyncio.sleep(0.2)
+            assert received == []
+            db.connection.commit()
+        finally:
+            db.close()
+
+        for _ in range(50):
+            if received:
+                break
+            await asyncio.sleep(0.05)
+        await listener.stop()
+
+    asyncio.run(scenario())
+    assert received == [{'source_id': 1, 'inserted': 3}]
@@ -0,0 +1,202 @@
+import asyncio
+from types import SimpleNamespace
+
+import psycopg2
+import pytest
+
+import coalesce
+from coalesce import Debouncer, SingleFlight, UserThrottle, guarded
+from database import Database
+
+
+def test_single_flight_merges_concurrent_calls():
+    calls = []
+
+    async def query(source_id):
+        calls.append(source_id)
+        await asyncio.sleep(0.02)
+        return [('title', source_id)]
+
+    async def run():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do(('news', 1), query, 1) for _ in range(50)))
+        assert len(flight) == 0
+        again = await flight.do(('news', 1), query, 1)
+        return results, again
+
+    results, again = asyncio.run(run())
+    assert calls == [1, 1]
+    assert all(result == [('title', 1)] for result in results + [again])
+
+
+def test_single_flight_survives_waiter_cancellation():
+    async def query():
+        await asyncio.sleep(0.05)
+        return 'rows'
+
+    async def run():
+        flight = SingleFlight()
+        first = asyncio.ensure_future(flight.do('key', query))
+        second = asyncio.ensure_future(flight.do('key', query))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == 'rows'
+
+
+def test_single_flight_shares_errors():
+    async def query():
+        await asyncio.sleep(0.01)
+        raise RuntimeError('db down')
+
+    async def run():
+        flight = SingleFlight()
+        return await asyncio.gather(flight.do('k', query), flight.do('k', query), return_exceptions=True)
+
+    assert [type(result) for result in asyncio.run(run())] == [RuntimeError, RuntimeError]
+
+
+def test_user_throttle():
+    throttle = UserThrottle(rate=1.0, burst=3)
+    assert [throttle.allow(1, now=0) for _ in range(4)] == [True, True, True, False]
+    assert throttle.allow(2, now=0)
+    assert throttle.allow(1, now=1.0)
+    assert not throttle.allow(1, now=1.0)
+
+
+def test_debouncer():
+    debouncer = Debouncer(interval=1.0)
+    assert not debouncer.repeated((1, 'toggle_sub_2'), now=0)
+    assert debouncer.repeated((1, 'toggle_sub_2'), now=0.3)
+    assert not debouncer.repeated((1, 'toggle_sub_3'), now=0.4)
+    assert not debouncer.repeated((1, 'toggle_sub_2'), now=2.0)
+
+
+def test_guarded_debounces_callbacks():
+    seen = []
+    answers = []
+
+    async def callback(update, context):
+        seen.append(update.callback_query.data)
+
+    async def answer(*args):
+        answers.append(args)
+
+    wrapped = guarded(callback, UserThrottle(rate=1.0, burst=10), Debouncer(interval=5))
+
+    async def run():
+        for data in ('a', 'a', 'b'):
+            update = SimpleNamespace(
+                effective_user=SimpleNamespace(id=7),
+                callback_query=SimpleNamespace(data=data, answer=answer)
+            )
+            await wrapped(update, None)
+
+    asyncio.run(run())
+    assert seen == ['a', 'b']
+    assert answers == [()]
+
+
+class FailingNewsDatabase:
+    """Настройки читаются, запрос ленты падает"""
+
+    async def fetch_one(self, query, params=None, raise_errors=False):
+        return (5, None)
+
+    async def fetch_all(self, query, params=None, raise_errors=False):
+        if raise_errors:
+            raise psycopg2.OperationalError('server closed the connection')
+        return []
+
+    async def close(self):
+        pass
+
+
+def test_failed_news_read_is_not_cached(monkeypatch):
+    import bot
+    from cache import news_cache, settings_cache
+
+    monkeypatch.setattr(coalesce, 'AsyncDatabase', FailingNewsDatabase)
+    news_cache.invalidate()
+    settings_cache.invalidate()
+    replies = []
+
+    async def reply(*args, **kwargs):
+        replies.append(args or kwargs)
+
+    async def run():
+        waiters = [bot.show_news_page(reply, 1000 + i) for i in range(3)]
+        return await asyncio.gather(*waiters, return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, psycopg2.OperationalError) for result in results)
+    assert replies == []
+    assert len(news_cache) == 0
+
+
+def test_fetch_all_raise_errors():
+    class BrokenCursor:
+        def execute(self, query, params):
+            raise psycopg2.OperationalError('boom')
+
+    db = Database.__new__(Database)
+    db.connection = object()
+    db.cursor = BrokenCursor()
+    assert db.fetch_all("SELECT 1") == []
+    with pytest.raises(psycopg2.OperationalError):
+        db.fetch_all("SELECT 1", raise_errors=True)
+
+    db.connection = None
+    with pytest.raises(psycopg2.OperationalError):
+        db.fetch_one("SELECT 1", raise_errors=True)
+
+
+class OneRowDatabase:
+    """Синхронная подделка Database для AsyncDatabase: каждый запрос возвращает одну строку"""
+
+    connection = True
+
+    def execute(self, query, params=None, commit=False):
+        return SimpleNamespace(fetchone=lambda: (7,))
+
+    def fetch_one(self, query, params=None, raise_errors=False):
+        return None
+
+    def fetch_all(self, query, params=None, raise_errors=False):
+        return []
+
+    def close(self):
+        pass
+
+
+def test_handlers_release_session_before_nested_reads(monkeypatch):
+    import bot
+    import database
+
+    monkeypatch.setattr(database, 'Database', OneRowDatabase)
+    monkeypatch.setattr(database, '_sessions', None)
+    monkeypatch.setattr(database, '_executor', None)
+    monkeypatch.setitem(database.DB_POOL_CONFIG, 'maxconn', 1)
+    monkeypatch.setitem(database.DB_POOL_CONFIG, 'checkout_timeout', 0.5)
+    replies = []
+
+    async def reply(*args, **kwargs):
+        replies.append(kwargs.get('text') or kwargs.get('reply_markup') or args[0])
+
+    async def answer(*args, **kwargs):
+        if args:
+            replies.append(args[0])
+
+    message = SimpleNamespace(reply_text=reply)
+    callback = SimpleNamespace(
+        data='toggle_sub_1', from_user=SimpleNamespace(id=1), answer=answer, edit_message_reply_markup=reply
+    )
+
+    async def run():
+        await bot.search_command(SimpleNamespace(message=message), SimpleNamespace(args=['нефть']))
+        await bot.subscriptions_button(SimpleNamespace(callback_query=callback), None)
+
+    asyncio.run(run())
+    assert replies[0] == "По вашему запросу ничего не найдено."
+    assert len(replies) == 2 and replies[1].inline_keyboard[-1][0].text == "Готово"
@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import pytest
+from psycopg2 import extensions
+
+import database
+from database import AsyncDatabase, ConnectionPool, Database, PoolTimeoutError
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, query, params=None):
+        if self.connection.broken:
+            raise database.OperationalError("server closed the connection")
+        self.connection.queries.append(query)
+
+    def fetchone(self):
+        return (1,)
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.queries = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return extensions.TRANSACTION_STATUS_INTRANS if self.queries else extensions.TRANSACTION_STATUS_IDLE
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self.queries = []
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    created = []
+
+    def connect(**kwargs):
+        created.append(FakeConnection())
+        return created[-1]
+
+    monkeypatch.setattr(database.psycopg2, 'connect', connect)
+    return created
+
+
+def test_connection_is_reused(connections):
+    pool = ConnectionPool(minconn=1, maxconn=2)
+    first = Database(pool)
+    first.fetch_one("SELECT 1")
+    first.close()
+
+    second = Database(pool)
+    assert second.connection is connections[0]
+    assert second.connection.queries == []
+    second.close()
+    assert len(connections) == 1
+
+
+def test_checkout_timeout(connections):
+    pool = ConnectionPool(minconn=0, maxconn=1, checkout_timeout=0.05)
+    held = pool.getconn()
+    started = time.monotonic()
+    with pytest.raises(PoolTimeoutError):
+        pool.getconn()
+    assert time.monotonic() - started >= 0.05
+    pool.putconn(held)
+    assert pool.getconn() is held
+
+
+def test_health_check_replaces_dead_connection(connections):
+    pool = ConnectionPool(minconn=1, maxconn=1, health_check_interval=0)
+    connections[0].broken = True
+    connection = pool.getconn()
+    assert connection is connections[1]
+    assert connections[0].closed
+
+
+def test_async_database(connections, monkeypatch):
+    monkeypatch.setattr(database, '_pool', ConnectionPool(minconn=0, maxconn=2))
+    monkeypatch.setattr(database, '_sessions', None)
+
+    async def handler():
+        db = AsyncDatabase()
+        try:
+            return await db.fetch_all("SELECT 1")
+        finally:
+            await db.close()
+
+    async def burst():
+        return await asyncio.gather(*(handler() for _ in range(20)))
+
+    assert asyncio.run(burst()) == [[(1,)]] * 20
+    assert len(connections) <= 2
@@ -0,0 +1,78 @@
+import psycopg2
+import pytest
+
+from dedup import StoryIndex, normalize_title, shingles
+
+
+def test_normalize_title_strips_punctuation_and_yo():
+    assert normalize_title('Ещё «рекорд»: нефть — $90!') == 'еще рекорд нефть 90'
+
+
+def test_shingles_of_short_title():
+    assert shingles('ЦБ', size=4) == {'цб'}
+    assert shingles('!!!', size=4) == set()
+
+
+def test_similar_headlines_share_story():
+    index = StoryIndex(max_items=100)
+    first = index.assign(1, 'Банк России сохранил ключевую ставку на уровне 16%')
+    second = index.assign(2, 'Банк России сохранил ключевую ставку на уровне 16% годовых')
+    assert first == 1
+    assert second == 1
+
+
+def test_unrelated_headlines_get_own_story():
+    index = StoryIndex(max_items=100)
+    index.assign(1, 'Банк России сохранил ключевую ставку на уровне 16%')
+    assert index.assign(2, 'Apple unveils new iPhone lineup at September event') == 2
+
+
+def test_known_story_id_is_kept():
+    index = StoryIndex(max_items=100)
+    assert index.assign(5, 'Oil prices climb after OPEC+ output cut', story_id=3) == 3
+    assert index.assign(6, 'Oil prices climb after OPEC+ output cut deal') == 3
+
+
+def test_index_is_bounded_and_evicts_oldest():
+    titles = [
+        'Газпром увеличил экспорт газа в Китай',
+        'Apple unveils new iPhone lineup',
+        'Курс евро превысил 100 рублей',
+        'Tesla recalls two million vehicles',
+        'Сбербанк отчитался о рекордной прибыли',
+    ]
+    index = StoryIndex(max_items=3)
+    for news_id, title in enumerate(titles, 1):
+        index.assign(news_id, title)
+    assert len(index) == 3
+    assert index.assign(10, titles[0]) == 10
+    assert index.assign(11, titles[-1]) == 5
+
+
+def test_remove_forgets_items():
+    index = StoryIndex(max_items=10)
+    index.assign(1, 'Reuters: Fed holds rates steady')
+    index.remove([1])
+    assert len(index) == 0
+    assert index.assign(2, 'Reuters: Fed holds rates steady') == 2
+
+
+class FakeDatabase:
+    def __init__(self, rows=None):
+        self.rows = rows
+
+    def fetch_all(self, query, params=None, raise_errors=False):
+        if self.rows is None:
+            raise psycopg2.OperationalError("connection lost")
+        return self.rows
+
+
+def test_warm_is_retried_after_failed_read():
+    index = StoryIndex(max_items=10)
+    with pytest.raises(psycopg2.OperationalError):
+        index.warm(FakeDatabase())
+    assert not index.warmed
+
+    index.warm(FakeDatabase([(2, 'Reuters: Fed holds rates steady', 1)]))
+    assert index.warmed and len(index) == 1
+    assert index.assign(3, 'Reuters: Fed holds rates steady') == 1
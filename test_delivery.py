@@ -0,0 +1,205 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+import bot
+import delivery
+from delivery import DeliveryEngine, RateLimiter, render_delivery
+
+
+class FakeBot:
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append((chat_id, text))
+
+
+def test_render_escapes_titles():
+    text = render_delivery([('A <b> & B', 'https://example.com/?a=1&b=2')])
+    assert 'A &lt;b&gt; &amp; B' in text
+    assert "href='https://example.com/?a=1&amp;b=2'" in text
+
+
+def test_render_mentions_skipped_articles():
+    assert 'статей: 15' in render_delivery([('Title', 'https://example.com/1')], skipped=15)
+    assert '/news' not in render_delivery([('Title', 'https://example.com/1')])
+
+
+def test_rate_limiter_spacing():
+    async def run():
+        limiter = RateLimiter(rate=50, capacity=1)
+        started = time.monotonic()
+        for _ in range(6):
+            await limiter.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.09
+
+
+def test_retry_after_then_watermark(monkeypatch):
+    advanced = []
+    monkeypatch.setattr(delivery, 'advance_watermark', lambda user_id, last_id: advanced.append((user_id, last_id)))
+    monkeypatch.setattr(delivery, 'fetch_pending', lambda max_headlines: [
+        {'user_id': 1, 'chat_id': 100, 'last_id': 7, 'items': [('Title', 'https://example.com/1')]},
+        {'user_id': 2, 'chat_id': 200, 'last_id': 7, 'items': [('Title', 'https://example.com/1')]},
+    ])
+    monkeypatch.setattr(delivery, 'fetch_digests', lambda per_source: [])
+    bot = FakeBot([RetryAfter(0), Forbidden('blocked')])
+
+    async def run():
+        engine = DeliveryEngine(bot, per_chat_interval=0, workers=1)
+        engine.start()
+        await asyncio.sleep(0.05)
+        await engine.queue.join()
+        await engine.stop()
+
+    asyncio.run(run())
+    assert len(bot.sent) == 1
+    assert sorted(advanced) == [(1, 7), (2, 7)]
+
+
+def test_digest_sent_as_prerendered_messages(monkeypatch):
+    advanced = []
+    monkeypatch.setattr(delivery, 'advance_watermark', lambda user_id, last_id: advanced.append((user_id, last_id)))
+    monkeypatch.setattr(delivery, 'fetch_pending', lambda max_headlines: [])
+    monkeypatch.setattr(delivery, 'fetch_digests', lambda per_source: [
+        {'user_id': 3, 'chat_id': 300, 'last_id': 9, 'messages': ['digest', 'digest (2)']},
+    ])
+    bot = FakeBot()
+
+    async def run():
+        engine = DeliveryEngine(bot, per_chat_interval=0, workers=1)
+        engine.start()
+        await asyncio.sleep(0.05)
+        await engine.queue.join()
+        await engine.stop()
+
+    asyncio.run(run())
+    assert bot.sent == [(300, 'digest'), (300, 'digest (2)')]
+    assert advanced == [(3, 9)]
+
+
+def test_bad_request_keeps_watermark_unless_chat_is_gone(monkeypatch):
+    advanced = []
+    monkeypatch.setattr(delivery, 'advance_watermark', lambda user_id, last_id: advanced.append((user_id, last_id)))
+    monkeypatch.setattr(delivery, 'fetch_pending', lambda max_headlines: [
+        {'user_id': 1, 'chat_id': 100, 'last_id': 7, 'items': [('Title', 'https://example.com/1')]},
+        {'user_id': 2, 'chat_id': 200, 'last_id': 7, 'items': [('Title', 'https://example.com/1')]},
+    ])
+    monkeypatch.setattr(delivery, 'fetch_digests', lambda per_source: [])
+    bot = FakeBot([BadRequest("Can't parse entities"), BadRequest('Chat not found')])
+
+    async def run():
+        engine = DeliveryEngine(bot, per_chat_interval=0, workers=1)
+        engine.start()
+        await asyncio.sleep(0.05)
+        await engine.queue.join()
+        await engine.stop()
+
+    asyncio.run(run())
+    assert bot.sent == []
+    assert advanced == [(2, 7)]
+
+
+def test_repeated_rejection_advances_watermark(monkeypatch):
+    advanced = []
+    monkeypatch.setattr(delivery, 'advance_watermark', lambda user_id, last_id: advanced.append((user_id, last_id)))
+    monkeypatch.setattr(delivery, 'fetch_pending', lambda max_headlines: [
+        {'user_id': 1, 'chat_id': 100, 'last_id': 7, 'items': [('Title', 'https://example.com/1')]},
+    ])
+    monkeypatch.setattr(delivery, 'fetch_digests', lambda per_source: [])
+    fake_bot = FakeBot([BadRequest("Can't parse entities")] * 3)
+
+    async def run():
+        engine = DeliveryEngine(fake_bot, per_chat_interval=0, workers=1, max_rejections=3)
+        engine.start()
+        rounds = []
+        for _ in range(3):
+            await asyncio.sleep(0.05)
+            await engine.queue.join()
+            rounds.append(len(advanced))
+            engine.trigger()
+        await engine.stop()
+        return rounds
+
+    assert asyncio.run(run()) == [0, 0, 1]
+    assert advanced == [(1, 7)]
+    assert fake_bot.sent == []
+
+
+def test_each_leadership_term_gets_fresh_engine(monkeypatch):
+    engines = []
+    elections = []
+
+    class RecordingEngine(DeliveryEngine):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            engines.append(self)
+
+    class FakeElection:
+        def __init__(self, name, lock_id, on_elected, on_deposed, interval):
+            self.on_elected = on_elected
+            self.on_deposed = on_deposed
+            elections.append(self)
+
+        def start(self):
+            pass
+
+    class FakeListener:
+        def __init__(self, handlers, on_connect, reconnect_delay):
+            pass
+
+        def start(self):
+            pass
+
+    monkeypatch.setattr(delivery, 'fetch_pending', lambda max_headlines: [])
+    monkeypatch.setattr(delivery, 'fetch_digests', lambda per_source: [])
+    monkeypatch.setattr(bot, 'DeliveryEngine', RecordingEngine)
+    monkeypatch.setattr(bot, 'LeaderElection', FakeElection)
+    monkeypatch.setattr(bot, 'NotificationListener', FakeListener)
+
+    async def run():
+        bot.start_serving(SimpleNamespace(bot=FakeBot(), bot_data={}))
+        [election] = elections
+        await election.on_elected()
+        engines[0]._in_flight.add(1)
+        await election.on_deposed()
+        await election.on_elected()
+        await election.on_deposed()
+
+    asyncio.run(run())
+    assert len(engines) == 2
+    assert not engines[1]._in_flight
+    assert all(not engine._tasks for engine in engines)
+
+
+def test_digest_for_busy_user_is_sent_after_current_delivery(monkeypatch):
+    advanced = []
+    monkeypatch.setattr(delivery, 'advance_watermark', lambda user_id, last_id: advanced.append((user_id, last_id)))
+    monkeypatch.setattr(delivery, 'fetch_pending', lambda max_headlines: [
+        {'user_id': 1, 'chat_id': 100, 'last_id': 7, 'items': [('Title', 'https://example.com/1')]},
+    ])
+
+    def fetch_digests(per_source):
+        time.sleep(0.02)
+        return [{'user_id': 1, 'chat_id': 100, 'last_id': 9, 'messages': ['digest']}]
+
+    monkeypatch.setattr(delivery, 'fetch_digests', fetch_digests)
+    fake_bot = FakeBot([RetryAfter(0.1)])
+
+    async def run():
+        engine = DeliveryEngine(fake_bot, per_chat_interval=0, workers=1, digest_interval=60)
+        engine.start()
+        await asyncio.sleep(0.2)
+        await engine.queue.join()
+        await engine.stop()
+
+    asyncio.run(run())
+    assert [text for _, text in fake_bot.sent][-1] == 'digest'
+    assert advanced == [(1, 7), (1, 9)]
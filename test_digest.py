@@ -0,0 +1,65 @@
+from datetime import time
+
+import digest
+from digest import fetch_digests, parse_time, render_digest
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeDatabase:
+    rows = []
+
+    def execute(self, query, params=None, commit=False):
+        return FakeCursor(self.rows)
+
+    def close(self):
+        pass
+
+
+def test_parse_time():
+    assert parse_time('8:30') == time(8, 30)
+    assert parse_time(' 23.05 ') == time(23, 5)
+    assert parse_time('24:00') is None
+    assert parse_time('утром') is None
+
+
+def test_render_groups_sources_and_collapses_stories():
+    [text] = render_digest([
+        ['Bloomberg', 'Rates <up>', 'https://b.com/1', 1],
+        ['Bloomberg', 'Oil', 'https://b.com/2', 2],
+        ['Reuters', 'Rates up again', 'https://r.com/1', 1],
+        ['Reuters', 'Gold', 'https://r.com/2', 3],
+    ])
+    assert text.count('<b>Bloomberg</b>') == 1
+    assert 'Rates &lt;up&gt;' in text
+    assert 'Rates up again' not in text
+    assert 'Gold' in text
+
+
+def test_render_splits_at_message_limit_without_losing_articles():
+    rows = [['ТАСС', 'Заголовок ' * 20, f'https://tass.ru/{i}', i] for i in range(100)]
+    messages = render_digest(rows)
+    assert len(messages) > 1
+    assert all(len(message) <= digest.MAX_MESSAGE_LENGTH for message in messages)
+    assert all('<b>ТАСС</b>' in message for message in messages)
+    text = ''.join(messages)
+    assert all(f'https://tass.ru/{i}\'' in text for i in range(100))
+
+
+def test_text_rendered_once_per_group(monkeypatch):
+    FakeDatabase.rows = [
+        ([1, 2, 3], [101, 102, 103], 50, [['ТАСС', 'Новость', 'https://tass.ru/1', 7]]),
+        ([4], [104], 50, [['Reuters', 'News', 'https://r.com/1', 8]]),
+    ]
+    monkeypatch.setattr(digest, 'Database', FakeDatabase)
+    deliveries = fetch_digests(5)
+    assert [d['chat_id'] for d in deliveries] == [101, 102, 103, 104]
+    assert all(d['last_id'] == 50 for d in deliveries)
+    assert deliveries[0]['messages'] is deliveries[2]['messages']
+    assert 'News' in deliveries[3]['messages'][0]
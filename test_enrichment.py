@@ -0,0 +1,92 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import enrichment
+from enrichment import EnrichmentCrawler, HostThrottle, plausible
+from extraction import extract_article_meta
+
+JSON_LD_PAGE = (
+    '<html><head><script type="application/ld+json">'
+    '[{"@type": "BreadcrumbList"}, {"@graph": [{"@type": "NewsArticle",'
+    ' "datePublished": "2024-03-01T10:00:00+03:00", "description": "Лид статьи"}]}]'
+    '</script><meta property="og:description" content="OG description"></head><body></body></html>'
+)
+META_PAGE = (
+    '<html><head><meta property="article:published_time" content="2024-03-01T07:00:00">'
+    '<meta name="description" content=" Short lead "></head><body><p>Text</p></body></html>'
+)
+
+
+def test_json_ld_takes_precedence():
+    published_at, summary = extract_article_meta(JSON_LD_PAGE)
+    assert published_at == datetime.fromisoformat('2024-03-01T10:00:00+03:00').astimezone().replace(tzinfo=None)
+    assert summary == 'Лид статьи'
+
+
+def test_meta_fallback():
+    assert extract_article_meta(META_PAGE) == (datetime(2024, 3, 1, 7, 0), 'Short lead')
+
+
+def test_page_without_metadata():
+    assert extract_article_meta('<html><body><p>Nothing here</p></body></html>') == (None, None)
+
+
+def test_plausible_dates():
+    now = datetime(2024, 3, 1, 12, 0)
+    assert plausible(now - timedelta(hours=3), now)
+    assert not plausible(now + timedelta(days=2), now)
+    assert not plausible(now - timedelta(days=800), now)
+    assert not plausible(None, now)
+
+
+def test_host_throttle_spacing_and_limit():
+    async def run():
+        throttle = HostThrottle(per_host=1, interval=0.05)
+        starts = []
+
+        async def request(host):
+            await throttle.acquire(host)
+            try:
+                starts.append((host, time.monotonic()))
+                await asyncio.sleep(0.01)
+            finally:
+                throttle.release(host)
+
+        await asyncio.gather(*(request('a.example') for _ in range(3)), request('b.example'))
+        throttle.forget_idle()
+        return starts, throttle
+
+    starts, throttle = asyncio.run(run())
+    a_times = [started for host, started in starts if host == 'a.example']
+    assert all(second - first >= 0.045 for first, second in zip(a_times, a_times[1:]))
+    b_time = next(started for host, started in starts if host == 'b.example')
+    assert b_time - a_times[0] < 0.04
+
+
+def test_batch_announces_once_per_source_and_survives_errors(monkeypatch):
+    batches = [[(1, 'https://a.ru/1', 'a.ru', 1), (2, 'https://a.ru/2', 'a.ru', 1),
+                (3, 'https://b.ru/3', 'b.ru', 1), (4, 'https://b.ru/4', 'b.ru', 1)]]
+    announced = []
+
+    def complete(news_id, published_at, summary):
+        if news_id == 4:
+            raise RuntimeError('connection lost')
+        return True, 10 if news_id < 3 else 20
+
+    monkeypatch.setattr(enrichment, 'claim_batch', lambda *args: batches.pop() if batches else [])
+    monkeypatch.setattr(enrichment, 'fetch_article', lambda url, timeout, max_bytes: META_PAGE)
+    monkeypatch.setattr(enrichment, 'plausible', lambda published_at: True)
+    monkeypatch.setattr(enrichment, 'complete', complete)
+    monkeypatch.setattr(enrichment, 'announce_changes', lambda source_ids: announced.append(source_ids))
+
+    async def run():
+        crawler = EnrichmentCrawler(host_interval=0, poll_interval=0.05)
+        crawler.start()
+        await asyncio.sleep(0.3)
+        alive = not crawler._task.done()
+        await crawler.stop()
+        return alive
+
+    assert asyncio.run(run())
+    assert announced == [{10, 20}]
@@ -0,0 +1,120 @@
+import csv
+import gzip
+import io
+import json
+from datetime import date, datetime
+
+import pytest
+
+import export_news
+
+from database import Database
+from export_news import CsvWriter, NdjsonWriter, build_export_query, export, open_output
+
+
+class FakeNamedCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.fetches = 0
+        self.closed = False
+
+    def execute(self, query, params):
+        pass
+
+    def fetchmany(self, size):
+        self.fetches += 1
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.named = FakeNamedCursor(rows)
+        self.names = []
+        self.rolled_back = False
+
+    def cursor(self, name=None):
+        self.names.append(name)
+        return self.named
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+def test_stream_reads_lazily_in_batches():
+    db = Database.__new__(Database)
+    db.connection = FakeConnection([(i,) for i in range(10)])
+    rows = db.stream("SELECT id FROM news", batch_size=4)
+
+    assert next(rows) == (0,)
+    assert db.connection.named.fetches == 1
+    assert [row[0] for row in rows] == list(range(1, 10))
+    assert db.connection.named.fetches == 4
+    assert db.connection.names[0].startswith('stream_')
+    assert db.connection.named.closed and db.connection.rolled_back
+
+
+def test_stream_closed_early_ends_transaction():
+    db = Database.__new__(Database)
+    db.connection = FakeConnection([(i,) for i in range(10)])
+    rows = db.stream("SELECT id FROM news", batch_size=4)
+    next(rows)
+    rows.close()
+    assert db.connection.named.closed and db.connection.rolled_back
+
+
+def test_export_query_filters():
+    query, params = build_export_query('all', 'ТАСС', date(2024, 1, 1), date(2024, 2, 1))
+    assert query.count('UNION ALL') == 1
+    assert 'FROM news_archive n' in query
+    assert 'ORDER BY' not in query
+    assert params == ['ТАСС', 'ТАСС', date(2024, 1, 1), date(2024, 2, 1)] * 2
+
+    query, params = build_export_query('news')
+    assert 'WHERE' not in query and params == []
+
+
+def test_writers(tmp_path):
+    rows = [(1, 'ТАСС', 'Заголовок, "в кавычках"', 'https://tass.ru/1', datetime(2024, 1, 2, 3, 4), None)]
+
+    path = tmp_path / 'news.ndjson.gz'
+    with open_output(str(path), compress=True) as stream:
+        assert export(rows, NdjsonWriter(stream)) == 1
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        record = json.loads(f.readline())
+    assert record['source'] == 'ТАСС'
+    assert record['published_at'] == '2024-01-02T03:04:00'
+
+    buffer = io.StringIO()
+    export(rows, CsvWriter(buffer))
+    header, row = list(csv.reader(io.StringIO(buffer.getvalue())))
+    assert header[0] == 'id' and row[2] == 'Заголовок, "в кавычках"'
+
+
+def test_main_closes_stream_before_connection(tmp_path, monkeypatch):
+    connection = FakeConnection([(i,) for i in range(10)])
+    closed_with = []
+
+    class FakeDatabase(Database):
+        def __init__(self):
+            self.connection = connection
+
+        def close(self):
+            closed_with.append((connection.named.closed, connection.rolled_back))
+
+    class BrokenWriter:
+        def __init__(self, stream):
+            pass
+
+        def write(self, row):
+            raise OSError("No space left on device")
+
+    monkeypatch.setattr(export_news, 'Database', FakeDatabase)
+    monkeypatch.setitem(export_news.WRITERS, 'ndjson', BrokenWriter)
+    monkeypatch.setattr('sys.argv', ['export_news.py', str(tmp_path / 'news.ndjson')])
+    with pytest.raises(OSError):
+        export_news.main()
+    assert closed_with == [(True, True)]
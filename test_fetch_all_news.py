@@ -0,0 +1,66 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import parsers
+
+SPECS = [SimpleNamespace(name='fast'), SimpleNamespace(name='slow'), SimpleNamespace(name='broken')]
+
+
+def ok_stats(inserted):
+    return {'items': 3, 'inserted': inserted, 'duplicates': 3 - inserted, 'seconds': 0.0, 'status': 'ok'}
+
+
+@pytest.fixture
+def cycle(monkeypatch):
+    release = threading.Event()
+    calls = []
+
+    def collect_source(spec, timeout, deadline=None):
+        calls.append(spec.name)
+        if spec.name == 'slow':
+            release.wait(5)
+        if spec.name == 'broken':
+            raise RuntimeError('boom')
+        return ok_stats(2)
+
+    monkeypatch.setattr(parsers, 'SOURCES', SPECS)
+    monkeypatch.setattr(parsers, 'collect_source', collect_source)
+    monkeypatch.setitem(parsers.SCRAPER_CONFIG, 'cycle_deadline', 0.2)
+    monkeypatch.setattr(parsers, '_scrape_in_flight', {})
+    yield release, calls
+    release.set()
+
+
+def test_deadline_error_and_stats(cycle):
+    stats = parsers.fetch_all_news()
+    assert stats['fast'] == ok_stats(2)
+    assert stats['slow']['status'] == 'timeout'
+    assert stats['broken']['status'] == 'error'
+    assert stats['broken']['inserted'] == 0
+
+
+def test_source_still_running_is_skipped(cycle):
+    release, calls = cycle
+    parsers.fetch_all_news()
+    stats = parsers.fetch_all_news()
+    assert stats['slow']['status'] == 'busy'
+    assert calls.count('slow') == 1
+
+    release.set()
+    time.sleep(0.05)
+    assert parsers.fetch_all_news()['slow']['status'] == 'ok'
+    assert calls.count('slow') == 2
+
+
+def test_late_parse_is_not_saved(monkeypatch):
+    saved = []
+    monkeypatch.setattr(parsers, 'parse_source', lambda spec, timeout: [{'title': 't', 'url': 'https://x/1'}])
+    monkeypatch.setattr(parsers, 'save_news_to_db', lambda name, items: saved.append(name) or (1, 0))
+    monkeypatch.setattr(parsers.fetch_cache, 'discard', lambda name: None)
+
+    stats = parsers.collect_source(SimpleNamespace(name='late'), 1, deadline=time.monotonic() - 1)
+    assert stats['status'] == 'timeout'
+    assert saved == []
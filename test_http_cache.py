@@ -0,0 +1,54 @@
+from http_cache import FetchCache
+
+
+class FakeClient:
+    def __init__(self, get):
+        self.get = get
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.text = content.decode('utf-8')
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        pass
+
+
+def test_conditional_fetch(tmp_path):
+    sent_headers = []
+    responses = [
+        FakeResponse(200, b'<html>1</html>', {'ETag': '"v1"'}),
+        FakeResponse(304),
+        FakeResponse(200, b'<html>1</html>', {'ETag': '"v2"'}),
+        FakeResponse(200, b'<html>2</html>', {'ETag': '"v3"'}),
+    ]
+
+    def get(url, headers=None, timeout=None):
+        sent_headers.append(headers)
+        return responses.pop(0)
+
+    path = tmp_path / 'cache.json'
+    cache = FetchCache(str(path), FakeClient(get))
+
+    assert cache.fetch('ТАСС', 'https://tass.ru/') == '<html>1</html>'
+    cache.commit('ТАСС')
+    assert cache.fetch('ТАСС', 'https://tass.ru/') is None
+    assert sent_headers[1]['If-None-Match'] == '"v1"'
+    assert cache.fetch('ТАСС', 'https://tass.ru/') is None
+
+    reloaded = FetchCache(str(path), FakeClient(get))
+    assert reloaded.fetch('ТАСС', 'https://tass.ru/') == '<html>2</html>'
+    assert sent_headers[3]['If-None-Match'] == '"v2"'
+
+
+def test_uncommitted_body_is_fetched_again(tmp_path):
+    cache = FetchCache(
+        str(tmp_path / 'cache.json'),
+        FakeClient(lambda url, headers=None, timeout=None: FakeResponse(200, b'<html></html>'))
+    )
+    assert cache.fetch('Reuters', 'https://www.reuters.com/') is not None
+    cache.discard('Reuters')
+    assert cache.fetch('Reuters', 'https://www.reuters.com/') is not None
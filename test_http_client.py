@@ -0,0 +1,119 @@
+import gzip
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from urllib3.util import connection as urllib3_connection
+
+from http_client import DnsCache, HttpClient, ResponseTooLarge
+
+BODY = ('<html><body>' + 'Новости ' * 2000 + '</body></html>').encode('utf-8')
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    failures = 0
+    connections = set()
+
+    def do_GET(self):
+        Handler.connections.add(self.client_address)
+        if self.path == '/flaky' and Handler.failures < 2:
+            Handler.failures += 1
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = BODY
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.failures = 0
+    Handler.connections = set()
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_client(**kwargs):
+    kwargs.setdefault('dns_ttl', 0)
+    return HttpClient('test-agent', backoff_factor=0, **kwargs)
+
+
+def test_keep_alive_and_gzip(server):
+    client = make_client()
+    for _ in range(3):
+        response = client.get(server + '/page')
+        assert response.text == BODY.decode('utf-8')
+    assert len(Handler.connections) == 1
+    client.close()
+
+
+def test_retries_on_5xx(server):
+    client = make_client()
+    response = client.get(server + '/flaky')
+    assert response.status_code == 200
+    assert Handler.failures == 2
+    client.close()
+
+
+def test_size_cap(server):
+    client = make_client(max_bytes=1024)
+    with pytest.raises(ResponseTooLarge):
+        client.get(server + '/page')
+    response = client.get(server + '/page', truncate=True)
+    assert response.truncated and len(response.content) == 1024
+    client.close()
+
+
+def test_dns_cache_reuses_addresses(monkeypatch):
+    calls = []
+
+    def getaddrinfo(host, port, family, type):
+        calls.append(host)
+        return [(2, 1, 6, '', ('127.0.0.1', port))]
+
+    monkeypatch.setattr('socket.getaddrinfo', getaddrinfo)
+    cache = DnsCache(ttl=60)
+    assert cache.resolve('example.com', 443) == ['127.0.0.1']
+    assert cache.resolve('example.com', 443) == ['127.0.0.1']
+    assert calls == ['example.com']
+    cache.forget('example.com', 443)
+    cache.resolve('example.com', 443)
+    assert len(calls) == 2
+
+
+def test_dns_cache_is_scoped_to_client(server, monkeypatch):
+    resolved = []
+    original = urllib3_connection.create_connection
+
+    def getaddrinfo(host, port, family, type):
+        resolved.append(host)
+        return [(2, 1, 6, '', ('127.0.0.1', port))]
+
+    monkeypatch.setattr('socket.getaddrinfo', getaddrinfo)
+    client = make_client(dns_ttl=60)
+    url = server.replace('127.0.0.1', 'news.test')
+    for _ in range(2):
+        assert client.get(url + '/page').status_code == 200
+    client.close()
+
+    assert urllib3_connection.create_connection is original
+    assert resolved.count('news.test') == 1
+    assert requests.get(url + '/page').status_code == 200
+    assert resolved.count('news.test') == 2
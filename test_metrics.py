@@ -0,0 +1,63 @@
+import asyncio
+import time
+import urllib.request
+
+import metrics
+from metrics import MetricsServer, Registry, SamplingProfiler
+
+
+def test_render_prometheus_text():
+    registry = Registry()
+    counter = registry.counter('requests_total', 'Requests')
+    histogram = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1))
+    counter.inc(source='ТАСС "main"')
+    histogram.observe(0.05, handler='news')
+    histogram.observe(0.5, handler='news')
+    histogram.observe(5, handler='news')
+
+    text = registry.render()
+    assert '# TYPE requests_total counter' in text
+    assert 'requests_total{source="ТАСС \\"main\\""} 1.0' in text
+    assert 'latency_seconds_bucket{handler="news",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{handler="news",le="1"} 2' in text
+    assert 'latency_seconds_bucket{handler="news",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{handler="news"} 3' in text
+
+
+def test_handler_query_count():
+    async def handler(update, context):
+        for _ in range(3):
+            with metrics.db_timer('fetch_one'):
+                pass
+        return 'state'
+
+    before = metrics.db_queries.value(handler='test_handler')
+    wrapped = metrics.instrument_handler('test_handler', handler)
+    assert asyncio.run(wrapped(None, None)) == 'state'
+    assert metrics.db_queries.value(handler='test_handler') - before == 3
+    assert metrics.handler_seconds.count(handler='test_handler') >= 1
+
+
+def test_metrics_endpoint():
+    profiler = SamplingProfiler(interval=0.001).start()
+    server = MetricsServer(port=0, profiler=profiler).start()
+    try:
+        time.sleep(0.02)
+        body = urllib.request.urlopen(f'http://127.0.0.1:{server.port}/metrics').read().decode()
+        assert '# TYPE bot_handler_seconds histogram' in body
+        profile = urllib.request.urlopen(f'http://127.0.0.1:{server.port}/profile').read().decode()
+        assert profile.strip()
+    finally:
+        server.stop()
+
+
+def test_busy_metrics_port_does_not_stop_bot(monkeypatch):
+    import bot
+
+    taken = MetricsServer(port=0).start()
+    monkeypatch.setitem(bot.config.METRICS_CONFIG, 'enabled', True)
+    monkeypatch.setitem(bot.config.METRICS_CONFIG, 'port', taken.port)
+    services = {}
+    bot.start_metrics(services)
+    taken.stop()
+    assert 'metrics' not in services
@@ -0,0 +1,54 @@
+import pytest
+
+import migrate
+from migrate import archive_old_news, load_migrations, plan_problems
+
+
+def test_migrations_are_sequential():
+    versions = [version for version, _, _ in load_migrations()]
+    assert versions == list(range(1, len(versions) + 1))
+
+
+def test_duplicate_versions_rejected(tmp_path):
+    (tmp_path / '0001_a.sql').write_text('SELECT 1;')
+    (tmp_path / '0001_b.sql').write_text('SELECT 1;')
+    with pytest.raises(ValueError):
+        load_migrations(str(tmp_path))
+
+
+def test_plan_problems():
+    index_plan = {'Plan': {'Node Type': 'Limit', 'Plans': [
+        {'Node Type': 'Nested Loop', 'Plans': [
+            {'Node Type': 'Index Scan', 'Relation Name': 'news', 'Index Name': 'news_published_idx'},
+            {'Node Type': 'Seq Scan', 'Relation Name': 'sources'},
+        ]},
+    ]}}
+    assert plan_problems(index_plan) == []
+
+    seq_plan = {'Plan': {'Node Type': 'Limit', 'Plans': [
+        {'Node Type': 'Sort', 'Plans': [{'Node Type': 'Seq Scan', 'Relation Name': 'news'}]},
+    ]}}
+    assert plan_problems(seq_plan) == ['Sort on news', 'Seq Scan on news']
+
+
+def test_ranked_plan_allows_sort_only():
+    plan = {'Plan': {'Node Type': 'Limit', 'Plans': [
+        {'Node Type': 'Sort', 'Plans': [
+            {'Node Type': 'Bitmap Heap Scan', 'Relation Name': 'news', 'Plans': [
+                {'Node Type': 'Bitmap Index Scan', 'Index Name': 'news_search_idx'},
+            ]},
+            {'Node Type': 'Seq Scan', 'Relation Name': 'news_archive'},
+        ]},
+    ]}}
+    assert plan_problems(plan, allow_sort=True) == ['Seq Scan on news_archive']
+
+
+def test_archive_without_connection(monkeypatch):
+    class FakeDatabase:
+        connection = None
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(migrate, 'Database', FakeDatabase)
+    assert archive_old_news(days=1, batch_size=10) == 0
@@ -0,0 +1,50 @@
+from datetime import datetime
+
+import pytest
+
+from pagination import (
+    NEWER, OLDER, build_page_query, collapse_stories, decode_cursor, encode_cursor, page_fetch_size
+)
+
+
+def test_cursor_roundtrip_fits_callback_limit():
+    published_at = datetime(2099, 12, 31, 23, 59, 59, 999999)
+    data = encode_cursor(OLDER, published_at, 2 ** 31 - 1)
+    assert len(data.encode('utf-8')) <= 64
+    assert decode_cursor(data) == (OLDER, published_at, 2 ** 31 - 1)
+
+
+def test_decode_rejects_unknown_direction():
+    with pytest.raises(ValueError):
+        decode_cursor('news_x_1_1')
+
+
+def test_page_query_uses_keyset_condition():
+    query, params = build_page_query(3, 6, NEWER, (datetime(2024, 1, 1), 10))
+    assert "n.source_id = %s AND (n.published_at, n.id) > (%s, %s)" in query
+    assert query.endswith("ORDER BY n.published_at ASC, n.id ASC LIMIT %s")
+    assert params == [3, datetime(2024, 1, 1), 10, 6]
+
+
+def test_first_page_has_no_cursor_and_no_offset():
+    query, params = build_page_query(None, 6)
+    assert 'WHERE' not in query and 'OFFSET' not in query
+    assert params == [6]
+
+
+def row(news_id, story_id):
+    return (news_id, datetime(2024, 1, 1), f'title {news_id}', f'https://example.com/{news_id}', story_id, None)
+
+
+def test_collapsed_stories_do_not_shorten_page():
+    rows = [row(10, 1), row(9, 1), row(8, 1), row(7, 2), row(6, 3), row(5, 4)]
+    page, has_more = collapse_stories(rows, 3)
+    assert [item[0] for item in page] == [10, 7, 6]
+    assert has_more
+
+
+def test_collapse_last_page_and_exhausted_overfetch():
+    assert collapse_stories([row(2, 1), row(1, 1)], 2) == ([row(2, 1)], False)
+    rows = [row(news_id, 1) for news_id in range(page_fetch_size(2), 0, -1)]
+    page, has_more = collapse_stories(rows, 2)
+    assert len(page) == 1 and has_more
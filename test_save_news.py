@@ -0,0 +1,100 @@
+import pytest
+
+import parsers
+from dedup import StoryIndex
+from url_filter import UrlFilter
+
+
+class FakeConnection:
+    def __init__(self):
+        self.commits = 0
+        self.rollbacks = 0
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class FakeDatabase:
+    """news в памяти: INSERT ... ON CONFLICT (url) DO NOTHING RETURNING id, url"""
+
+    def __init__(self, existing=(), fail_insert=False):
+        self.connection = FakeConnection()
+        self.urls = set(existing)
+        self.fail_insert = fail_insert
+        self.inserts = []
+        self.next_id = 100
+
+    def fetch_one(self, query, params=None, raise_errors=False):
+        return (1,) if params == ('ТАСС',) else None
+
+    def fetch_all(self, query, params=None, raise_errors=False):
+        return []
+
+    def execute(self, query, params=None, commit=False):
+        return self
+
+    def execute_values(self, query, argslist, template=None, commit=False):
+        if query.startswith('INSERT'):
+            self.inserts.append((query, argslist))
+            if self.fail_insert:
+                self.connection.rollback()
+                return None
+            rows = []
+            for _, _, url, _ in argslist:
+                if url not in self.urls:
+                    self.urls.add(url)
+                    self.next_id += 1
+                    rows.append((self.next_id, url))
+            return rows
+        if commit:
+            self.connection.commit()
+        return [(news_id,) for news_id, _ in argslist]
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = FakeDatabase(existing={'https://tass.ru/2'})
+    index = StoryIndex(max_items=100)
+    index.warmed = True
+    url_filter = UrlFilter()
+    url_filter.warmed = True
+    monkeypatch.setattr(parsers, 'Database', lambda: db)
+    monkeypatch.setattr(parsers, 'story_index', index)
+    monkeypatch.setattr(parsers, 'url_filter', url_filter)
+    monkeypatch.setattr(parsers, 'invalidate_news', lambda source_id: None)
+    return db
+
+
+def items(*numbers):
+    return [{'title': f'Заголовок номер {number}', 'url': f'https://tass.ru/{number}'} for number in numbers]
+
+
+def test_one_insert_per_batch_with_in_batch_dedup(fake_db):
+    assert parsers.save_news_to_db('ТАСС', items(1, 2, 3, 1, 3)) == (2, 3)
+    assert len(fake_db.inserts) == 1
+    query, rows = fake_db.inserts[0]
+    assert 'ON CONFLICT (url) DO NOTHING RETURNING id, url' in query
+    assert [row[2] for row in rows] == ['https://tass.ru/1', 'https://tass.ru/2', 'https://tass.ru/3']
+    assert fake_db.connection.commits == 1
+    assert 'https://tass.ru/1' in parsers.url_filter
+
+
+def test_known_urls_skip_the_database(fake_db):
+    parsers.save_news_to_db('ТАСС', items(1))
+    assert parsers.save_news_to_db('ТАСС', items(1, 1)) == (0, 2)
+    assert len(fake_db.inserts) == 1
+
+
+def test_failed_insert_returns_none(fake_db):
+    fake_db.fail_insert = True
+    assert parsers.save_news_to_db('ТАСС', items(1, 3)) is None
+    assert fake_db.connection.rollbacks == 1
+    assert fake_db.connection.commits == 0
+    assert 'https://tass.ru/1' not in parsers.url_filter
+    assert len(parsers.story_index) == 0
@@ -0,0 +1,71 @@
+import asyncio
+import random
+import threading
+import time
+
+from scheduler import NewsScheduler
+from sources import SourceSpec
+
+SPEC = SourceSpec(name='Test', url='https://example.com/', item_selector='a', interval=600)
+
+
+def make_scheduler(**kwargs):
+    kwargs.setdefault('jitter', 0)
+    return NewsScheduler([SPEC], collect=None, rng=random.Random(1), **kwargs)
+
+
+def test_failures_back_off_exponentially():
+    scheduler = make_scheduler(min_interval=60, max_backoff=300)
+    state = scheduler.states[0]
+    delays = [scheduler.reschedule(state, {'status': 'error'}, 0) for _ in range(5)]
+    assert delays == [60, 120, 240, 300, 300]
+
+    assert scheduler.reschedule(state, {'status': 'ok', 'inserted': 1}, 0) == 600
+    assert state.failures == 0
+
+
+def test_interval_follows_publication_rate():
+    scheduler = make_scheduler(min_interval=60, max_interval=7200, target_items=3)
+    state = scheduler.states[0]
+    scheduler.reschedule(state, {'status': 'ok', 'inserted': 5}, 0)
+
+    busy = scheduler.reschedule(state, {'status': 'ok', 'inserted': 30}, 600)
+    assert busy < 600
+
+    quiet = scheduler.reschedule(state, {'status': 'unchanged', 'inserted': 0}, 1200)
+    assert quiet == busy * 1.5
+    assert scheduler.reschedule(state, {'status': 'ok', 'inserted': 0}, 1800) <= 7200
+
+
+def test_jitter_is_bounded():
+    scheduler = make_scheduler(jitter=0.1)
+    state = scheduler.states[0]
+    for _ in range(50):
+        delay = scheduler.reschedule(state, {'status': 'error'}, 0)
+        state.failures = 0
+        assert 54 <= delay <= 66
+
+
+def test_source_runs_never_overlap():
+    active = []
+    calls = []
+    lock = threading.Lock()
+
+    def collect(spec, timeout):
+        with lock:
+            active.append(spec.name)
+            assert active.count(spec.name) == 1
+        time.sleep(0.05)
+        with lock:
+            active.remove(spec.name)
+            calls.append(spec.name)
+        return {'status': 'error'}
+
+    async def run():
+        scheduler = NewsScheduler([SPEC], collect, min_interval=0.01, max_backoff=0.01, jitter=0)
+        scheduler.start()
+        await asyncio.sleep(0.3)
+        await scheduler.stop()
+
+    asyncio.run(run())
+    assert 2 <= len(calls) <= 6
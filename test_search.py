@@ -0,0 +1,37 @@
+from datetime import datetime
+
+import pytest
+
+from search import build_search_query, decode_page, encode_page, render_results
+
+
+def test_search_query_params_match_placeholders():
+    for source_id in (None, 3):
+        query, params = build_search_query('ставка ЦБ', source_id, limit=6, offset=10)
+        assert query.count('%s') == len(params)
+        assert params[-2:] == [6, 10]
+        assert ('n.source_id = %s' in query) == (source_id is not None)
+
+
+def test_each_branch_is_limited_to_offset_plus_limit():
+    query, params = build_search_query('oil', None, limit=6, offset=12)
+    assert query.count('LIMIT %s') == 3
+    assert params.count(18) == 2
+
+
+def test_render_results_escapes_html():
+    rows = [('Нефть <Brent> дорожает', 'https://example.com/?a=1&b=2', datetime(2024, 3, 1), 'ТАСС')]
+    text = render_results('<b>нефть</b>', rows, 0)
+    assert '&lt;Brent&gt;' in text
+    assert '&lt;b&gt;нефть&lt;/b&gt;' in text
+    assert 'a=1&amp;b=2' in text
+    assert 'ТАСС, 01.03.2024' in text
+
+
+def test_page_callback_roundtrip_fits_callback_limit():
+    data = encode_page(2 ** 31 - 1, 2 ** 31 - 1, 19)
+    assert len(data.encode('utf-8')) <= 64
+    assert decode_page(data) == (2 ** 31 - 1, 2 ** 31 - 1, 19)
+    assert decode_page(encode_page(7, None, 0)) == (7, None, 0)
+    with pytest.raises(ValueError):
+        decode_page('search_page_1')
@@ -0,0 +1,69 @@
+import pytest
+
+import parsers
+from parsers import SOURCES, extract_items
+from sources import SourceSpec, load_sources
+
+SPECS = {spec.name: spec for spec in SOURCES}
+
+PAGES = {
+    'Bloomberg': (
+        '<html><body><article class="story-list-story">'
+        '<a class="story-list-story__info__headline" href="/news/articles/1"> Stocks rally </a>'
+        '</article><div><a href="/ignored">Ad</a></div></body></html>'
+    ),
+    'Коммерсантъ': (
+        '<html><body><a class="uho__link" href="/doc/1">Новость дня</a>'
+        '<a class="uho__link" href="https://www.kommersant.ru/doc/2">Вторая</a></body></html>'
+    ),
+    'Reuters': (
+        '<html><body><article class="story">'
+        '<a data-testid="Heading" href="/world/1">Markets close</a></article></body></html>'
+    ),
+    'ТАСС': (
+        '<html><body><a href="/politika/1"><span class="news-card__title">Заголовок</span></a>'
+        '</body></html>'
+    ),
+}
+
+EXPECTED = {
+    'Bloomberg': [{'title': 'Stocks rally', 'url': 'https://www.bloomberg.com/news/articles/1'}],
+    'Коммерсантъ': [
+        {'title': 'Новость дня', 'url': 'https://www.kommersant.ru/doc/1'},
+        {'title': 'Вторая', 'url': 'https://www.kommersant.ru/doc/2'},
+    ],
+    'Reuters': [{'title': 'Markets close', 'url': 'https://www.reuters.com/world/1'}],
+    'ТАСС': [{'title': 'Заголовок', 'url': 'https://tass.ru/politika/1'}],
+}
+
+
+@pytest.mark.parametrize('name', sorted(PAGES))
+def test_extract_items(name):
+    assert extract_items(PAGES[name], SPECS[name]) == EXPECTED[name]
+
+
+def test_duplicate_links_are_dropped():
+    spec = SourceSpec(name='Test', url='https://example.com/', item_selector='a')
+    html = '<a href="/1">One</a><a href="https://example.com/1">One again</a>'
+    assert extract_items(html, spec) == [{'title': 'One', 'url': 'https://example.com/1'}]
+
+
+def test_load_sources_rejects_duplicates(tmp_path):
+    path = tmp_path / 'sources.json'
+    path.write_text(
+        '[{"name": "A", "url": "https://a/", "item_selector": "a"},'
+        ' {"name": "A", "url": "https://b/", "item_selector": "a"}]',
+        encoding='utf-8'
+    )
+    with pytest.raises(ValueError):
+        load_sources(str(path))
+
+
+def test_process_parse_mode_matches_in_process(monkeypatch):
+    monkeypatch.setitem(parsers.SCRAPER_CONFIG, 'parse_mode', 'process')
+    monkeypatch.setitem(parsers.SCRAPER_CONFIG, 'parse_workers', 1)
+    try:
+        for name, page in PAGES.items():
+            assert parsers.extract(page, SPECS[name], timeout=30) == EXPECTED[name]
+    finally:
+        parsers.close_parse_pool()
@@ -0,0 +1,55 @@
+import parsers
+import url_filter as url_filter_module
+from url_filter import UrlFilter
+
+
+def test_membership_and_merge():
+    urls = UrlFilter(merge_threshold=3)
+    urls.add(['https://a/1', 'https://a/2'], max_news_id=2)
+    assert 'https://a/1' in urls and 'https://a/3' not in urls
+
+    urls.add(['https://a/2', 'https://a/3', 'https://a/4'], max_news_id=4)
+    assert len(urls) == 4
+    assert urls.nbytes == 4 * 8
+    assert urls.unknown(['https://a/4', 'https://a/5', 'https://a/1']) == ['https://a/5']
+    assert urls.max_news_id == 4
+
+
+def test_load_rows_in_chunks(monkeypatch):
+    monkeypatch.setattr(url_filter_module, 'BUILD_CHUNK', 10)
+    urls = UrlFilter()
+    urls.add(['https://b/0'])
+    urls.load_rows((i, f'https://b/{i}') for i in range(95))
+    assert len(urls) == 95
+    assert urls.max_news_id == 94
+    assert list(urls._sorted) == sorted(urls._sorted)
+    assert all(f'https://b/{i}' in urls for i in range(95))
+
+
+def test_persisted_round_trip(tmp_path):
+    path = str(tmp_path / 'urls.bin')
+    urls = UrlFilter(path)
+    urls.add([f'https://c/{i}' for i in range(100)], max_news_id=100)
+    urls.save()
+
+    loaded = UrlFilter(path)
+    assert loaded.load()
+    assert loaded.max_news_id == 100
+    assert 'https://c/42' in loaded and 'https://c/100' not in loaded
+
+    (tmp_path / 'urls.bin').write_bytes(b'garbage')
+    assert not UrlFilter(path).load()
+
+
+def test_known_urls_skip_database(monkeypatch):
+    urls = UrlFilter()
+    urls.warmed = True
+    urls.add(['https://d/1', 'https://d/2'])
+    monkeypatch.setattr(parsers, 'url_filter', urls)
+
+    def no_database():
+        raise AssertionError("database must not be used")
+
+    monkeypatch.setattr(parsers, 'Database', no_database)
+    items = [{'title': 'One', 'url': 'https://d/1'}, {'title': 'Two', 'url': 'https://d/2'}]
+    assert parsers.save_news_to_db('ТАСС', items) == (0, 2)
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import urllib.error
+import urllib.request
+
+from webhook import WebhookServer
+
+SECRET = 'test-secret'
+
+
+class FakeApplication:
+    bot = None
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.processed = []
+        self.active = 0
+        self.max_active = 0
+
+    async def process_update(self, update):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        self.processed.append(update.update_id)
+
+
+def post(port, payload, secret=SECRET, path='/telegram'):
+    request = urllib.request.Request(
+        f'http://127.0.0.1:{port}{path}',
+        data=json.dumps(payload).encode('utf-8'),
+        headers={'Content-Type': 'application/json', 'X-Telegram-Bot-Api-Secret-Token': secret},
+        method='POST'
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def update(update_id):
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': 1, 'type': 'private'},
+            'from': {'id': 1, 'is_bot': False, 'first_name': 'Test'},
+            'text': '/news'
+        }
+    }
+
+
+def test_secret_and_routing():
+    async def run():
+        application = FakeApplication()
+        server = await WebhookServer(application, port=0, secret_token=SECRET).start()
+        port = server.bound_port
+        statuses = [
+            await asyncio.to_thread(post, port, update(1), secret='wrong'),
+            await asyncio.to_thread(post, port, update(2), path='/other'),
+            await asyncio.to_thread(post, port, update(3)),
+        ]
+        await server.stop()
+        return statuses, application.processed
+
+    statuses, processed = asyncio.run(run())
+    assert statuses == [403, 404, 200]
+    assert processed == [3]
+
+
+def test_bounded_concurrency_and_drain():
+    async def run():
+        application = FakeApplication(delay=0.05)
+        server = await WebhookServer(application, port=0, secret_token=SECRET, max_concurrent=3).start()
+        port = server.bound_port
+        statuses = await asyncio.gather(*(asyncio.to_thread(post, port, update(i)) for i in range(10)))
+        await server.stop()
+        return statuses, application
+
+    statuses, application = asyncio.run(run())
+    assert statuses == [200] * 10
+    assert sorted(application.processed) == list(range(10))
+    assert application.max_active <= 3
+
+
+async def raw_status(port, data):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(data)
+    await writer.drain()
+    status_line = await reader.readline()
+    writer.close()
+    return int(status_line.split()[1])
+
+
+def test_malformed_requests_get_400():
+    body = json.dumps(update(1)).encode('utf-8')
+    head = f'POST /telegram HTTP/1.1\r\nX-Telegram-Bot-Api-Secret-Token: {SECRET}\r\n'.encode('latin-1')
+    requests = {
+        'request line': b'GARBAGE\r\n\r\n',
+        'content-length': head + b'Content-Length: ten\r\n\r\n',
+        'header': head + b'no colon here\r\n\r\n',
+        'both lengths': head + b'Content-Length: 5\r\nTransfer-Encoding: chunked\r\n\r\n',
+        'chunk size': head + b'Transfer-Encoding: chunked\r\n\r\nzz\r\n',
+        'header line': head + b'X-Long: ' + b'a' * 10000 + b'\r\n\r\n',
+        'header count': head + b''.join(b'X-%d: 1\r\n' % i for i in range(100)) + b'\r\n',
+        'body size': head + b'Content-Length: %d\r\n\r\n' % (2 * 1024 * 1024),
+        'null body': head + b'Content-Length: 4\r\n\r\nnull',
+        'array body': head + b'Content-Length: 2\r\n\r\n[]',
+    }
+
+    async def run():
+        application = FakeApplication()
+        server = await WebhookServer(application, port=0, secret_token=SECRET).start()
+        statuses = {name: await raw_status(server.bound_port, data) for name, data in requests.items()}
+        chunked = head + b'Transfer-Encoding: chunked\r\n\r\n' + b'%x\r\n' % len(body) + body + b'\r\n0\r\n\r\n'
+        statuses['chunked'] = await raw_status(server.bound_port, chunked)
+        await server.stop()
+        return statuses, application.processed
+
+    statuses, processed = asyncio.run(run())
+    assert statuses == {
+        'request line': 400, 'content-length': 400, 'header': 400, 'both lengths': 400,
+        'chunk size': 400, 'header line': 431, 'header count': 431, 'body size': 413,
+        'null body': 400, 'array body': 400, 'chunked': 200,
+    }
+    assert processed == [1]
@@ -0,0 +1,217 @@
+import asyncio
+import hmac
+import json
+import logging
+
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'x-telegram-bot-api-secret-token'
+REASONS = {
+    200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found',
+    405: 'Method Not Allowed', 413: 'Payload Too Large', 431: 'Request Header Fields Too Large',
+    503: 'Service Unavailable'
+}
+
+
+class HttpError(Exception):
+    """Некорректный запрос: ответить status и закрыть соединение"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class WebhookServer:
+    """HTTP-сервер для приёма обновлений Telegram в режиме webhook.
+
+    Проверяет заголовок X-Telegram-Bot-Api-Secret-Token, отвечает 200 сразу
+    после приёма и обрабатывает обновление в фоне. Одновременно обрабатывается
+    не больше max_concurrent обновлений: при заполнении новые запросы ждут
+    свободного места, и Telegram сам притормаживает отправку. stop()
+    перестаёт принимать обновления и дожидается уже принятых.
+
+    Свой сервер вместо Application.run_webhook: тому нужен tornado
+    (python-telegram-bot[webhooks]), он отвечает 200, лишь положив обновление
+    в update_queue, без ограничения числа принятых, и при остановке не ждёт
+    их обработки. Разбирается только то подмножество HTTP/1.1, которое
+    использует Telegram: Content-Length или chunked, заголовки не длиннее
+    max_header_size байт и не больше max_headers штук. Всё прочее получает
+    400 (431 для заголовков) и закрытие соединения.
+    """
+
+    def __init__(self, application, host='127.0.0.1', port=8443, path='/telegram',
+                 secret_token=None, max_concurrent=64, max_body=1024 * 1024,
+                 max_header_size=8192, max_headers=64):
+        self.application = application
+        self.host = host
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self.max_body = max_body
+        self.max_header_size = max_header_size
+        self.max_headers = max_headers
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._tasks = set()
+        self._server = None
+        self._draining = False
+
+    @property
+    def bound_port(self):
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=self.max_header_size
+        )
+        logger.info(f"Webhook слушает {self.host}:{self.bound_port}{self.path}")
+        return self
+
+    async def stop(self, timeout=30):
+        self._draining = True
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._tasks:
+            logger.info(f"Ожидание обработки обновлений: {len(self._tasks)}")
+            done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while not reader.at_eof():
+                keep_alive = await self._handle_request(reader, writer)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"Ошибка webhook-соединения: {e}")
+        finally:
+            writer.close()
+
+    async def _readline(self, reader):
+        try:
+            return await reader.readline()
+        except ValueError:
+            # строка длиннее limit потока (max_header_size)
+            raise HttpError(431, "header line too long")
+
+    async def _read_request(self, reader):
+        request_line = await self._readline(reader)
+        if not request_line:
+            return None
+        parts = request_line.decode('latin-1').split()
+        if len(parts) != 3 or not parts[2].startswith('HTTP/1.'):
+            raise HttpError(400, f"malformed request line {request_line[:100]!r}")
+        method, target, version = parts
+
+        headers = {}
+        while True:
+            line = await self._readline(reader)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            if len(headers) >= self.max_headers:
+                raise HttpError(431, "too many headers")
+            name, colon, value = line.decode('latin-1').partition(':')
+            if not colon or not name.strip() or name != name.strip():
+                raise HttpError(400, f"malformed header {line[:100]!r}")
+            headers[name.lower()] = value.strip()
+        return method, target, version, headers
+
+    async def _read_body(self, reader, headers):
+        transfer_encoding = headers.get('transfer-encoding', '').lower()
+        if transfer_encoding:
+            if 'content-length' in headers or transfer_encoding != 'chunked':
+                raise HttpError(400, f"unsupported transfer-encoding {transfer_encoding!r}")
+            return await self._read_chunked(reader)
+
+        length = headers.get('content-length', '0') or '0'
+        if not length.isdigit():
+            raise HttpError(400, f"invalid content-length {length[:20]!r}")
+        length = int(length)
+        if length > self.max_body:
+            raise HttpError(413, f"body of {length} bytes")
+        return await reader.readexactly(length) if length else b''
+
+    async def _read_chunked(self, reader):
+        body = bytearray()
+        while True:
+            size_line = await self._readline(reader)
+            size = size_line.split(b';', 1)[0].strip()
+            try:
+                size = int(size, 16)
+            except ValueError:
+                raise HttpError(400, f"invalid chunk size {size[:20]!r}")
+            if size < 0:
+                raise HttpError(400, "negative chunk size")
+            if len(body) + size > self.max_body:
+                raise HttpError(413, "chunked body too large")
+            if size == 0:
+                break
+            body += await reader.readexactly(size)
+            if await reader.readexactly(2) != b'\r\n':
+                raise HttpError(400, "missing CRLF after chunk")
+        for _ in range(self.max_headers + 1):
+            if await self._readline(reader) in (b'\r\n', b'\n', b''):
+                return bytes(body)
+        raise HttpError(431, "too many trailers")
+
+    async def _respond(self, writer, status, keep_alive):
+        body = json.dumps({'ok': status == 200}).encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body
+        )
+        await writer.drain()
+        return keep_alive
+
+    async def _handle_request(self, reader, writer):
+        try:
+            request = await self._read_request(reader)
+            if request is None:
+                return False
+            method, target, version, headers = request
+            body = await self._read_body(reader, headers)
+        except HttpError as e:
+            logger.warning(f"Некорректный webhook-запрос: {e}")
+            return await self._respond(writer, e.status, False)
+        keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+
+        if target.split('?')[0] != self.path:
+            return await self._respond(writer, 404, keep_alive)
+        if method != 'POST':
+            return await self._respond(writer, 405, keep_alive)
+        if self.secret_token and not hmac.compare_digest(
+            headers.get(SECRET_HEADER, '').encode('utf-8'), self.secret_token.encode('utf-8')
+        ):
+            return await self._respond(writer, 403, keep_alive)
+        if self._draining:
+            return await self._respond(writer, 503, False)
+
+        try:
+            payload = json.loads(body)
+            if not isinstance(payload, dict):
+                raise ValueError(f"ожидался объект, получен {type(payload).__name__}")
+            update = Update.de_json(payload, self.application.bot)
+        except Exception as e:
+            logger.warning(f"Некорректное обновление: {e}")
+            return await self._respond(writer, 400, keep_alive)
+
+        await self._slots.acquire()
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return await self._respond(writer, 200, keep_alive)
+
+    async def _process(self, update):
+        try:
+            await self.application.process_update(update)
+        except Exception as e:
+            logger.error(f"Ошибка обработки обновления {update.update_id}: {e}")
+        finally:
+            self._slots.release()